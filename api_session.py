@@ -0,0 +1,49 @@
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import ClientTimeout
+
+
+class PooledSession(AiohttpSession):
+    # AiohttpSession with the connection pool and timeouts taken from settings instead of aiogram's
+    # defaults. A keep-alive of 0 closes every connection after its request; a DNS cache TTL of 0
+    # resolves the host for every new connection.
+    def __init__(
+        self,
+        pool_size: int = 100,
+        per_host: int = 0,
+        keepalive_timeout: float = 15.0,
+        dns_cache_ttl: int = 3600,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        total_timeout: float = 60.0,
+        **kwargs: Any,
+    ):
+        # The total stays a number on the session: the dispatcher adds the long-polling timeout to it.
+        super().__init__(limit=pool_size, timeout=total_timeout, **kwargs)
+        self._connector_init.update(
+            limit_per_host=per_host,
+            use_dns_cache=dns_cache_ttl > 0,
+            ttl_dns_cache=dns_cache_ttl or None,
+        )
+        if keepalive_timeout > 0:
+            self._connector_init["keepalive_timeout"] = keepalive_timeout
+        else:
+            self._connector_init["force_close"] = True
+        self.connect_timeout = connect_timeout or None
+        self.read_timeout = read_timeout or None
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        # aiohttp turns a bare number into a total-only timeout, so the connect and read limits are
+        # passed as a ClientTimeout. An explicit timeout only comes with getUpdates, which may wait on
+        # the socket for the whole long poll, so the read limit does not apply to it.
+        if timeout is None:
+            client_timeout = ClientTimeout(total=self.timeout, connect=self.connect_timeout, sock_read=self.read_timeout)
+        else:
+            client_timeout = ClientTimeout(total=timeout, connect=self.connect_timeout)
+        return await super().make_request(bot, method, timeout=client_timeout)
@@ -0,0 +1,200 @@
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from logger import logger
+from round_state import RoundState
+from config import ARCHIVE_PATH, ARCHIVE_FLUSH_INTERVAL
+
+# user id, finish time, total shells, live shells, then the fired, live and phone-revealed masks
+# (shell N in bit N-1). A blank is any fired or revealed shell whose live bit is clear.
+RECORD = struct.Struct('<qIBBxxQQQ')
+
+
+class RoundRecord(NamedTuple):
+    user_id: int
+    finished_at: int
+    total_shots: int
+    not_blank: int
+    fired_mask: int
+    live_mask: int
+    phone_mask: int
+
+
+class RoundArchive:
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.appended = 0
+        self._buffer = bytearray()
+        self._fd: Optional[int] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="round-archive")
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def append(self, user_id: int, round_state: RoundState):
+        not_blank = round_state.remaining_not_blank + bin(round_state.live_mask).count("1")
+        self._buffer += RECORD.pack(
+            user_id,
+            int(time.time()),
+            round_state.total_shots,
+            not_blank,
+            round_state.fired_mask,
+            round_state.live_mask,
+            round_state.phone_mask,
+        )
+        self.appended += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _write(self, chunk: bytes):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # A single O_APPEND write of whole records, so several shard workers can share one file.
+        os.write(self._fd, chunk)
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        chunk, self._buffer = bytes(self._buffer), bytearray()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, chunk)
+        except OSError as e:
+            logger.error("Failed to append %s finished rounds to %s: %s", len(chunk) // RECORD.size, self.path, e)
+            self._buffer[:0] = chunk
+
+    async def close(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._executor.shutdown(wait=True)
+
+
+class ArchiveReader:
+    # Maps the archive read-only and keeps its user id column in a compact array. A user's record numbers
+    # are found by a C-level scan of that column once, then only over the records appended since.
+    def __init__(self, path: str):
+        self.path = path
+        self._mmap: Optional[mmap.mmap] = None
+        self._user_ids = array('q')
+        self._positions: Dict[int, Tuple[array, int]] = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        # A record still being written by another process is picked up next time.
+        count = size // RECORD.size
+        indexed = len(self._user_ids)
+        if count <= indexed:
+            return
+        if self._mmap is not None:
+            self._mmap.close()
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), count * RECORD.size, access=mmap.ACCESS_READ)
+        with memoryview(self._mmap) as view, view[indexed * RECORD.size:].cast('q') as words:
+            self._user_ids.frombytes(words[::RECORD.size // 8].tobytes())
+
+    def records(self, user_id: int) -> List[RoundRecord]:
+        with self._lock:
+            self._refresh()
+            numbers, scanned = self._positions.get(user_id) or (array('I'), 0)
+            user_ids = self._user_ids
+            number = scanned - 1
+            try:
+                while True:
+                    number = user_ids.index(user_id, number + 1)
+                    numbers.append(number)
+            except ValueError:
+                pass
+            self._positions[user_id] = (numbers, len(user_ids))
+            return [RoundRecord(*RECORD.unpack_from(self._mmap, number * RECORD.size)) for number in numbers]
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+
+class UserStats:
+    __slots__ = (
+        'rounds',
+        'live',
+        'blank',
+        'live_streak',
+        'blank_streak',
+        'position_live',
+        'position_total',
+        'phone_rounds',
+        'phone_predictions',
+        'phone_hits',
+    )
+
+    def __init__(self):
+        self.rounds = 0
+        self.live = 0
+        self.blank = 0
+        self.live_streak = 0
+        self.blank_streak = 0
+        self.position_live: List[int] = []
+        self.position_total: List[int] = []
+        self.phone_rounds = 0
+        self.phone_predictions = 0
+        self.phone_hits = 0
+
+    def add(self, record: RoundRecord):
+        self.rounds += 1
+        revealed = record.fired_mask | record.phone_mask
+        if len(self.position_total) < record.total_shots:
+            grow = record.total_shots - len(self.position_total)
+            self.position_total += [0] * grow
+            self.position_live += [0] * grow
+        streak_live = streak_blank = 0
+        for shot in range(record.total_shots):
+            bit = 1 << shot
+            if not revealed & bit:
+                continue
+            self.position_total[shot] += 1
+            if record.live_mask & bit:
+                self.position_live[shot] += 1
+            if not record.fired_mask & bit:
+                continue
+            # Streaks run over the shells fired in order; shells are fired from the first one on.
+            if record.live_mask & bit:
+                self.live += 1
+                streak_live, streak_blank = streak_live + 1, 0
+                self.live_streak = max(self.live_streak, streak_live)
+            else:
+                self.blank += 1
+                streak_live, streak_blank = 0, streak_blank + 1
+                self.blank_streak = max(self.blank_streak, streak_blank)
+        if record.phone_mask:
+            self.phone_rounds += 1
+            self.phone_predictions += bin(record.phone_mask).count("1")
+            self.phone_hits += bin(record.phone_mask & record.fired_mask).count("1")
+
+
+def user_stats(reader: ArchiveReader, user_id: int) -> UserStats:
+    stats = UserStats()
+    for record in reader.records(user_id):
+        stats.add(record)
+    return stats
+
+
+round_archive = RoundArchive(ARCHIVE_PATH, flush_interval=ARCHIVE_FLUSH_INTERVAL)
+archive_reader = ArchiveReader(ARCHIVE_PATH)
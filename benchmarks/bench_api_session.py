@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+os.environ.setdefault('ARCHIVE_PATH', os.devnull)
+
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+
+from api_session import PooledSession
+
+from mock_api import MockBotAPI
+
+# name -> PooledSession settings; "aiogram default" matches a plain AiohttpSession.
+POOLS = {
+    "no keep-alive": dict(pool_size=100, keepalive_timeout=0),
+    "aiogram default": dict(pool_size=100, keepalive_timeout=15),
+    "pool 10": dict(pool_size=10, keepalive_timeout=60),
+    "pool 50": dict(pool_size=50, keepalive_timeout=60),
+    "pool 200": dict(pool_size=200, keepalive_timeout=60),
+}
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1e3 if values else 0.0
+
+
+async def traffic(bot: Bot, calls: int, concurrency: int, pause: float, rng: random.Random) -> list:
+    # Handlers answering taps: mostly edits, some new messages, in waves separated by quiet gaps.
+    timings = []
+
+    async def call(chat_id: int):
+        start = time.perf_counter()
+        if rng.random() < 0.8:
+            await bot.edit_message_text(text="render", chat_id=chat_id, message_id=1)
+        else:
+            await bot.send_message(chat_id=chat_id, text="answer")
+        timings.append(time.perf_counter() - start)
+
+    for wave in range(0, calls, concurrency):
+        await asyncio.gather(*(call(chat_id) for chat_id in range(wave, min(calls, wave + concurrency))))
+        if pause:
+            await asyncio.sleep(pause)
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bot API calls/sec and latency for different connection pool settings.")
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100, help="calls in flight per wave")
+    parser.add_argument("--latency", type=float, default=0.02, help="mock server response time, seconds")
+    parser.add_argument("--pause", type=float, default=0.0, help="idle seconds between waves")
+    parser.add_argument("--port", type=int, default=8083)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    api = MockBotAPI(latency=args.latency)
+    url = await api.start(port=args.port)
+    print(f"{'pool':>16} {'calls/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'connections':>12}")
+    try:
+        for name, settings in POOLS.items():
+            session = PooledSession(api=TelegramAPIServer.from_base(url), **settings)
+            bot = Bot(token="42:BENCHMARK", session=session)
+            api.connections.clear()
+            start = time.perf_counter()
+            timings = await traffic(bot, args.calls, args.concurrency, args.pause, random.Random(args.seed))
+            elapsed = time.perf_counter() - start
+            await session.close()
+            print(f"{name:>16} {len(timings) / elapsed:>8.0f} {percentile(timings, 0.5):>7.1f} "
+                  f"{percentile(timings, 0.99):>7.1f} {max(timings) * 1e3:>7.1f} {len(api.connections):>12}")
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
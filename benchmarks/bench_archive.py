@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+
+from archive import RECORD, ArchiveReader, RoundArchive, RoundRecord, UserStats, user_stats
+from round_state import BLANK, NOT_BLANK, RoundState
+
+
+def finished_round(rng: random.Random) -> RoundState:
+    not_blank, blank = rng.randint(1, 4), rng.randint(1, 4)
+    shells = [NOT_BLANK] * not_blank + [BLANK] * blank
+    rng.shuffle(shells)
+    round_state = RoundState(not_blank, blank)
+    for shot_number, shell in enumerate(shells, 1):
+        if shot_number > round_state.current_shot and rng.random() < 0.1:
+            round_state.add_prediction(shot_number)
+            round_state.set_prediction(shell)
+    while not round_state.is_over:
+        round_state.record_shot(shells[round_state.current_shot - 1])
+    return round_state
+
+
+async def fill(path: str, records: int, users: int, seed: int):
+    rng = random.Random(seed)
+    # A few thousand distinct rounds are enough; the reader only cares about volume and user spread.
+    rounds = [finished_round(rng) for _ in range(4096)]
+    archive = RoundArchive(path, flush_interval=3600)
+    for number in range(records):
+        archive.append(rng.randrange(users), rounds[number % len(rounds)])
+        if number % 100_000 == 0:
+            await archive.flush()
+    await archive.close()
+
+
+def full_scan(path: str, user_id: int) -> UserStats:
+    stats = UserStats()
+    with open(path, "rb") as f:
+        for record in RECORD.iter_unpack(f.read()):
+            if record[0] == user_id:
+                stats.add(RoundRecord(*record))
+    return stats
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a finished-round archive and time /stats queries on it.")
+    parser.add_argument("--records", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rounds.bin")
+        start = time.perf_counter()
+        asyncio.run(fill(path, args.records, args.users, seed=1))
+        print(f"wrote {args.records} records ({os.path.getsize(path) / 2**20:.1f} MiB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        reader = ArchiveReader(path)
+        stats, first = timed(user_stats, reader, 1)
+        print(f"first query (maps the file, loads user ids): {first:8.1f} ms, {stats.rounds} rounds")
+        users = range(2, 102)
+        cold = [timed(user_stats, reader, user_id)[1] for user_id in users]
+        print(f"first query of a user, mean of 100:          {sum(cold) / len(cold):8.2f} ms")
+        warm = [timed(user_stats, reader, user_id)[1] for user_id in users]
+        print(f"repeated query of a user, mean of 100:       {sum(warm) / len(warm):8.2f} ms")
+        _, scan = timed(full_scan, path, 1)
+        print(f"full scan of the file:                       {scan:8.1f} ms")
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aiogram import F, Router
+from aiogram.filters import StateFilter
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from callbacks import Action, CallbackRoutes, encode
+from states import GameStates
+
+SETUP = GameStates.GameSetup.state
+TRACKING = GameStates.GameTracking.state
+PREDICTING = GameStates.PredictingShot.state
+USING_ITEM = GameStates.UsingItem.state
+
+# (legacy callback data, action and arguments, FSM state), in the proportions of a typical round.
+WORKLOAD = [
+    ("set_not_blank_4", (Action.SET_NOT_BLANK, 4), SETUP),
+    ("set_blank_4", (Action.SET_BLANK, 4), SETUP),
+    *[("record_shot_blank", (Action.RECORD_SHOT_BLANK,), TRACKING)] * 4,
+    *[("record_shot_not_blank", (Action.RECORD_SHOT_NOT_BLANK,), TRACKING)] * 4,
+    ("use_phone", (Action.USE_PHONE,), TRACKING),
+    ("predict_shot_6", (Action.PREDICT_SHOT, 6), PREDICTING),
+    ("set_shot_type_blank", (Action.SET_SHOT_TYPE_BLANK,), PREDICTING),
+    ("use_magnifier", (Action.USE_MAGNIFIER,), TRACKING),
+    ("magnifier_not_blank", (Action.MAGNIFIER_NOT_BLANK,), USING_ITEM),
+    ("reset_game", (Action.RESET_GAME,), TRACKING),
+    ("start_new_game", (Action.START_NEW_GAME,), None),
+]
+
+
+async def handled(*args, **kwargs):
+    return True
+
+
+def legacy_routers() -> Router:
+    # The filter chain the handlers used before the codec, in the same router order.
+    root = Router()
+    setup, reset, tracking, phone, items, cancel = (Router() for _ in range(6))
+
+    async def set_not_blank(callback: CallbackQuery):
+        return int(re.match(r'set_not_blank_(\d+)', callback.data).group(1))
+
+    async def set_blank(callback: CallbackQuery):
+        return int(re.match(r'set_blank_(\d+)', callback.data).group(1))
+
+    async def predict_shot(callback: CallbackQuery):
+        return int(re.match(r'predict_shot_(\d+)', callback.data).group(1))
+
+    setup.callback_query.register(set_not_blank, F.data.startswith("set_not_blank_"), StateFilter(GameStates.GameSetup))
+    setup.callback_query.register(set_blank, F.data.startswith("set_blank_"), StateFilter(GameStates.GameSetup))
+    reset.callback_query.register(handled, F.data == "start_new_game")
+    tracking.callback_query.register(handled, F.data == "record_shot_blank", StateFilter(GameStates.GameTracking))
+    tracking.callback_query.register(handled, F.data == "record_shot_not_blank", StateFilter(GameStates.GameTracking))
+    phone.callback_query.register(handled, F.data == "use_phone", StateFilter(GameStates.GameTracking))
+    phone.callback_query.register(predict_shot, F.data.startswith("predict_shot_"), StateFilter(GameStates.PredictingShot))
+    phone.callback_query.register(handled, F.data.startswith("set_shot_type_"), StateFilter(GameStates.PredictingShot))
+    items.callback_query.register(handled, F.data.in_({"use_magnifier", "use_beer"}), StateFilter(GameStates.GameTracking))
+    items.callback_query.register(handled, F.data == "use_inverter", StateFilter(GameStates.GameTracking))
+    items.callback_query.register(
+        handled,
+        F.data.in_({"magnifier_blank", "magnifier_not_blank", "beer_blank", "beer_not_blank"}),
+        StateFilter(GameStates.UsingItem),
+    )
+    items.callback_query.register(handled, F.data == "cancel_item", StateFilter(GameStates.UsingItem))
+    cancel.callback_query.register(handled, F.data == "cancel_predict", StateFilter(GameStates.PredictingShot))
+    cancel.callback_query.register(handled, F.data == "reset_game", StateFilter(GameStates.GameTracking))
+    cancel.callback_query.register(
+        handled,
+        F.data == "cancel",
+        StateFilter(GameStates.GameSetup, GameStates.GameTracking, GameStates.PredictingShot, GameStates.UsingItem),
+    )
+    for router in (setup, reset, tracking, phone, items, cancel):
+        root.include_router(router)
+    return root
+
+
+def indexed_routers() -> Router:
+    routes = CallbackRoutes(name="bench")
+    tracking = (GameStates.GameTracking,)
+    for action, states in [
+        (Action.SET_NOT_BLANK, (GameStates.GameSetup,)),
+        (Action.SET_BLANK, (GameStates.GameSetup,)),
+        (Action.START_NEW_GAME, ()),
+        (Action.RECORD_SHOT_BLANK, tracking),
+        (Action.RECORD_SHOT_NOT_BLANK, tracking),
+        (Action.USE_PHONE, tracking),
+        (Action.PREDICT_SHOT, (GameStates.PredictingShot,)),
+        (Action.SET_SHOT_TYPE_BLANK, (GameStates.PredictingShot,)),
+        (Action.SET_SHOT_TYPE_NOT_BLANK, (GameStates.PredictingShot,)),
+        (Action.USE_MAGNIFIER, tracking),
+        (Action.USE_BEER, tracking),
+        (Action.USE_INVERTER, tracking),
+        (Action.MAGNIFIER_BLANK, (GameStates.UsingItem,)),
+        (Action.MAGNIFIER_NOT_BLANK, (GameStates.UsingItem,)),
+        (Action.BEER_BLANK, (GameStates.UsingItem,)),
+        (Action.BEER_NOT_BLANK, (GameStates.UsingItem,)),
+        (Action.CANCEL_ITEM, (GameStates.UsingItem,)),
+        (Action.CANCEL_PREDICT, (GameStates.PredictingShot,)),
+        (Action.RESET_GAME, tracking),
+        (Action.CANCEL, (GameStates.GameSetup, GameStates.GameTracking, GameStates.PredictingShot, GameStates.UsingItem)),
+    ]:
+        routes.route(action, *states)(handled)
+    return routes.router
+
+
+def callback(data: str) -> CallbackQuery:
+    user = User(id=1, is_bot=False, first_name="user")
+    message = Message(message_id=1, date=0, chat=Chat(id=1, type="private"), text="tracker")
+    return CallbackQuery(id="1", from_user=user, chat_instance="1", data=data, message=message)
+
+
+async def measure(router: Router, events: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for event, raw_state in events:
+            result = await router.propagate_event(update_type="callback_query", event=event, raw_state=raw_state)
+            assert result is not None
+    return (time.perf_counter() - start) / (rounds * len(events)) * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Routing cost per callback query: filter chain vs (state, action) index.")
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    legacy_events = [(callback(data), state) for data, _, state in WORKLOAD]
+    indexed_events = [(callback(encode(*action)), state) for _, action, state in WORKLOAD]
+    legacy = legacy_routers()
+    indexed = indexed_routers()
+    await measure(legacy, legacy_events, 10)
+    await measure(indexed, indexed_events, 10)
+    before = await measure(legacy, legacy_events, args.rounds)
+    after = await measure(indexed, indexed_events, args.rounds)
+    print(f"{'routing':>16} {'us/callback':>12}")
+    print(f"{'filter chain':>16} {before:>12.1f}")
+    print(f"{'indexed':>16} {after:>12.1f}")
+    print(f"{'speedup':>16} {before / after:>11.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+os.environ.setdefault('ARCHIVE_PATH', os.devnull)
+os.chdir(ROOT)
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Update
+
+from bot import bot, dp, game_isolation
+from callbacks import Action, encode
+from handlers import register_handlers
+from render import drain_edits
+
+from mock_session import RecordingSession
+from updates import callback_update, full_round_updates
+
+
+class ChatWideIsolation:
+    # The per-game locks collapsed onto one lock per chat: what a group table gets when every
+    # tracker shares one record, so taps on different games queue behind each other.
+    def __init__(self, isolation):
+        self.isolation = isolation
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey):
+        async with self.isolation.lock(StorageKey(bot_id=key.bot_id, chat_id=key.chat_id, user_id=key.chat_id)):
+            yield
+
+    async def close(self):
+        pass
+
+
+def game_stream(group_id: int, message_id: int, players: int, rounds: int, rng: random.Random) -> list:
+    # Rounds on one tracker message, each tap from a random member of the table.
+    stream = []
+    for _ in range(rounds):
+        taps = [encode(Action.START_NEW_GAME)]
+        taps += [update["callback_query"]["data"] for update in full_round_updates(0, rng, phone_uses=1)[1:]]
+        for data in taps:
+            update = callback_update(1000 + rng.randrange(players), data, message_id=message_id, group_id=group_id)
+            stream.append(Update.model_validate(update, context={"bot": bot}))
+    return stream
+
+
+async def play(stream: list, latencies: list):
+    for update in stream:
+        start = time.perf_counter()
+        await dp.feed_update(bot, update)
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure(games: int, args, group_id: int) -> tuple:
+    rng = random.Random(args.seed)
+    streams = [game_stream(group_id, message_id, args.players, args.rounds, rng) for message_id in range(1, games + 1)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(play(stream, latencies) for stream in streams))
+    await drain_edits()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Throughput of concurrent tracker games in one group chat.")
+    parser.add_argument("--games", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per game")
+    parser.add_argument("--players", type=int, default=4, help="members tapping each game")
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated Bot API latency in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    register_handlers(dp)
+    bot.session = RecordingSession(latency=args.latency)
+
+    print(f"{'games':>6} {'per-game upd/s':>15} {'p99 ms':>8} {'chat lock upd/s':>16} {'p99 ms':>8} {'speedup':>8}")
+    group_ids = iter(range(-1_000_000, 0))
+    for games in args.games:
+        dp.fsm.events_isolation = game_isolation
+        per_game, per_game_p99 = await measure(games, args, next(group_ids))
+        dp.fsm.events_isolation = ChatWideIsolation(game_isolation)
+        chat_wide, chat_wide_p99 = await measure(games, args, next(group_ids))
+        print(f"{games:>6} {per_game:>15.0f} {per_game_p99:>8.2f} {chat_wide:>16.0f} {chat_wide_p99:>8.2f} {per_game / chat_wide:>7.1f}x")
+    dp.fsm.events_isolation = game_isolation
+    print(f"locks left: {len(game_isolation)}, contended acquisitions: {game_isolation.stats.contended}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+os.environ.setdefault('ARCHIVE_PATH', os.devnull)
+os.chdir(ROOT)
+
+from aiogram.types import Update
+
+from bot import bot, dp, metrics
+from handlers import register_handlers
+from handlers.inline import inline_results
+from solver import solver_table
+
+from mock_session import RecordingSession
+from updates import inline_update
+
+
+def random_query(rng: random.Random) -> str:
+    # What a player would type mid-round: the load, a few fired shells, maybe a phone reveal.
+    not_blank, blank = rng.randint(1, 4), rng.randint(1, 4)
+    shells = [rng.choice("LB") for _ in range(rng.randint(0, (not_blank + blank) // 2))]
+    rest = ["?"] * (not_blank + blank - len(shells))
+    if len(rest) > 1 and rng.random() < 0.3:
+        rest[rng.randrange(1, len(rest))] = rng.choice("LB")
+    return f"{not_blank}/{blank} {''.join(shells + rest)}"
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1e6 if values else 0.0
+
+
+async def play(updates: list) -> list:
+    timings = []
+    for raw in updates:
+        update = Update.model_validate(raw, context={"bot": bot})
+        start = time.perf_counter()
+        await dp.feed_update(bot, update)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Latency of inline answers with a cold and a warm result cache.")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    register_handlers(dp)
+    solver_table.load()
+    bot.session = RecordingSession()
+    rng = random.Random(args.seed)
+    updates = [inline_update(user_id, random_query(rng)) for user_id in range(args.queries)]
+
+    inline_results.cache_clear()
+    uncached = []
+    for raw in updates:
+        # Every answer rendered from scratch.
+        inline_results.cache_clear()
+        uncached += await play([raw])
+    inline_results.cache_clear()
+    cold = await play(updates)
+    warm = await play(updates)
+    info = inline_results.cache_info()
+    print(f"distinct queries: {info.currsize}, storage operations: {sum(h.count for h in metrics.storage_latency.values())}")
+    print(f"{'cache':>10} {'p50 us':>8} {'p99 us':>8} {'answers/s':>10}")
+    for name, timings in (("none", uncached), ("cold", cold), ("warm", warm)):
+        print(f"{name:>10} {percentile(timings, 0.5):>8.1f} {percentile(timings, 0.99):>8.1f} {len(timings) / sum(timings):>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
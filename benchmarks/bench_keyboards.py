@@ -0,0 +1,34 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+
+import keyboards
+
+NUMBER = 2000
+
+
+def per_tap(make_markup):
+    return min(timeit.repeat(make_markup, number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+
+def main():
+    cases = [
+        ("setup_game_keyboard", lambda: keyboards.setup_game_keyboard(selected={'not_blank': 3}, lang="ru")),
+        ("game_tracking_keyboard", lambda: keyboards.game_tracking_keyboard(lang="ru")),
+        ("create_predict_shot_keyboard", lambda: keyboards.create_predict_shot_keyboard(8, 3, lang="ru")),
+        ("select_shot_type_keyboard", lambda: keyboards.select_shot_type_keyboard(lang="ru")),
+    ]
+    print(f"{'keyboard':>30} {'uncached us':>12} {'cached us':>10}")
+    for name, make_markup in cases:
+        keyboards.clear_keyboard_cache()
+        uncached = per_tap(lambda: (keyboards.clear_keyboard_cache(), make_markup()))
+        keyboards.warm_keyboard_cache()
+        cached = per_tap(make_markup)
+        print(f"{name:>30} {uncached:>12.2f} {cached:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
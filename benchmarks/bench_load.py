@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+# Benchmark rounds stay out of the finished-round archive.
+os.environ.setdefault('ARCHIVE_PATH', os.devnull)
+# Translations are loaded from a path relative to the repository root.
+os.chdir(ROOT)
+
+from aiogram.types import Update
+
+from bot import bot, dp
+from callbacks import decode
+from handlers import register_handlers
+from render import drain_edits
+
+from mock_session import RecordingSession
+from updates import full_round_updates
+
+
+def update_kind(update: dict) -> str:
+    if "message" in update:
+        return update["message"].get("text", "message").split()[0]
+    if "callback_query" in update:
+        payload = decode(update["callback_query"].get("data"))
+        if payload is None:
+            return "callback"
+        return payload.action.name.lower() + "_N" * len(payload.args)
+    return "other"
+
+
+def update_user(update: dict) -> int:
+    for field in ("message", "callback_query"):
+        if field in update:
+            return update[field]["from"]["id"]
+    return 0
+
+
+def generate(users: int, rounds: int, phone_uses: int, seed: int, first_user: int = 1) -> dict:
+    rng = random.Random(seed)
+    streams = {}
+    for user_id in range(first_user, first_user + users):
+        streams[user_id] = [update for _ in range(rounds) for update in full_round_updates(user_id, rng, phone_uses)]
+    return streams
+
+
+def load_replay(path: str) -> dict:
+    # One Telegram Update object per line, as returned by getUpdates or posted to the webhook.
+    streams = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                update = json.loads(line)
+                streams[update_user(update)].append(update)
+    return streams
+
+
+def save_replay(path: str, streams: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        for stream in streams.values():
+            for update in stream:
+                f.write(json.dumps(update, ensure_ascii=False) + "\n")
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def play(stream: list, latencies: dict, limit: asyncio.Semaphore):
+    async with limit:
+        for kind, update in stream:
+            start = time.perf_counter()
+            await dp.feed_update(bot, update)
+            latencies[kind].append(time.perf_counter() - start)
+
+
+def parse(streams: dict) -> list:
+    # Updates are validated up front, so the timings cover dispatching and handlers only.
+    return [
+        [(update_kind(raw), Update.model_validate(raw, context={"bot": bot})) for raw in stream]
+        for stream in streams.values()
+    ]
+
+
+async def measure_memory(users: int, seed: int) -> float:
+    # Every user is left mid-round (after setup and the first shot), so their FSM record, render cache
+    # entry and lock stay alive while the heap is measured.
+    streams = generate(users, 1, 0, seed, first_user=10_000_000)
+    parsed = parse({user_id: stream[:4] for user_id, stream in streams.items()})
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    limit = asyncio.Semaphore(users)
+    await asyncio.gather(*(play(stream, defaultdict(list), limit) for stream in parsed))
+    await drain_edits()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / users
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Feed synthetic or captured updates through the dispatcher.")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per synthetic user")
+    parser.add_argument("--phone", type=int, default=1, help="phone predictions per synthetic round")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--replay", help="JSONL file with one Update per line to replay instead of synthetic users")
+    parser.add_argument("--save", help="write the played updates to this JSONL file")
+    parser.add_argument("--concurrency", type=int, default=50, help="users playing at the same time")
+    parser.add_argument("--memory-users", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    register_handlers(dp)
+    session = RecordingSession()
+    bot.session = session
+
+    streams = load_replay(args.replay) if args.replay else generate(args.users, args.rounds, args.phone, args.seed)
+    if args.save:
+        save_replay(args.save, streams)
+    parsed = parse(streams)
+    rounds = sum(1 for stream in parsed for kind, _ in stream if kind == "/start")
+
+    latencies = defaultdict(list)
+    start = time.perf_counter()
+    limit = asyncio.Semaphore(args.concurrency)
+    await asyncio.gather(*(play(stream, latencies, limit) for stream in parsed))
+    await drain_edits()
+    elapsed = time.perf_counter() - start
+
+    every = sorted(value for values in latencies.values() for value in values)
+    print(f"users:          {len(parsed)}")
+    print(f"updates:        {len(every)}")
+    print(f"throughput:     {len(every) / elapsed:.0f} updates/sec")
+    print(f"latency p50:    {percentile(every, 0.5) * 1000:.3f} ms")
+    print(f"latency p99:    {percentile(every, 0.99) * 1000:.3f} ms")
+    print(f"api calls:      {len(session.calls)} ({len(session.calls) / max(rounds, 1):.1f} per round over {rounds} rounds)")
+    for method, count in sorted(session.count_by_method().items()):
+        print(f"  {method:<22} {count}")
+    print(f"{'update':>24} {'count':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"{kind:>24} {len(values):>8} {percentile(values, 0.5) * 1000:>8.3f} {percentile(values, 0.99) * 1000:>8.3f}")
+
+    if args.memory_users:
+        per_user = await measure_memory(args.memory_users, args.seed)
+        print(f"memory:         {per_user / 1024:.2f} KiB per active user")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
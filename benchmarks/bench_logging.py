@@ -0,0 +1,107 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logger import LOG_FORMAT, SamplingFilter, log_context, setup_logging
+
+UPDATES = 50000
+USER_ID = 123456789
+SLOW_SINK_DELAY = 0.00005
+
+
+def legacy_update(log, shot):
+    # The log traffic of one record_shot tap before: eager f-strings, written on the calling thread.
+    log.info(f"Handler 'record_shot_blank' triggered by user {USER_ID}")
+    log.debug(f"User {USER_ID} | Shot Type: blank | Current Shot: {shot} | Remaining Blank: 3 | Remaining Not Blank: 4")
+    log.info(f"User {USER_ID} recorded shot {shot}: blank")
+    log.info(f"Updated probabilities for user {USER_ID}: blank={42.857:.2f}%, not_blank={57.143:.2f}%")
+    log.debug(f"User {USER_ID} state set back to GameTracking.")
+
+
+def structured_update(log, updates_log, shot):
+    token = log_context.set({"user_id": USER_ID, "handler": "record_shot_blank", "state": "GameStates:GameTracking"})
+    log.debug("Handler 'record_shot_blank' triggered")
+    log.debug("Shot Type: %s | Current Shot: %s | Remaining Blank: %s | Remaining Not Blank: %s", "blank", shot, 3, 4)
+    log.info("Recorded shot %s: %s", shot, "blank")
+    log.debug("Updated probabilities: blank=%.2f%%, not_blank=%.2f%%", 42.857, 57.143)
+    log.debug("State set back to GameTracking.")
+    updates_log.info("Update handled", extra={"latency": 0.25})
+    log_context.reset(token)
+
+
+class SlowStream:
+    # A sink that blocks on every flush, like a full stderr pipe or a busy disk.
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+        time.sleep(self.delay)
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+
+def run_legacy(path, delay=0.0):
+    reset_root()
+    with open(path, "w") as file:
+        stream = SlowStream(file, delay) if delay else file
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT.replace('%(context)s', '')))
+        logging.getLogger().addHandler(handler)
+        logging.getLogger().setLevel(logging.INFO)
+        log = logging.getLogger("bot_logger")
+        start = time.perf_counter()
+        for shot in range(UPDATES):
+            legacy_update(log, shot)
+        elapsed = time.perf_counter() - start
+    reset_root()
+    return elapsed, elapsed
+
+
+def run_structured(path, sampling=None, delay=0.0):
+    reset_root()
+    with open(path, "w") as file:
+        stream = SlowStream(file, delay) if delay else file
+        listener = setup_logging(sampling=SamplingFilter(sampling or {}), stream=stream)
+        log = logging.getLogger("bot_logger")
+        updates_log = logging.getLogger("bot_logger.updates")
+        start = time.perf_counter()
+        for shot in range(UPDATES):
+            structured_update(log, updates_log, shot)
+        on_loop = time.perf_counter() - start
+        listener.stop()
+        total = time.perf_counter() - start
+    reset_root()
+    return on_loop, total
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bot.log")
+        runs = [
+            ("f-strings, inline handler", lambda: run_legacy(path)),
+            ("lazy, queue listener", lambda: run_structured(path)),
+            ("lazy, queue, 1/10 sampled", lambda: run_structured(path, {"bot_logger": 10, "bot_logger.updates": 10})),
+            ("f-strings, slow sink", lambda: run_legacy(path, SLOW_SINK_DELAY)),
+            ("lazy, queue, slow sink", lambda: run_structured(path, delay=SLOW_SINK_DELAY)),
+        ]
+        print(f"{'configuration':>26} {'loop µs/update':>15} {'total µs/update':>16}")
+        for name, run in runs:
+            on_loop, total = run()
+            print(f"{name:>26} {on_loop / UPDATES * 1e6:>15.2f} {total / UPDATES * 1e6:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
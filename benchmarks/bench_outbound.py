@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+
+from outbound import OutboundScheduler
+
+from mock_api import MockBotAPI
+
+
+async def burst(bot, chats, taps, interval):
+    # Every tap renders a new tracker text and fires the edit without waiting, like render.edit_message.
+    failures = 0
+
+    async def edit(chat_id, tap):
+        nonlocal failures
+        try:
+            await bot.edit_message_text(text=f"render {tap}", chat_id=chat_id, message_id=1)
+        except TelegramRetryAfter:
+            failures += 1
+
+    tasks = []
+    for tap in range(taps):
+        for chat_id in range(1, chats + 1):
+            tasks.append(asyncio.create_task(edit(chat_id, tap)))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+    return failures
+
+
+async def run(url, scheduler, args):
+    session = AiohttpSession(api=TelegramAPIServer.from_base(url))
+    if scheduler is not None:
+        session.middleware(scheduler)
+    bot = Bot(token="42:BENCHMARK", session=session)
+    start = time.perf_counter()
+    failures = await burst(bot, args.chats, args.taps, args.interval)
+    elapsed = time.perf_counter() - start
+    await session.close()
+    return failures, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Burst edits against a local mock Bot API with per-chat flood limits.")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--taps", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between taps in every chat")
+    parser.add_argument("--port", type=int, default=8082)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    print(f"{'mode':>10} {'edits sent':>11} {'429s':>6} {'failed':>7} {'coalesced':>10} {'seconds':>8}")
+    for name in ("direct", "scheduled"):
+        api = MockBotAPI(chat_limit=4, window=1.0, retry_after=1)
+        url = await api.start(port=args.port)
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=1, chat_burst=3) if name == "scheduled" else None
+        failures, elapsed = await run(url, scheduler, args)
+        await api.stop()
+        coalesced = scheduler.stats.coalesced if scheduler else 0
+        print(f"{name:>10} {api.calls['editmessagetext']:>11} {api.flood_errors:>6} {failures:>7} {coalesced:>10} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
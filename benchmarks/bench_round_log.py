@@ -0,0 +1,60 @@
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from round_log import INVERT, SHOT, RoundLog, apply_event, phone_event
+from round_state import REVISION_FIELD, RoundState, BLANK, NOT_BLANK
+
+
+def play_round(total_shots: int) -> tuple:
+    # Every shell is shot, a third of them revealed by the phone first and a few inverted.
+    rng = random.Random(total_shots)
+    not_blank = total_shots // 2
+    shells = [NOT_BLANK] * not_blank + [BLANK] * (total_shots - not_blank)
+    rng.shuffle(shells)
+    round_state = RoundState(not_blank, total_shots - not_blank)
+    log = RoundLog.start(not_blank, total_shots - not_blank)
+    for shot_number in range(1, total_shots + 1):
+        if shot_number % 3 == 0 and round_state.status(shot_number) is None:
+            log.append(round_state, phone_event(shot_number, shells[shot_number - 1]))
+        if shot_number % 5 == 0 and round_state.status(shot_number) is None:
+            log.append(round_state, INVERT)
+            log.append(round_state, INVERT)
+        log.append(round_state, SHOT[shells[shot_number - 1]])
+    # Step back one event so the undo below still has a predecessor to rebuild.
+    return log, log.undo(round_state)
+
+
+def replay_from_setup(log: RoundLog, cursor: int) -> RoundState:
+    round_state = log.initial_state()
+    for event in log.events[:cursor]:
+        apply_event(round_state, event)
+    return round_state
+
+
+def position(round_state: RoundState) -> list:
+    # The undone round gets a new revision, so only the rest of the state has to match the replay.
+    data = round_state.to_data()
+    del data[REVISION_FIELD]
+    return data
+
+
+def main():
+    print(f"{'shells':>6} {'events':>7} {'undo us':>8} {'replay us':>10} {'log bytes':>10} {'round bytes':>12}")
+    for total_shots in (4, 8, 16, 31):
+        log, round_state = play_round(total_shots)
+        cursor = round_state.version
+        assert position(log.undo(round_state)) == position(replay_from_setup(log, cursor - 1))
+        undo = min(timeit.repeat(lambda: log.undo(round_state), number=1000, repeat=5)) / 1000 * 1e6
+        replay = min(timeit.repeat(lambda: replay_from_setup(log, cursor - 1), number=1000, repeat=5)) / 1000 * 1e6
+        log_bytes = len(json.dumps(log.to_data(), separators=(",", ":")))
+        round_bytes = len(json.dumps(round_state.to_data(), separators=(",", ":")))
+        print(f"{total_shots:>6} {len(log.events):>7} {undo:>8.1f} {replay:>10.1f} {log_bytes:>10} {round_bytes:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from round_state import RoundState, BLANK, NOT_BLANK
+
+
+def legacy_tap(history, phone_predictions, total_shots, current_shot, shot_type):
+    predicted_result = None
+    for pred in phone_predictions:
+        if pred['shot_number'] == current_shot:
+            predicted_result = pred.get('result')
+            break
+    history.append({'shot_number': current_shot, 'result': predicted_result or shot_type})
+    emojis = []
+    for i in range(1, total_shots + 1):
+        shot_record = next((shot for shot in history if shot['shot_number'] == i), None)
+        if shot_record:
+            emojis.append('✅' if shot_record['result'] == BLANK else '💥')
+            continue
+        prediction = next((pred for pred in phone_predictions if pred['shot_number'] == i and pred['result']), None)
+        if prediction:
+            emojis.append('✅' if prediction['result'] == BLANK else '💥')
+        else:
+            emojis.append('❓')
+    return emojis
+
+
+def engine_tap(round_state, shot_type):
+    round_state.record_shot(shot_type)
+    emojis = []
+    for i in range(1, round_state.total_shots + 1):
+        result = round_state.status(i)
+        emojis.append(('✅' if result == BLANK else '💥') if result else '❓')
+    return emojis
+
+
+def make_sequence(total_shots):
+    not_blank = total_shots // 2
+    sequence = [NOT_BLANK] * not_blank + [BLANK] * (total_shots - not_blank)
+    random.Random(total_shots).shuffle(sequence)
+    return sequence
+
+
+def bench_legacy(total_shots, repeat):
+    sequence = make_sequence(total_shots)
+    predicted = list(range(total_shots // 2, total_shots + 1, 3))
+
+    def round_():
+        history = []
+        phone_predictions = [{'shot_number': i, 'result': sequence[i - 1]} for i in predicted]
+        for current_shot in range(1, total_shots + 1):
+            legacy_tap(history, phone_predictions, total_shots, current_shot, sequence[current_shot - 1])
+
+    return min(timeit.repeat(round_, number=1, repeat=repeat)) / total_shots
+
+
+def bench_engine(total_shots, repeat):
+    sequence = make_sequence(total_shots)
+    predicted = list(range(total_shots // 2, total_shots + 1, 3))
+
+    def round_():
+        round_state = RoundState(sequence.count(NOT_BLANK), sequence.count(BLANK))
+        for i in predicted:
+            round_state.add_prediction(i)
+            round_state.set_prediction(sequence[i - 1])
+        for current_shot in range(1, total_shots + 1):
+            round_state = RoundState.from_data(round_state.to_data())
+            engine_tap(round_state, sequence[current_shot - 1])
+
+    return min(timeit.repeat(round_, number=1, repeat=repeat)) / total_shots
+
+
+def main():
+    print(f"{'shells':>6} {'legacy us/tap':>14} {'engine us/tap':>14} {'speedup':>8}")
+    for total_shots in (8, 16, 32, 64, 128, 256):
+        legacy = bench_legacy(total_shots, repeat=20) * 1e6
+        engine = bench_engine(total_shots, repeat=20) * 1e6
+        print(f"{total_shots:>6} {legacy:>14.2f} {engine:>14.2f} {legacy / engine:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
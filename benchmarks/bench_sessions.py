@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from round_log import start_log
+from storage import BoundedStorage, SQLiteStorage
+
+
+async def play(storage, key):
+    # One short game of a user who never comes back: setup, a few shots, then nothing.
+    await storage.set_data(key, {"language": "eng", "log": start_log(4, 4)})
+    await storage.set_state(key, "GameStates:GameTracking")
+    for shot in range(4):
+        data = await storage.get_data(key)
+        data['round'] = [8, shot, 4, 4, 0, 0, 0, 0, 0, shot]
+        await storage.set_data(key, data)
+
+
+def resident(storage) -> int:
+    return len(storage) if isinstance(storage, BoundedStorage) else len(storage.storage)
+
+
+async def run(name: str, storage, users: int, waves: int):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    per_wave = users // waves
+    for wave in range(waves):
+        for user_id in range(wave * per_wave, (wave + 1) * per_wave):
+            await play(storage, StorageKey(bot_id=42, chat_id=user_id, user_id=user_id))
+        heap = (tracemalloc.get_traced_memory()[0] - base) / 2 ** 20
+        print(f"{name:>16} {(wave + 1) * per_wave:>8} {resident(storage):>10} {heap:>9.1f}")
+    tracemalloc.stop()
+    # The first users come back: their sessions are read back from the spill file, if any.
+    start = time.perf_counter()
+    restored = 0
+    for user_id in range(per_wave):
+        data = await storage.get_data(StorageKey(bot_id=42, chat_id=user_id, user_id=user_id))
+        restored += 'round' in data
+    elapsed = (time.perf_counter() - start) / per_wave * 1e6
+    print(f"{name:>16} returning users: {restored}/{per_wave} restored, {elapsed:.1f} us each")
+    await storage.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Memory held by FSM sessions as one-off users pile up.")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--waves", type=int, default=5)
+    parser.add_argument("--max-mb", type=float, default=4)
+    args = parser.parse_args()
+
+    max_bytes = int(args.max_mb * 2 ** 20)
+    print(f"{'storage':>16} {'users':>8} {'resident':>10} {'heap MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        await run("memory", MemoryStorage(), args.users, args.waves)
+        await run("bounded", BoundedStorage(max_bytes=max_bytes), args.users, args.waves)
+        spill = SQLiteStorage(os.path.join(tmp, "spill.sqlite3"), keep_cache=False)
+        await run("bounded + spill", BoundedStorage(max_bytes=max_bytes, spill=spill), args.users, args.waves)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+# Benchmark rounds stay out of the finished-round archive.
+os.environ.setdefault('ARCHIVE_PATH', os.devnull)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.chdir(ROOT)
+
+from sharding import WorkerPool
+
+from updates import full_round_updates, message_update
+
+
+def use_recording_session(bot, dp):
+    # Runs inside every worker: Bot API calls are answered locally.
+    from mock_session import RecordingSession
+    bot.session = RecordingSession()
+
+
+def interleave(users: int, rounds: int, seed: int) -> list:
+    # Round-robin over users, so consecutive updates of one user are far apart like in real traffic.
+    rng = random.Random(seed)
+    streams = [
+        [update for _ in range(rounds) for update in full_round_updates(user_id, rng)]
+        for user_id in range(1, users + 1)
+    ]
+    return [update for batch in itertools.zip_longest(*streams) for update in batch if update is not None]
+
+
+async def wait_processed(pool: WorkerPool, target: int):
+    while pool.total_processed() < target:
+        await asyncio.sleep(0.01)
+
+
+async def run(workers: int, updates: list, queue_size: int) -> float:
+    pool = WorkerPool(workers, queue_size, setup=use_recording_session)
+    pool.start()
+    # One warm-up update per shard waits out process start-up and imports.
+    warmup = [message_update(user_id, "/ru") for user_id in range(10_000_000, 10_000_000 + workers * 8)]
+    for update in warmup:
+        await pool.put_wait(update, json.dumps(update).encode())
+    await wait_processed(pool, len(warmup))
+
+    payloads = [(update, json.dumps(update).encode()) for update in updates]
+    start = time.perf_counter()
+    for update, payload in payloads:
+        await pool.put_wait(update, payload)
+    await wait_processed(pool, len(warmup) + len(payloads))
+    elapsed = time.perf_counter() - start
+    await pool.stop()
+    return len(payloads) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Throughput of the sharded mode with 1..N worker processes.")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    updates = interleave(args.users, args.rounds, seed=1)
+    print(f"{len(updates)} updates, {os.cpu_count()} cores")
+    print(f"{'workers':>8} {'updates/sec':>12} {'speedup':>8}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        throughput = await run(workers, updates, args.queue_size)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>12.0f} {throughput / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
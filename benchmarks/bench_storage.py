@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from storage import BoundedStorage, SQLiteStorage
+
+USERS = 500
+TAPS = 20
+
+
+async def tap(storage, key, shot):
+    # Mirrors the storage traffic of one record_shot update.
+    await storage.get_state(key)
+    data = await storage.get_data(key)
+    data['round'] = [8, shot, 4, 4, 0, 0, 0, 0, 0]
+    await storage.set_data(key, data)
+    await storage.set_state(key, "GameStates:GameTracking")
+
+
+async def run(storage):
+    keys = [StorageKey(bot_id=42, chat_id=user_id, user_id=user_id) for user_id in range(USERS)]
+    for key in keys:
+        await storage.set_data(key, {"language": "eng"})
+    start = time.perf_counter()
+    for shot in range(TAPS):
+        await asyncio.gather(*(tap(storage, key, shot) for key in keys))
+    await storage.close()
+    elapsed = time.perf_counter() - start
+    return USERS * TAPS * 4 / elapsed
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ("memory", MemoryStorage()),
+            ("sqlite write-behind", SQLiteStorage(os.path.join(tmp, "batched.sqlite3"))),
+            ("sqlite immediate flush", SQLiteStorage(os.path.join(tmp, "unbatched.sqlite3"), flush_interval=0, batch_size=1)),
+            ("bounded memory", BoundedStorage(idle_ttl=86400, max_bytes=64 * 1024 * 1024)),
+            ("bounded sqlite", BoundedStorage(
+                idle_ttl=86400,
+                max_bytes=64 * 1024 * 1024,
+                spill=SQLiteStorage(os.path.join(tmp, "bounded.sqlite3"), keep_cache=False),
+                write_through=True,
+            )),
+        ]
+        print(f"{'backend':>22} {'ops/sec':>12}")
+        for name, storage in backends:
+            ops = await run(storage)
+            print(f"{name:>22} {ops:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import copy
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+os.environ.setdefault('ARCHIVE_PATH', os.devnull)
+os.chdir(ROOT)
+
+from aiogram.types import Update
+
+from bot import bot, dp, tap_guard
+from handlers import register_handlers
+from render import drain_edits
+
+from mock_session import RecordingSession
+from updates import full_round_updates
+
+
+def twin(raw: dict) -> dict:
+    # A second tap on the same button: same data, new update and callback query ids.
+    raw = copy.deepcopy(raw)
+    raw["update_id"] += 10_000_000
+    raw["callback_query"]["id"] += "b"
+    return raw
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1e6 if values else 0.0
+
+
+async def play(stream: list, double: bool, timings: dict):
+    for raw in stream:
+        update = Update.model_validate(raw, context={"bot": bot})
+        if not double or "callback_query" not in raw:
+            await dp.feed_update(bot, update)
+            continue
+        start = time.perf_counter()
+        await dp.feed_update(bot, update)
+        timings["handled"].append(time.perf_counter() - start)
+        # The second tap of a double tap and a redelivery of the first, each timed on its own.
+        for kind, extra in (("repeated tap", Update.model_validate(twin(raw), context={"bot": bot})), ("redelivery", update)):
+            before = tap_guard.stats.stale + tap_guard.stats.duplicate
+            start = time.perf_counter()
+            await dp.feed_update(bot, extra)
+            elapsed = time.perf_counter() - start
+            if tap_guard.stats.stale + tap_guard.stats.duplicate > before:
+                timings[kind].append(elapsed)
+
+
+async def race(stream: list):
+    # Both taps of a double tap in flight at once, as Telegram delivers them.
+    for raw in stream:
+        updates = [Update.model_validate(raw, context={"bot": bot})]
+        if "callback_query" in raw:
+            updates.append(Update.model_validate(twin(raw), context={"bot": bot}))
+        await asyncio.gather(*(dp.feed_update(bot, update) for update in updates))
+
+
+async def run(streams: list, mode: str) -> tuple:
+    session = RecordingSession()
+    bot.session = session
+    timings = {"handled": [], "repeated tap": [], "redelivery": []}
+    if mode == "race":
+        await asyncio.gather(*(race(stream) for stream in streams))
+    else:
+        await asyncio.gather(*(play(stream, mode == "double", timings) for stream in streams))
+    await drain_edits()
+    return session.count_by_method(), timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Cost and effect of dropping double taps and redelivered callbacks.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    register_handlers(dp)
+
+    def streams(first_user: int) -> list:
+        rng = random.Random(args.seed)
+        return [
+            [update for _ in range(args.rounds) for update in full_round_updates(user_id, rng, 1)]
+            for user_id in range(first_user, first_user + args.users)
+        ]
+
+    single, _ = await run(streams(1), "single")
+    double, timings = await run(streams(1_000_001), "double")
+    raced, _ = await run(streams(2_000_001), "race")
+    print(f"{'api method':>22} {'single':>8} {'double':>8} {'race':>8}")
+    for method in sorted(single):
+        print(f"{method:>22} {single[method]:>8} {double.get(method, 0):>8} {raced.get(method, 0):>8}")
+    print(f"dropped: {tap_guard.stats.duplicate} redelivered, {tap_guard.stats.stale} on outdated keyboards")
+    print(f"{'tap':>14} {'count':>8} {'p50 us':>8} {'p99 us':>8}")
+    for kind, values in timings.items():
+        print(f"{kind:>14} {len(values):>8} {percentile(values, 0.5):>8.1f} {percentile(values, 0.99):>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+
+import aiohttp
+from aiohttp import web
+
+from bot import bot, dp
+from handlers import register_handlers
+from render import drain_edits
+from webhook import SECRET_HEADER, create_app
+
+from mock_session import RecordingSession
+from updates import round_updates
+
+SECRET = "benchmark-secret"
+PATH = "/webhook"
+
+
+async def play(client, url, user_id, latencies):
+    for update in round_updates(user_id):
+        start = time.perf_counter()
+        async with client.post(url, json=update, headers={SECRET_HEADER: SECRET}) as response:
+            await response.read()
+            if response.status != 200:
+                raise RuntimeError(f"Webhook answered {response.status}")
+        latencies.append(time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="POST synthetic updates to the local webhook server.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    register_handlers(dp)
+    session = RecordingSession()
+    bot.session = session
+    app = create_app(dp, bot, path=PATH, secret=SECRET, queue_size=args.queue_size, workers=args.workers)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host="127.0.0.1", port=args.port).start()
+
+    url = f"http://127.0.0.1:{args.port}{PATH}"
+    latencies = []
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as client:
+        async with client.post(url, json={}, headers={SECRET_HEADER: "wrong"}) as response:
+            assert response.status == 401, response.status
+        await asyncio.gather(*(play(client, url, user_id, latencies) for user_id in range(1, args.users + 1)))
+    await app["updates"].queue.join()
+    await drain_edits()
+    elapsed = time.perf_counter() - start
+    await runner.cleanup()
+
+    latencies.sort()
+    print(f"updates:        {len(latencies)}")
+    print(f"throughput:     {len(latencies) / elapsed:.0f} updates/sec")
+    print(f"ack p50:        {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"ack p99:        {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+    print(f"processed:      {app['updates'].processed}, rejected: {app['updates'].rejected}")
+    print(f"api calls:      {session.count_by_method()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
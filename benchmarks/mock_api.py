@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+
+from aiohttp import web
+
+
+class MockBotAPI:
+    # A local stand-in for api.telegram.org that answers Bot API calls and, optionally,
+    # enforces a per-chat flood limit the way Telegram does (429 with retry_after).
+    def __init__(self, chat_limit: int = 0, window: float = 1.0, retry_after: int = 1, latency: float = 0.0):
+        self.chat_limit = chat_limit
+        self.window = window
+        self.retry_after = retry_after
+        self.latency = latency
+        self.calls = defaultdict(int)
+        self.flood_errors = 0
+        # Client addresses seen so far, i.e. TCP connections the client opened.
+        self.connections = set()
+        self._chat_history = defaultdict(deque)
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = None
+
+    def _flooded(self, chat_id) -> bool:
+        if not self.chat_limit or chat_id is None:
+            return False
+        now = time.monotonic()
+        history = self._chat_history[chat_id]
+        while history and now - history[0] > self.window:
+            history.popleft()
+        if len(history) >= self.chat_limit:
+            return True
+        history.append(now)
+        return False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        chat_id = params.get("chat_id")
+        if method != "answercallbackquery" and self._flooded(chat_id):
+            self.flood_errors += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+        self.calls[method] += 1
+        if method in ("sendmessage", "editmessagetext"):
+            result = {
+                "message_id": int(params.get("message_id") or self.calls[method]),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id or 0), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        elif method == "getme":
+            result = {"id": 42, "is_bot": True, "first_name": "mock"}
+        else:
+            result = True
+        return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8082) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=host, port=port).start()
+        # Port 0 takes any free port; report the one actually bound.
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
@@ -0,0 +1,45 @@
+import asyncio
+import datetime
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message
+
+
+class RecordingSession(BaseSession):
+    # Answers every Bot API call locally and records it, so handlers can run without network access.
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: List[Tuple[float, TelegramMethod]] = []
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls.append((time.perf_counter(), method))
+        returning = str(method.__returning__)
+        if "Message" in returning:
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message(
+                message_id=getattr(method, "message_id", None) or len(self.calls),
+                date=datetime.datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    def count_by_method(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for _, method in self.calls:
+            name = type(method).__name__
+            counts[name] = counts.get(name, 0) + 1
+        return counts
@@ -0,0 +1,108 @@
+import itertools
+import time
+
+from callbacks import Action, encode
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _user(user_id: int, language_code: str = "en") -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "language_code": language_code}
+
+
+def _chat(chat_id: int, chat_type: str = "private") -> dict:
+    return {"id": chat_id, "type": chat_type}
+
+
+def message_update(user_id: int, text: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": _chat(user_id),
+            "from": _user(user_id),
+            "text": text,
+        },
+    }
+
+
+def callback_update(user_id: int, data: str, message_id: int = 1, group_id: int = 0) -> dict:
+    # With a group id the tap comes from a member of that supergroup instead of a private chat.
+    chat = _chat(group_id, "supergroup") if group_id else _chat(user_id)
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "chat_instance": str(user_id),
+            "from": _user(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": chat,
+                "from": {"id": 42, "is_bot": True, "first_name": "bot"},
+                "text": "tracker",
+            },
+        },
+    }
+
+
+def inline_update(user_id: int, query: str, language_code: str = "en") -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "inline_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id, language_code),
+            "query": query,
+            "offset": "",
+        },
+    }
+
+
+def round_updates(user_id: int, not_blank: int = 4, blank: int = 4) -> list:
+    updates = [
+        message_update(user_id, "/start"),
+        callback_update(user_id, encode(Action.SET_NOT_BLANK, not_blank)),
+        callback_update(user_id, encode(Action.SET_BLANK, blank)),
+    ]
+    for i in range(not_blank + blank):
+        action = Action.RECORD_SHOT_BLANK if i % 2 else Action.RECORD_SHOT_NOT_BLANK
+        updates.append(callback_update(user_id, encode(action, version=i)))
+    return updates
+
+
+def full_round_updates(user_id: int, rng, phone_uses: int = 1) -> list:
+    # A complete round with a random shell order, replayed through the real engine so every tap is valid:
+    # /start, both counts, phone predictions of future shells and shots until the round is over.
+    from round_state import RoundState, BLANK, NOT_BLANK
+
+    not_blank, blank = rng.randint(1, 6), rng.randint(1, 6)
+    shells = [NOT_BLANK] * not_blank + [BLANK] * blank
+    rng.shuffle(shells)
+    round_state = RoundState(not_blank, blank)
+    updates = [
+        message_update(user_id, "/start"),
+        callback_update(user_id, encode(Action.SET_NOT_BLANK, not_blank)),
+        callback_update(user_id, encode(Action.SET_BLANK, blank)),
+    ]
+    phone_at = set(rng.sample(range(len(shells)), min(phone_uses, len(shells))))
+    while not round_state.is_over:
+        current = round_state.current_shot
+        future = [n for n in range(current, round_state.total_shots + 1)
+                  if not round_state.is_fired(n) and not round_state.has_prediction(n)]
+        if current - 1 in phone_at and future:
+            shot_number = rng.choice(future)
+            shot_type = shells[shot_number - 1]
+            updates.append(callback_update(user_id, encode(Action.USE_PHONE, version=round_state.revision)))
+            updates.append(callback_update(user_id, encode(Action.PREDICT_SHOT, shot_number)))
+            updates.append(callback_update(user_id, encode(Action[f"SET_SHOT_TYPE_{shot_type.upper()}"])))
+            round_state.add_prediction(shot_number)
+            round_state.set_prediction(shot_type)
+            phone_at.discard(current - 1)
+            continue
+        shot_type = shells[current - 1]
+        updates.append(callback_update(user_id, encode(Action[f"RECORD_SHOT_{shot_type.upper()}"], version=round_state.revision)))
+        round_state.record_shot(shot_type)
+    return updates
@@ -1,19 +1,129 @@
 import asyncio
 from aiogram import Bot, Dispatcher, F, Router
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage, SimpleEventIsolation
-from aiogram.fsm.middleware import FSMContextMiddleware
 
-from config import API_TOKEN
+from config import (
+    API_TOKEN,
+    API_POOL_SIZE,
+    API_POOL_PER_HOST,
+    API_KEEPALIVE_TIMEOUT,
+    API_DNS_CACHE_TTL,
+    API_CONNECT_TIMEOUT,
+    API_READ_TIMEOUT,
+    API_TIMEOUT,
+    STORAGE_BACKEND,
+    SQLITE_PATH,
+    SQLITE_FLUSH_INTERVAL,
+    SQLITE_BATCH_SIZE,
+    SESSION_IDLE_TTL,
+    SESSION_MAX_BYTES,
+    SESSION_SPILL_PATH,
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_CHAT_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_MAX_RETRIES,
+    TAP_GUARD_SIZE,
+    METRICS_PORT,
+    shard_path,
+)
+from api_session import PooledSession
+from storage import BoundedStorage, SQLiteStorage
+from games import GameContextMiddleware, GameEventIsolation
+from taps import TapGuard
+from session import StateSessionMiddleware
+from outbound import OutboundScheduler
+from logger import LoggingContextMiddleware
+from metrics import (
+    Metrics,
+    ApiMetricsMiddleware,
+    HandlerMetricsMiddleware,
+    InstrumentedStorage,
+    UpdateMetricsMiddleware,
+    gauge_collector,
+    rounds_collector,
+    stats_collector,
+)
+from render import edit_stats
+from states import GameStates
 
 bot_properties = DefaultBotProperties(parse_mode='Markdown')
-bot = Bot(token=API_TOKEN, default=bot_properties)
+api_session = PooledSession(
+    pool_size=API_POOL_SIZE,
+    per_host=API_POOL_PER_HOST,
+    keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=API_DNS_CACHE_TTL,
+    connect_timeout=API_CONNECT_TIMEOUT,
+    read_timeout=API_READ_TIMEOUT,
+    total_timeout=API_TIMEOUT,
+)
+bot = Bot(token=API_TOKEN, session=api_session, default=bot_properties)
 
-storage = MemoryStorage()
+outbound_scheduler = OutboundScheduler(
+    global_rate=OUTBOUND_GLOBAL_RATE,
+    chat_rate=OUTBOUND_CHAT_RATE,
+    chat_burst=OUTBOUND_CHAT_BURST,
+    max_retries=OUTBOUND_MAX_RETRIES,
+)
+bot.session.middleware(outbound_scheduler)
 
-dp = Dispatcher(storage=storage)
+metrics = Metrics()
+bot.session.middleware(ApiMetricsMiddleware(metrics))
+metrics.collectors.append(stats_collector("bot_outbound", outbound_scheduler.stats))
+metrics.collectors.append(stats_collector("bot_edits", edit_stats))
+
+# SQLite holds every session and memory only the recent ones; with the memory backend the spill
+# file, if any, only receives sessions evicted from memory.
+if STORAGE_BACKEND == 'sqlite':
+    spill = SQLiteStorage(SQLITE_PATH, flush_interval=SQLITE_FLUSH_INTERVAL, batch_size=SQLITE_BATCH_SIZE, keep_cache=False)
+elif SESSION_SPILL_PATH:
+    spill = SQLiteStorage(SESSION_SPILL_PATH, flush_interval=SQLITE_FLUSH_INTERVAL, batch_size=SQLITE_BATCH_SIZE, keep_cache=False)
+else:
+    spill = None
+storage = BoundedStorage(
+    idle_ttl=SESSION_IDLE_TTL,
+    max_bytes=SESSION_MAX_BYTES,
+    spill=spill,
+    write_through=STORAGE_BACKEND == 'sqlite',
+)
+metrics.collectors.append(gauge_collector("bot_session_cache", storage.gauges))
+metrics.collectors.append(stats_collector("bot_session_evictions", storage.stats))
+metrics.collectors.append(rounds_collector(storage.states, finished=[GameStates.GameOver.state]))
+
+game_isolation = GameEventIsolation()
+metrics.collectors.append(stats_collector("bot_game_locks", game_isolation.stats))
+tap_guard = TapGuard(TAP_GUARD_SIZE)
+metrics.collectors.append(stats_collector("bot_dropped_taps", tap_guard.stats))
+
+# The stock FSM middleware is swapped for one that keys group chats per tracker message; the
+# Dispatcher still owns the storage and isolation and closes them on shutdown.
+dp = Dispatcher(storage=InstrumentedStorage(storage, metrics), events_isolation=game_isolation, disable_fsm=True)
+dp.fsm = GameContextMiddleware(storage=dp.fsm.storage, events_isolation=dp.fsm.events_isolation, tap_guard=tap_guard)
+dp.update.outer_middleware(dp.fsm)
 
 router = Router()
 dp.include_router(router)
 
-dp.update.middleware.register(FSMContextMiddleware(storage=storage, events_isolation=SimpleEventIsolation()))
+session_middleware = StateSessionMiddleware(tap_guard)
+dp.update.middleware.register(session_middleware)
+dp.update.middleware.register(UpdateMetricsMiddleware(metrics))
+
+logging_middleware = LoggingContextMiddleware()
+dp.message.middleware.register(logging_middleware)
+dp.callback_query.middleware.register(logging_middleware)
+
+handler_metrics_middleware = HandlerMetricsMiddleware(metrics)
+dp.message.middleware.register(handler_metrics_middleware)
+dp.callback_query.middleware.register(handler_metrics_middleware)
+
+
+def configure_shard(index: int, workers: int) -> int:
+    # Runs in a shard worker before it handles anything. Spawned workers import the parent's main
+    # module, and with it this one, before they know their shard, so the per-shard settings are
+    # applied here rather than read from the environment. Returns the worker's metrics port.
+    if spill is not None:
+        spill.path = shard_path(spill.path, index)
+    # Every worker gets an equal share of the bot-wide limit; per-chat limits stay as they are
+    # because a chat is always served by the same worker.
+    outbound_scheduler.set_global_rate(OUTBOUND_GLOBAL_RATE / workers)
+    # Workers listen on the ports following the ingress one.
+    return METRICS_PORT + 1 + index if METRICS_PORT else 0
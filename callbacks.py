@@ -0,0 +1,183 @@
+from enum import Enum
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+# Wire format: version character, action character, then integer arguments in base 36 separated by
+# dots, e.g. "1P5" for predicting shot 5. Buttons of the tracking keyboard append the round revision as
+# one more argument. Telegram limits callback data to 64 bytes.
+VERSION = '1'
+MAX_CALLBACK_DATA = 64
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+ANY_STATE = '*'
+
+
+class Action(Enum):
+    # Member names match the callback strings used before the codec, so old keyboards keep working.
+    SET_NOT_BLANK = 'n'
+    SET_BLANK = 'b'
+    DISABLED = '_'
+    CANCEL = 'c'
+    RECORD_SHOT_BLANK = 'r'
+    RECORD_SHOT_NOT_BLANK = 'R'
+    USE_PHONE = 'p'
+    PREDICT_SHOT = 'P'
+    SET_SHOT_TYPE_BLANK = 't'
+    SET_SHOT_TYPE_NOT_BLANK = 'T'
+    CANCEL_PREDICT = 'q'
+    RESET_GAME = 'z'
+    START_NEW_GAME = 'g'
+    USE_MAGNIFIER = 'm'
+    USE_BEER = 'e'
+    USE_INVERTER = 'i'
+    MAGNIFIER_BLANK = 'l'
+    MAGNIFIER_NOT_BLANK = 'L'
+    BEER_BLANK = 'k'
+    BEER_NOT_BLANK = 'K'
+    CANCEL_ITEM = 'Q'
+    UNDO = 'u'
+    REDO = 'U'
+
+
+# Number of integer arguments each action carries; anything else is rejected when decoding.
+ARITY: Dict[Action, int] = {action: 0 for action in Action}
+ARITY.update({
+    Action.SET_NOT_BLANK: 1,
+    Action.SET_BLANK: 1,
+    Action.PREDICT_SHOT: 1,
+})
+
+# Actions on the tracking and game over keyboards, which stay in place while the round changes under them.
+VERSIONED = frozenset({
+    Action.RECORD_SHOT_BLANK,
+    Action.RECORD_SHOT_NOT_BLANK,
+    Action.USE_PHONE,
+    Action.USE_MAGNIFIER,
+    Action.USE_BEER,
+    Action.USE_INVERTER,
+    Action.RESET_GAME,
+    Action.UNDO,
+    Action.REDO,
+})
+
+_BY_CODE = {action.value: action for action in Action}
+_BY_LEGACY_NAME = {action.name.lower(): action for action in Action}
+
+
+class CallbackPayload(NamedTuple):
+    action: Action
+    args: Tuple[int, ...] = ()
+    # Round revision the keyboard was rendered for; None for unversioned actions and older keyboards.
+    version: Optional[int] = None
+
+
+def _base36(number: int) -> str:
+    if number < 0:
+        raise ValueError(f"Callback arguments must not be negative: {number}")
+    digits = ""
+    while True:
+        number, digit = divmod(number, 36)
+        digits = DIGITS[digit] + digits
+        if not number:
+            return digits
+
+
+def encode(action: Action, *args: int, version: Optional[int] = None) -> str:
+    if len(args) != ARITY[action]:
+        raise ValueError(f"{action.name} takes {ARITY[action]} arguments, got {len(args)}")
+    if version is not None:
+        if action not in VERSIONED:
+            raise ValueError(f"{action.name} does not carry a round revision")
+        args += (version,)
+    data = VERSION + action.value + ".".join(_base36(arg) for arg in args)
+    if len(data.encode()) > MAX_CALLBACK_DATA:
+        raise ValueError(f"Callback data for {action.name} is longer than {MAX_CALLBACK_DATA} bytes")
+    return data
+
+
+def _decode_legacy(data: str) -> Optional[CallbackPayload]:
+    action = _BY_LEGACY_NAME.get(data)
+    if action is not None:
+        return CallbackPayload(action) if not ARITY[action] else None
+    name, _, number = data.rpartition('_')
+    action = _BY_LEGACY_NAME.get(name)
+    if action is None or ARITY[action] != 1 or not number.isdigit():
+        return None
+    return CallbackPayload(action, (int(number),))
+
+
+def decode(data: Optional[str]) -> Optional[CallbackPayload]:
+    if not data:
+        return None
+    if len(data) < 2 or data[0] != VERSION:
+        return _decode_legacy(data)
+    action = _BY_CODE.get(data[1])
+    if action is None:
+        return None
+    try:
+        args = tuple(int(arg, 36) for arg in data[2:].split('.')) if len(data) > 2 else ()
+    except ValueError:
+        return None
+    arity = ARITY[action]
+    if len(args) == arity:
+        return CallbackPayload(action, args)
+    if len(args) == arity + 1 and action in VERSIONED:
+        return CallbackPayload(action, args[:-1], args[-1])
+    return None
+
+
+class IndexedCallbackObserver(TelegramEventObserver):
+    # Picks the handler with one dictionary lookup on (FSM state, action) instead of checking every
+    # handler's filters in turn, each of which is a hop through the thread pool for magic filters.
+    def __init__(self, router: Router, routes: "CallbackRoutes"):
+        super().__init__(router=router, event_name="callback_query")
+        self.routes = routes
+
+    async def trigger(self, event: CallbackQuery, **kwargs: Any) -> Any:
+        route = self.routes.resolve(event.data, kwargs.get("raw_state"))
+        if route is None:
+            return UNHANDLED
+        handler, payload = route
+        kwargs["handler"] = handler
+        kwargs["payload"] = payload
+        wrapped = self.outer_middleware.wrap_middlewares(self._resolve_middlewares(), handler.call)
+        return await wrapped(event, kwargs)
+
+
+class CallbackRoutes:
+    def __init__(self, name: str = "callbacks"):
+        self.router = Router(name=name)
+        self.observer = IndexedCallbackObserver(self.router, self)
+        self.router.callback_query = self.router.observers["callback_query"] = self.observer
+        self.table: Dict[Tuple[Optional[str], Action], HandlerObject] = {}
+
+    def route(self, action: Action, *states: State):
+        # Without states the handler answers in any state, unless a state-specific route exists.
+        def decorator(callback):
+            handler = HandlerObject(callback=callback)
+            self.observer.handlers.append(handler)
+            for state in states or (ANY_STATE,):
+                key = (state.state if isinstance(state, State) else state, action)
+                if key in self.table:
+                    raise ValueError(f"Callback route {key} is already taken by {self.table[key].callback.__name__}")
+                self.table[key] = handler
+            return callback
+        return decorator
+
+    def resolve(self, data: Optional[str], raw_state: Optional[str]) -> Optional[Tuple[HandlerObject, CallbackPayload]]:
+        payload = decode(data)
+        if payload is None:
+            return None
+        table = self.table
+        handler = table.get((raw_state, payload.action)) or table.get((ANY_STATE, payload.action))
+        if handler is None:
+            return None
+        return handler, payload
+
+
+callback_routes = CallbackRoutes()
@@ -2,7 +2,7 @@ import os
 from dotenv import load_dotenv
 
 from i18n import I18n  
-from logger import logger  
+from logger import logger, configure_logging
 
 load_dotenv('.env')
 API_TOKEN = os.getenv('TOKEN')
@@ -11,4 +11,105 @@ if not API_TOKEN:
     logger.error("❌ API token not found. Please add it to the .env file.")
     raise ValueError("❌ API token not found. Please add it to the .env file.")
 
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Comma-separated "logger=N" pairs: keep one in N DEBUG/INFO records of that logger.
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')
+
+if LOG_LEVEL not in ('DEBUG', 'INFO', 'WARNING', 'ERROR'):
+    logger.error("❌ Unknown LOG_LEVEL '%s'. Use DEBUG, INFO, WARNING or ERROR.", LOG_LEVEL)
+    raise ValueError(f"❌ Unknown LOG_LEVEL '{LOG_LEVEL}'. Use DEBUG, INFO, WARNING or ERROR.")
+
+configure_logging(LOG_LEVEL, LOG_SAMPLING)
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'memory')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'fsm.sqlite3')
+SQLITE_FLUSH_INTERVAL = float(os.getenv('SQLITE_FLUSH_INTERVAL', '0.5'))
+SQLITE_BATCH_SIZE = int(os.getenv('SQLITE_BATCH_SIZE', '256'))
+# Sessions kept in memory: idle ones are evicted after the TTL, the least recently used ones once the
+# estimated size passes the cap (0 disables either). With the memory backend evicted sessions are
+# lost unless SESSION_SPILL_PATH names a local SQLite file to move them to.
+SESSION_IDLE_TTL = float(os.getenv('SESSION_IDLE_TTL', '86400'))
+SESSION_MAX_BYTES = int(os.getenv('SESSION_MAX_BYTES', str(64 * 1024 * 1024)))
+SESSION_SPILL_PATH = os.getenv('SESSION_SPILL_PATH', '')
+
+if STORAGE_BACKEND not in ('memory', 'sqlite'):
+    logger.error("❌ Unknown STORAGE_BACKEND '%s'. Use 'memory' or 'sqlite'.", STORAGE_BACKEND)
+    raise ValueError(f"❌ Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Use 'memory' or 'sqlite'.")
+
+# Callback query ids and round versions remembered to drop repeated and outdated taps.
+TAP_GUARD_SIZE = int(os.getenv('TAP_GUARD_SIZE', '100000'))
+
+# Inline answers depend only on the query and language: Telegram may reuse them for this many
+# seconds, and the bot keeps this many rendered answers in memory.
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '86400'))
+INLINE_CACHE_SIZE = int(os.getenv('INLINE_CACHE_SIZE', '4096'))
+
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '16'))
+
+if BOT_MODE not in ('polling', 'webhook'):
+    logger.error("❌ Unknown BOT_MODE '%s'. Use 'polling' or 'webhook'.", BOT_MODE)
+    raise ValueError(f"❌ Unknown BOT_MODE '{BOT_MODE}'. Use 'polling' or 'webhook'.")
+
+if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+    logger.error("❌ WEBHOOK_URL is required when BOT_MODE is 'webhook'.")
+    raise ValueError("❌ WEBHOOK_URL is required when BOT_MODE is 'webhook'.")
+
+# Without the secret anyone who finds the URL could post forged updates.
+if BOT_MODE == 'webhook' and not WEBHOOK_SECRET:
+    logger.error("❌ WEBHOOK_SECRET is required when BOT_MODE is 'webhook'.")
+    raise ValueError("❌ WEBHOOK_SECRET is required when BOT_MODE is 'webhook'.")
+
+# More than one worker enables the sharded mode: this process only receives updates and
+# hands them to worker processes by chat id. Keep the number stable, it decides which
+# SQLite shard holds a user's game.
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '1'))
+SHARD_QUEUE_SIZE = int(os.getenv('SHARD_QUEUE_SIZE', '1000'))
+
+
+def shard_path(path: str, index: int) -> str:
+    # Every shard worker keeps its sessions in its own SQLite file.
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}{ext}"
+
+# Connection pool and timeouts of the Bot API client. Telegram is a single host, so the pool size is
+# the number of requests in flight; 0 leaves the per-host limit, keep-alive, DNS cache and the
+# connect and read timeouts off.
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', '100'))
+API_POOL_PER_HOST = int(os.getenv('API_POOL_PER_HOST', '0'))
+API_KEEPALIVE_TIMEOUT = float(os.getenv('API_KEEPALIVE_TIMEOUT', '60'))
+API_DNS_CACHE_TTL = int(os.getenv('API_DNS_CACHE_TTL', '3600'))
+API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', '10'))
+API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', '30'))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', '60'))
+
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+OUTBOUND_CHAT_BURST = float(os.getenv('OUTBOUND_CHAT_BURST', '3'))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))
+
+I18N_RELOAD_INTERVAL = float(os.getenv('I18N_RELOAD_INTERVAL', '0'))
+
+ARCHIVE_PATH = os.getenv('ARCHIVE_PATH', 'rounds.bin')
+ARCHIVE_FLUSH_INTERVAL = float(os.getenv('ARCHIVE_FLUSH_INTERVAL', '1.0'))
+
+SOLVER_TABLE_PATH = os.getenv('SOLVER_TABLE_PATH', 'solver.bin')
+# The bot does not see health bars; recommendations assume these charges for both sides.
+SOLVER_PLAYER_HP = int(os.getenv('SOLVER_PLAYER_HP', '4'))
+SOLVER_DEALER_HP = int(os.getenv('SOLVER_DEALER_HP', '4'))
+
+if SOLVER_PLAYER_HP < 1 or SOLVER_DEALER_HP < 1:
+    logger.error("❌ SOLVER_PLAYER_HP and SOLVER_DEALER_HP must be at least 1.")
+    raise ValueError("❌ SOLVER_PLAYER_HP and SOLVER_DEALER_HP must be at least 1.")
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# 0 disables the Prometheus endpoint
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
 i18n = I18n(locale_path="locales/translations.json", default_lang="eng")
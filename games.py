@@ -0,0 +1,160 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, cast
+
+from aiogram import Bot
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+from aiogram.types import CallbackQuery, Chat, Message, Update
+
+from archive import round_archive
+from callbacks import decode
+from logger import logger
+from render import edit_message, render_game_over
+from round_state import RoundState
+from session import StateSession
+from states import GameStates
+from taps import TapGuard
+
+GROUP_CHAT_TYPES = frozenset({"group", "supergroup"})
+
+
+def is_group_chat(chat: Optional[Chat]) -> bool:
+    return chat is not None and chat.type in GROUP_CHAT_TYPES
+
+
+def game_key(bot_id: int, chat_id: int, message_id: int) -> StorageKey:
+    # A group game belongs to the chat rather than to whoever tapped, and is told apart by its tracker message.
+    return StorageKey(bot_id=bot_id, chat_id=chat_id, user_id=chat_id, destiny=f"game:{message_id}")
+
+
+def game_message(update: Update, bot_id: int) -> Optional[Message]:
+    # The tracker message a group update is about: the one whose button was tapped, or the bot
+    # message a text reply answers. Anything else stays on the sender's own record.
+    if update.callback_query is not None:
+        message = update.callback_query.message
+        if isinstance(message, Message) and is_group_chat(message.chat):
+            return message
+        return None
+    message = update.message
+    if message is None or not is_group_chat(message.chat):
+        return None
+    reply = message.reply_to_message
+    if reply is not None and reply.from_user is not None and reply.from_user.id == bot_id:
+        return reply
+    return None
+
+
+class GameContextMiddleware(FSMContextMiddleware):
+    # Private chats keep one FSM record per user; in group chats every tracker message is a game of
+    # its own, so several tables run side by side and any member can tap the buttons.
+    def __init__(self, *args: Any, tap_guard: Optional[TapGuard] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.tap_guard = tap_guard
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        callback = event.callback_query
+        tap_guard = self.tap_guard
+        if callback is not None and tap_guard is not None and tap_guard.is_duplicate(callback.id):
+            logger.debug("Dropped repeated callback query %s", callback.id)
+            return UNHANDLED
+        bot = cast(Bot, data["bot"])
+        message = game_message(event, bot.id)
+        context: Optional[FSMContext]
+        if event.inline_query is not None:
+            # Inline answers are computed from the query alone and never touch a game.
+            context = None
+        elif message is not None:
+            context = FSMContext(
+                storage=self.storage,
+                key=game_key(bot.id, message.chat.id, message.message_id),
+            )
+        else:
+            context = self.resolve_event_context(bot, data)
+        data["fsm_storage"] = self.storage
+        if context is None:
+            return await handler(event, data)
+        payload = decode(callback.data) if callback is not None and tap_guard is not None else None
+        async with self.events_isolation.lock(key=context.key):
+            # Checked under the lock, so of two taps on the same keyboard the second sees the first one's version.
+            if payload is not None and tap_guard.is_stale(context.key, payload):
+                logger.debug("Dropped tap on an outdated keyboard: %s", callback.data)
+                return UNHANDLED
+            data.update({"state": context, "raw_state": await context.get_state()})
+            return await handler(event, data)
+
+
+class LockStats:
+    __slots__ = ('acquired', 'contended')
+
+    def __init__(self):
+        self.acquired = 0
+        self.contended = 0
+
+
+class GameEventIsolation(BaseEventIsolation):
+    # One lock per FSM key, dropped as soon as nobody holds or waits for it, so finished games and
+    # one-off users do not leave locks behind the way SimpleEventIsolation does.
+    def __init__(self):
+        self._locks: Dict[StorageKey, List] = {}
+        self.stats = LockStats()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        elif entry[0].locked():
+            self.stats.contended += 1
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                self.stats.acquired += 1
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def close(self) -> None:
+        self._locks.clear()
+
+
+async def send_setup(message: Message, session: StateSession, text: str, reply_markup) -> Message:
+    sent = await message.answer(text, reply_markup=reply_markup)
+    if not is_group_chat(message.chat):
+        session.set_state(GameStates.GameSetup)
+        return sent
+    # In a group the setup message just sent is a new game; the sender's own record only keeps the language.
+    key = game_key(session.context.key.bot_id, message.chat.id, sent.message_id)
+    game = StateSession(FSMContext(storage=session.context.storage, key=key), None, {})
+    game.update(language=session.lang)
+    game.set_state(GameStates.GameSetup)
+    await game.commit()
+    session.set_state(None)
+    return sent
+
+
+async def show_game_over(callback: CallbackQuery, session: StateSession, round_state: RoundState):
+    # The round and its log stay in the session until a new game starts, so the last shell can still
+    # be undone; the round is archived only then, see leave_game.
+    text, markup = render_game_over(round_state, session.lang)
+    await edit_message(callback.message, text, reply_markup=markup)
+    session.set_state(GameStates.GameOver)
+
+
+def leave_game(session: StateSession, user_id: int, lang: Optional[str] = None):
+    # Resets the session for a new game, archiving the round first if it was finished.
+    if session.state == GameStates.GameOver.state and 'round' in session.data:
+        round_archive.append(user_id, RoundState.from_data(session.data['round']))
+    session.reset(lang)
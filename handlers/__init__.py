@@ -1,16 +1,19 @@
+from callbacks import callback_routes
 from .start import router as start_router
 from .reset import router as reset_router
 from .game_setup import router as game_setup_router
-from .game_tracking import router as game_tracking_router
-from .phone_predictions import router as phone_predictions_router
-from .cancel import router as cancel_router
+# Imported for the callback routes they register.
+from . import game_tracking, phone_predictions, items, cancel
 from .language import router as language_router  
+from .stats import router as stats_router
+from .inline import router as inline_router
 
 def register_handlers(dp):
+    # Callback queries are resolved by one (state, action) lookup; the routers below only handle messages.
+    dp.include_router(callback_routes.router)
     dp.include_router(start_router)
     dp.include_router(reset_router)
     dp.include_router(game_setup_router)
-    dp.include_router(game_tracking_router)
-    dp.include_router(phone_predictions_router)
-    dp.include_router(cancel_router)
     dp.include_router(language_router)  
+    dp.include_router(stats_router)
+    dp.include_router(inline_router)
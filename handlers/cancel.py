@@ -1,60 +1,53 @@
 import logging
-from aiogram import Router, F
-from aiogram.filters import StateFilter
 from aiogram.types import CallbackQuery
-from aiogram.fsm.context import FSMContext  
 
+from callbacks import Action, callback_routes
 from keyboards import game_tracking_keyboard, setup_game_keyboard  
 from states import GameStates
+from session import StateSession
+from round_state import RoundState
+from render import edit_message, forget_message
 from config import i18n, logger  
 
-router = Router()
 logger = logging.getLogger("bot_logger")  
 
-@router.callback_query(F.data == "cancel_predict", StateFilter(GameStates.PredictingShot))
-async def cancel_predict(callback: CallbackQuery, state: FSMContext):
-    logger.info(f"Handler 'cancel_predict' triggered by user {callback.from_user.id}")
-    data = await state.get_data()
-    lang = data.get("language", "eng")
-    await callback.message.edit_text(
+@callback_routes.route(Action.CANCEL_PREDICT, GameStates.PredictingShot)
+async def cancel_predict(callback: CallbackQuery, session: StateSession):
+    logger.debug("Handler 'cancel_predict' triggered")
+    lang = session.lang
+    round_state = RoundState.from_data(session.data['round'])
+    await edit_message(
+        callback.message,
         i18n.get(lang, "prediction_cancelled"),
-        parse_mode="Markdown",
-        reply_markup=game_tracking_keyboard(lang=lang)
+        reply_markup=game_tracking_keyboard(lang=lang, revision=round_state.revision)
     )
-    logger.info(f"User {callback.from_user.id} cancelled prediction.")
-    await state.set_state(GameStates.GameTracking)
+    logger.info("Cancelled prediction.")
+    session.set_state(GameStates.GameTracking)
     await callback.answer()
 
-@router.callback_query(F.data == "reset_game", StateFilter(GameStates.GameTracking))
-async def reset_game(callback: CallbackQuery, state: FSMContext):
-    logger.info(f"Handler 'reset_game' triggered by user {callback.from_user.id}")
+@callback_routes.route(Action.RESET_GAME, GameStates.GameTracking)
+async def reset_game(callback: CallbackQuery, session: StateSession):
+    logger.debug("Handler 'reset_game' triggered")
 
-    data = await state.get_data()
-    lang = data.get("language", "eng")
-
-    await state.clear()
-
-    await state.set_data({"language": lang})
-    logger.debug(f"Language preserved as: {lang}")
+    lang = session.lang
+    session.reset()
+    logger.debug("Language preserved as: %s", lang)
 
     reset_text = i18n.get(lang, "game_reset")
-    await callback.message.edit_text(reset_text, parse_mode="Markdown", reply_markup=setup_game_keyboard(lang=lang))
-    await state.set_state(GameStates.GameSetup)
+    await edit_message(callback.message, reset_text, reply_markup=setup_game_keyboard(lang=lang))
+    session.set_state(GameStates.GameSetup)
     await callback.answer()
 
-@router.callback_query(F.data == 'cancel', StateFilter(GameStates.GameSetup, GameStates.GameTracking, GameStates.PredictingShot))
-async def cancel_action(callback_query: CallbackQuery, state: FSMContext):
-    logger.info(f"Handler 'cancel_action' triggered by user {callback_query.from_user.id}")
-
-    data = await state.get_data()
-    lang = data.get("language", "eng")
-
-    await state.clear()
+@callback_routes.route(Action.CANCEL, GameStates.GameSetup, GameStates.GameTracking, GameStates.PredictingShot, GameStates.UsingItem)
+async def cancel_action(callback_query: CallbackQuery, session: StateSession):
+    logger.debug("Handler 'cancel_action' triggered")
 
-    await state.set_data({"language": lang})
-    logger.debug(f"Language preserved as: {lang}")
+    lang = session.lang
+    session.reset()
+    logger.debug("Language preserved as: %s", lang)
 
     await callback_query.answer()
-    await callback_query.message.edit_reply_markup()  
+    await callback_query.message.edit_reply_markup()
+    forget_message(callback_query.message)
     await callback_query.message.answer(i18n.get(lang, "action_cancelled"))
-    logger.info(f"User {callback_query.from_user.id} cancelled the action.")
+    logger.info("Cancelled the action.")
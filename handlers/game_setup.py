@@ -1,168 +1,116 @@
 import logging
-import re
 from aiogram import Router, F
 from aiogram.filters import StateFilter
 from aiogram.types import CallbackQuery, Message
-from aiogram.fsm.context import FSMContext
 
-from keyboards import setup_game_keyboard, game_tracking_keyboard
+from callbacks import Action, CallbackPayload, callback_routes
+from keyboards import setup_game_keyboard
 from states import GameStates
+from games import is_group_chat
+from session import StateSession
+from round_state import RoundState
+from round_log import start_log
+from notation import ENTRY_PATTERN, NotationError, parse_entry
+from render import edit_message, render_setup_success, render_tracking
 from config import i18n, logger  
 
 router = Router()
 logger = logging.getLogger("bot_logger")  
 
-@router.callback_query(F.data.startswith("set_not_blank_"), StateFilter(GameStates.GameSetup))
-async def set_not_blank(callback: CallbackQuery, state: FSMContext):
-    logger.info(f"Handler 'set_not_blank' triggered by user {callback.from_user.id}")
+@callback_routes.route(Action.SET_NOT_BLANK, GameStates.GameSetup)
+async def set_not_blank(callback: CallbackQuery, session: StateSession, payload: CallbackPayload):
+    logger.debug("Handler 'set_not_blank' triggered")
 
-    data = await state.get_data()
-    lang = data.get("language", "eng")
+    lang = session.lang
+    not_blank, = payload.args
+    session.update(not_blank=not_blank)
+    logger.info("Set not_blank: %s", not_blank)
 
-    match = re.match(r'set_not_blank_(\d+)', callback.data)
-    if not match:
-        await callback.answer(i18n.get(lang, "invalid_input"), show_alert=True)
-        logger.error(f"User {callback.from_user.id} sent invalid set_not_blank data: {callback.data}")
-        return
-    not_blank = int(match.group(1))
-    await state.update_data(not_blank=not_blank)
-    logger.info(f"User {callback.from_user.id} set not_blank: {not_blank}")
-
-    blank = data.get('blank', None)
+    blank = session.data.get('blank', None)
     if blank is not None:
-        await finalize_game_setup(callback, state)
+        await finalize_game_setup(callback, session)
     else:
         setup_data = {'not_blank': not_blank}
         setup_text = i18n.get(lang, "ask_setup_game")
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             setup_text,
             reply_markup=setup_game_keyboard(selected=setup_data, lang=lang)
         )
 
-@router.callback_query(F.data.startswith("set_blank_"), StateFilter(GameStates.GameSetup))
-async def set_blank(callback: CallbackQuery, state: FSMContext):
-    logger.info(f"Handler 'set_blank' triggered by user {callback.from_user.id}")
+@callback_routes.route(Action.SET_BLANK, GameStates.GameSetup)
+async def set_blank(callback: CallbackQuery, session: StateSession, payload: CallbackPayload):
+    logger.debug("Handler 'set_blank' triggered")
 
-    data = await state.get_data()
-    lang = data.get("language", "eng")
+    lang = session.lang
+    blank, = payload.args
+    session.update(blank=blank)
+    logger.info("Set blank: %s", blank)
 
-    match = re.match(r'set_blank_(\d+)', callback.data)
-    if not match:
-        await callback.answer(i18n.get(lang, "invalid_input"), show_alert=True)
-        logger.error(f"User {callback.from_user.id} sent invalid set_blank data: {callback.data}")
-        return
-    blank = int(match.group(1))
-    await state.update_data(blank=blank)
-    logger.info(f"User {callback.from_user.id} set blank: {blank}")
-
-    not_blank = data.get('not_blank', None)
+    not_blank = session.data.get('not_blank', None)
     if not_blank is not None:
-        await finalize_game_setup(callback, state)
+        await finalize_game_setup(callback, session)
     else:
         setup_data = {'blank': blank}
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             i18n.get(lang, "ask_setup_game"),
             reply_markup=setup_game_keyboard(selected=setup_data, lang=lang)
         )
 
-@router.message(F.text & F.text.regexp(r'^\d+/\d+$'), StateFilter(GameStates.GameSetup))
-async def set_counts_via_text(message: Message, state: FSMContext):
-    logger.info(f"User {message.from_user.id} is setting counts via text: {message.text}")
-    data = await state.get_data()
-    lang = data.get("language", "eng")
+@router.message(F.text & F.text.regexp(ENTRY_PATTERN), StateFilter(GameStates.GameSetup))
+async def set_counts_via_text(message: Message, session: StateSession):
+    # Takes "x/y" alone or a round already in progress, e.g. "4/3 fired:LBB phone:6=L", which is
+    # applied as a whole with one reply and one session write.
+    logger.info("Setting counts via text: %s", message.text)
+    lang = session.lang
     try:
-        parts = message.text.strip().split('/')
-        not_blank = int(parts[0])
-        blank = int(parts[1])
-        if not_blank < 1 or blank < 1:
-            raise ValueError
-    except ValueError:
-        await message.answer(i18n.get(lang, "invalid_format"))
-        logger.warning(f"User {message.from_user.id} sent invalid text input for counts: {message.text}")
+        (not_blank, blank), round_state, log = parse_entry(message.text)
+    except NotationError as e:
+        await message.answer(i18n.get(lang, e.key, **e.kwargs))
+        logger.warning("Invalid text input for counts: %s (%s)", message.text, e.key)
         return
-    await state.update_data(not_blank=not_blank, blank=blank)
-    logger.info(f"User {message.from_user.id} set counts via text: not_blank={not_blank}, blank={blank}")
-    prob_blank = (blank / (blank + not_blank)) * 100
-    prob_not_blank = (not_blank / (blank + not_blank)) * 100
-    total_shots = not_blank + blank
-    shots_selector_text = " | ".join([f"№{i}: ❓" for i in range(1, total_shots + 1)])
-    game_setup_success = i18n.get(
-        lang, 
-        "game_setup_success", 
-        not_blank=not_blank,
-        blank=blank,
-        shots_selector=shots_selector_text,
-        prob_blank=prob_blank,
-        prob_not_blank=prob_not_blank
-    )
-    await message.answer(
-        game_setup_success,
-        reply_markup=game_tracking_keyboard(lang=lang)
-    )
-    await state.update_data(
-        current_shot=1,
-        history=[],
-        remaining_blank=blank,
-        remaining_not_blank=not_blank,
-        total_shots=total_shots,
-        phone_predictions=[]
-    )
-    await state.set_state(GameStates.GameTracking)
-    logger.info(f"User {message.from_user.id} transitioned to GameTracking state.")
+    session.update(not_blank=not_blank, blank=blank)
+    logger.info("Set counts via text: not_blank=%s, blank=%s, events=%s", not_blank, blank, round_state.version)
+    if round_state.version:
+        text, game_tracking_markup = render_tracking(round_state, lang)
+    else:
+        text, game_tracking_markup = render_setup_success(round_state, lang)
+    if is_group_chat(message.chat):
+        # The game is keyed by the setup message the text replies to, so the tracker replaces it.
+        await edit_message(message.reply_to_message, text, reply_markup=game_tracking_markup)
+    else:
+        await message.answer(text, reply_markup=game_tracking_markup)
+    session.update(round=round_state.to_data(), log=log.to_data() if log is not None else None)
+    session.set_state(GameStates.GameTracking)
+    logger.info("Transitioned to GameTracking state.")
 
-async def finalize_game_setup(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    not_blank = data.get('not_blank', 0)
-    blank = data.get('blank', 0)
-    lang = data.get("language", "eng")
+async def finalize_game_setup(callback: CallbackQuery, session: StateSession):
+    not_blank = session.data.get('not_blank', 0)
+    blank = session.data.get('blank', 0)
+    lang = session.lang
 
     if not_blank < 1 or blank < 1:
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             i18n.get(lang, "invalid_input"),
             reply_markup=setup_game_keyboard(lang=lang)
         )
-        logger.warning(f"User {callback.from_user.id} tried to finalize game with not_blank={not_blank}, blank={blank}")
+        logger.warning("Tried to finalize game with not_blank=%s, blank=%s", not_blank, blank)
         return
 
-    total_shots = not_blank + blank
-
-    prob_blank = (blank / total_shots) * 100
-    prob_not_blank = (not_blank / total_shots) * 100
-
-    shots_selector_text = " | ".join([f"№{i}: ❓" for i in range(1, total_shots + 1)])
-
-    game_setup_success = i18n.get(
-        lang, 
-        "game_setup_success", 
-        not_blank=not_blank,
-        blank=blank,
-        shots_selector=shots_selector_text,
-        prob_blank=prob_blank,
-        prob_not_blank=prob_not_blank
-    )
-
-    await callback.message.edit_text(
-        game_setup_success,
-        parse_mode="Markdown",
-        reply_markup=game_tracking_keyboard(lang=lang)
-    )
-    logger.info(f"User {callback.from_user.id} setup game with not_blank={not_blank}, blank={blank}")
+    round_state = RoundState(not_blank, blank)
+    game_setup_success, game_tracking_markup = render_setup_success(round_state, lang)
+    await edit_message(callback.message, game_setup_success, reply_markup=game_tracking_markup)
+    logger.info("Setup game with not_blank=%s, blank=%s", not_blank, blank)
 
-    await state.update_data(
-        current_shot=1,
-        history=[],
-        remaining_blank=blank,
-        remaining_not_blank=not_blank,
-        total_shots=total_shots,
-        phone_predictions=[]
-    )
-    await state.set_state(GameStates.GameTracking)
-    logger.info(f"User {callback.from_user.id} transitioned to GameTracking state.")
+    session.update(round=round_state.to_data(), log=start_log(not_blank, blank))
+    session.set_state(GameStates.GameTracking)
+    logger.info("Transitioned to GameTracking state.")
     await callback.answer()
 
 @router.message(StateFilter(GameStates.GameSetup))
-async def invalid_setup_input(message: Message, state: FSMContext):
-    data = await state.get_data()
-    lang = data.get("language", "eng")
-    logger.info(f"User {message.from_user.id} sent invalid input during GameSetup: {message.text}")
+async def invalid_setup_input(message: Message, session: StateSession):
+    lang = session.lang
+    logger.info("Invalid input during GameSetup: %s", message.text)
     await message.answer(i18n.get(lang, "invalid_input"))
@@ -1,174 +1,103 @@
 import logging
-from aiogram import Router, F
-from aiogram.filters import StateFilter
-from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
-from aiogram.fsm.context import FSMContext  
+from aiogram.types import CallbackQuery
 
-from keyboards import game_tracking_keyboard
+from callbacks import Action, CallbackPayload, callback_routes
 from states import GameStates
+from session import StateSession
+from round_state import RoundState, BLANK, NOT_BLANK
+from round_log import SHOT, RoundLog, record_event
+from probability import next_shot_probability
+from render import edit_message, render_tracking
+from games import show_game_over
 from config import i18n, logger  
 
-router = Router()
 logger = logging.getLogger("bot_logger")  
 
-@router.callback_query(F.data == "record_shot_blank", StateFilter(GameStates.GameTracking))
-async def record_shot_blank(callback: CallbackQuery, state: FSMContext):
-    logger.info(f"Handler 'record_shot_blank' triggered by user {callback.from_user.id}")
-    await record_shot(callback, state, shot_type='blank')
-
-@router.callback_query(F.data == "record_shot_not_blank", StateFilter(GameStates.GameTracking))
-async def record_shot_not_blank(callback: CallbackQuery, state: FSMContext):
-    logger.info(f"Handler 'record_shot_not_blank' triggered by user {callback.from_user.id}")
-    await record_shot(callback, state, shot_type='not_blank')
-
-async def record_shot(callback: CallbackQuery, state: FSMContext, shot_type: str):
-    data = await state.get_data()
-    lang = data.get("language", "eng")
-    remaining_blank = data.get('remaining_blank', 0)
-    remaining_not_blank = data.get('remaining_not_blank', 0)
-    total_shots = data.get('total_shots', 0)
-    current_shot = data.get('current_shot', 1)
-    history = data.get('history', [])
-    phone_predictions = data.get('phone_predictions', [])
-
-    logger.debug(f"User {callback.from_user.id} | Shot Type: {shot_type} | Current Shot: {current_shot} | "
-                 f"Remaining Blank: {remaining_blank} | Remaining Not Blank: {remaining_not_blank}")
-
-    predicted_result = None
-    for pred in phone_predictions:
-        if pred['shot_number'] == current_shot:
-            predicted_result = pred.get('result')
-            break
-
-    if predicted_result:
-
-        shot_type = predicted_result
-        logger.info(f"User {callback.from_user.id} has a prediction for shot {current_shot}: {shot_type}")
-    else:
+@callback_routes.route(Action.RECORD_SHOT_BLANK, GameStates.GameTracking)
+async def record_shot_blank(callback: CallbackQuery, session: StateSession):
+    logger.debug("Handler 'record_shot_blank' triggered")
+    await record_shot(callback, session, shot_type='blank')
+
+@callback_routes.route(Action.RECORD_SHOT_NOT_BLANK, GameStates.GameTracking)
+async def record_shot_not_blank(callback: CallbackQuery, session: StateSession):
+    logger.debug("Handler 'record_shot_not_blank' triggered")
+    await record_shot(callback, session, shot_type='not_blank')
+
+async def record_shot(callback: CallbackQuery, session: StateSession, shot_type: str):
+    lang = session.lang
+    round_state = RoundState.from_data(session.data['round'])
+    current_shot = round_state.current_shot
+
+    logger.debug("Shot Type: %s | Current Shot: %s | Remaining Blank: %s | Remaining Not Blank: %s",
+                 shot_type, current_shot, round_state.remaining_blank, round_state.remaining_not_blank)
+
+    if shot_type not in (BLANK, NOT_BLANK):
+        await callback.answer(i18n.get(lang, "invalid_shot_type"), show_alert=True)
+        logger.error("Invalid shot type: %s", shot_type)
+        return
 
-        if shot_type == 'blank':
-            if remaining_blank <= 0:
-                await callback.answer(i18n.get(lang, "no_remaining_blanks"), show_alert=True)
-                logger.warning(f"User {callback.from_user.id} tried to record a blank shot with no remaining blanks.")
-                return
-            remaining_blank -= 1
-        elif shot_type == 'not_blank':
-            if remaining_not_blank <= 0:
-                await callback.answer(i18n.get(lang, "no_remaining_not_blanks"), show_alert=True)
-                logger.warning(f"User {callback.from_user.id} tried to record a not_blank shot with no remaining not blanks.")
-                return
-            remaining_not_blank -= 1
+    if not round_state.can_record(shot_type):
+        if shot_type == BLANK:
+            await callback.answer(i18n.get(lang, "no_remaining_blanks"), show_alert=True)
+            logger.warning("Tried to record a blank shot with no remaining blanks.")
         else:
-            await callback.answer(i18n.get(lang, "invalid_shot_type"), show_alert=True)
-            logger.error(f"User {callback.from_user.id} sent invalid shot type: {shot_type}")
-            return
-
-    history.append({'shot_number': current_shot, 'result': shot_type})
-    remaining_shots = remaining_blank + remaining_not_blank
-
-    logger.info(f"User {callback.from_user.id} recorded shot {current_shot}: {shot_type}")
-    logger.debug(f"Updated Remaining Blank: {remaining_blank}, Remaining Not Blank: {remaining_not_blank}")
-
-    if predicted_result:
-        for pred in phone_predictions:
-            if pred['shot_number'] == current_shot:
-                pred['result'] = shot_type
-                break
-
-    if remaining_shots == 0:
-        history_text = ' | '.join([
-            f"№{shot['shot_number']}: ✅ Blank" if shot['result'] == 'blank' else f"№{shot['shot_number']}: 💥 Combat"
-            for shot in history
-        ])
-        predictions_info = ""
-        if phone_predictions:
-            predictions_info += "\n📱 **Phone Predictions:**\n"
-            for pred in phone_predictions:
-                if pred['result']:
-                    pred_result = '✅ Blank' if pred['result'] == 'blank' else '💥 Combat'
-                    predictions_info += f"• Shot №{pred['shot_number']}: {pred_result}\n"
-
-        game_over_text = i18n.get(lang, "game_over").format(
-            history=history_text,
-            predictions_info=predictions_info
-        )
-
-        new_game_text = i18n.get(lang, "start_new_game_button")
-        new_game_button = InlineKeyboardButton(text=new_game_text, callback_data="start_new_game")
-        game_over_keyboard = InlineKeyboardMarkup(inline_keyboard=[[new_game_button]])
-
-        await callback.message.edit_text(
-            game_over_text,
-            parse_mode="Markdown",
-            reply_markup=game_over_keyboard
-        )
-        logger.info(f"User {callback.from_user.id} завершил игру.")
-
-        await state.clear()
-        await state.set_data({"language": lang})
+            await callback.answer(i18n.get(lang, "no_remaining_not_blanks"), show_alert=True)
+            logger.warning("Tried to record a not_blank shot with no remaining not blanks.")
+        return
+
+    if round_state.prediction(current_shot):
+        logger.info("Has a prediction for shot %s: %s", current_shot, round_state.prediction(current_shot))
+    session.update(**record_event(session.data, round_state, SHOT[shot_type]))
+    shot_type = round_state.status(current_shot)
+    remaining_blank = round_state.remaining_blank
+    remaining_not_blank = round_state.remaining_not_blank
+
+    logger.info("Recorded shot %s: %s", current_shot, shot_type)
+    logger.debug("Updated Remaining Blank: %s, Remaining Not Blank: %s", remaining_blank, remaining_not_blank)
 
+    if round_state.is_over:
+        await show_game_over(callback, session, round_state)
+        logger.info("Игра завершена.")
         await callback.answer()
         return
 
-    current_shot += 1
-    await state.update_data(
-        current_shot=current_shot,
-        history=history,
-        remaining_blank=remaining_blank,
-        remaining_not_blank=remaining_not_blank,
-        phone_predictions=phone_predictions
-    )
-
-    prob_blank = (remaining_blank / remaining_shots) * 100 if remaining_shots > 0 else 0
-    prob_not_blank = (remaining_not_blank / remaining_shots) * 100 if remaining_shots > 0 else 0
-
-    shots_selector = []
-    for i in range(1, total_shots + 1):
-        shot_record = next((shot for shot in history if shot['shot_number'] == i), None)
-        if shot_record:
-            result = shot_record['result']
-            emoji = '✅' if result == 'blank' else '💥'
-        else:
-            prediction = next((pred for pred in phone_predictions if pred['shot_number'] == i and pred['result']), None)
-            if prediction:
-                result = prediction['result']
-                emoji = '✅' if result == 'blank' else '💥'
-            else:
-                emoji = '❓'
-        if i == current_shot:
-            shots_selector.append(f"**№{i}: {emoji}**")
-        else:
-            shots_selector.append(f"№{i}: {emoji}")
-
-    shots_selector_text = " | ".join(shots_selector)
-
-    predictions_info = ""
-    if phone_predictions:
-        predictions_info += "\n📱 **Phone Predictions:**\n"
-        for pred in phone_predictions:
-            if pred['result']:
-                pred_result = '✅ Blank' if pred['result'] == 'blank' else '💥 Combat'
-                predictions_info += f"• Shot №{pred['shot_number']}: {pred_result}\n"
-
-    updated_data = await state.get_data()
-    updated_current_shot = updated_data.get('current_shot', 1)
-
-    game_tracking_text = i18n.get(lang, "game_tracking_current_shot").format(
-        current_shot=updated_current_shot,
-        shots_selector=shots_selector_text,
-        prob_blank=prob_blank,
-        prob_not_blank=prob_not_blank,
-        predictions_info=predictions_info
-    )
-
-    await callback.message.edit_text(
-        game_tracking_text,
-        parse_mode="Markdown",
-        reply_markup=game_tracking_keyboard(lang=lang)
-    )
-    logger.info(f"Updated probabilities for user {callback.from_user.id}: blank={prob_blank:.2f}%, not_blank={prob_not_blank:.2f}%")
-    logger.debug(f"User {callback.from_user.id} | Next Shot: {updated_current_shot} | Remaining Blank: {remaining_blank} | Remaining Not Blank: {remaining_not_blank}")
-
-    await state.set_state(GameStates.GameTracking)
-    logger.debug(f"User {callback.from_user.id} state set back to GameTracking.")
+    game_tracking_text, game_tracking_markup = render_tracking(round_state, lang)
+    await edit_message(callback.message, game_tracking_text, reply_markup=game_tracking_markup)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Updated probabilities: blank=%.2f%%, not_blank=%.2f%%", *next_shot_probability(round_state))
+    logger.debug("Next Shot: %s | Remaining Blank: %s | Remaining Not Blank: %s", round_state.current_shot, remaining_blank, remaining_not_blank)
+
+    session.set_state(GameStates.GameTracking)
+    logger.debug("State set back to GameTracking.")
+    await callback.answer()
+
+@callback_routes.route(Action.UNDO, GameStates.GameTracking, GameStates.GameOver)
+@callback_routes.route(Action.REDO, GameStates.GameTracking)
+async def undo_redo(callback: CallbackQuery, session: StateSession, payload: CallbackPayload):
+    logger.debug("Handler 'undo_redo' triggered")
+    lang = session.lang
+    undo = payload.action is Action.UNDO
+    round_state = RoundState.from_data(session.data['round'])
+    log = RoundLog.from_data(session.data.get('log'))
+
+    if log is None or not (log.can_undo(round_state) if undo else log.can_redo(round_state)):
+        await callback.answer(i18n.get(lang, "nothing_to_undo" if undo else "nothing_to_redo"), show_alert=True)
+        logger.warning("Nothing to %s at round version %s.", "undo" if undo else "redo", round_state.version)
+        return
+
+    if undo:
+        round_state = log.undo(round_state)
+    else:
+        log.redo(round_state)
+    session.update(round=round_state.to_data())
+    logger.info("%s to round version %s.", "Undid" if undo else "Redid", round_state.version)
+
+    if round_state.is_over:
+        await show_game_over(callback, session, round_state)
+        await callback.answer()
+        return
+
+    game_tracking_text, game_tracking_markup = render_tracking(round_state, lang)
+    await edit_message(callback.message, game_tracking_text, reply_markup=game_tracking_markup)
+    session.set_state(GameStates.GameTracking)
     await callback.answer()
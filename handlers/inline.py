@@ -0,0 +1,91 @@
+import logging
+from functools import lru_cache
+from typing import Tuple
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+from notation import normalize_round, parse_round
+from probability import live_probabilities, next_shot_probability
+from render import render_recommendation, render_shots_selector
+from solver import solver_table
+from config import i18n, INLINE_CACHE_SIZE, INLINE_CACHE_TIME, SOLVER_PLAYER_HP, SOLVER_DEALER_HP
+
+router = Router()
+logger = logging.getLogger("bot_logger")
+
+# Telegram shows at most 50 results per answer.
+MAX_RESULTS = 50
+
+
+def _article(result_id: int, title: str, description: str, text: str) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id=str(result_id),
+        title=title,
+        description=description,
+        input_message_content=InputTextMessageContent(message_text=text),
+    )
+
+
+@lru_cache(maxsize=INLINE_CACHE_SIZE)
+def inline_results(query: str, lang: str) -> Tuple[InlineQueryResultArticle, ...]:
+    # Built from the query alone, so one answer serves every user with the same query and language.
+    # Callers must treat returned results as read-only.
+    round_state = parse_round(query)
+    if round_state is None:
+        help_text = i18n.get(lang, "inline_help")
+        return (_article(0, i18n.get(lang, "inline_help_title"), i18n.get(lang, "inline_help_description"), help_text),)
+
+    header = i18n.get(lang, "inline_header", query=query)
+    current_shot = round_state.current_shot
+    prob_blank, prob_not_blank = next_shot_probability(round_state)
+    recommendation = solver_table.recommend(round_state, SOLVER_PLAYER_HP, SOLVER_DEALER_HP)
+    if recommendation is None:
+        description = i18n.get(lang, "inline_no_advice")
+    else:
+        action, win = recommendation
+        description = i18n.get(lang, f"inline_advice_{action}", win=win * 100, player_hp=SOLVER_PLAYER_HP, dealer_hp=SOLVER_DEALER_HP)
+    text = header + i18n.get(
+        lang,
+        "game_tracking_current_shot",
+        current_shot=current_shot,
+        shots_selector=render_shots_selector(round_state),
+        prob_blank=prob_blank,
+        prob_not_blank=prob_not_blank,
+        recommendation=render_recommendation(round_state, lang),
+        predictions_info=""
+    )
+    results = [_article(
+        0,
+        i18n.get(lang, "inline_title", current_shot=current_shot, prob_blank=prob_blank, prob_not_blank=prob_not_blank),
+        description,
+        text,
+    )]
+
+    probabilities = live_probabilities(round_state)
+    for shot in range(current_shot + 1, round_state.total_shots + 1):
+        if len(results) == MAX_RESULTS:
+            break
+        shell = {"shot": shot, "prob_blank": (1 - probabilities[shot - 1]) * 100, "prob_not_blank": probabilities[shot - 1] * 100}
+        results.append(_article(
+            shot,
+            i18n.get(lang, "inline_shell_title", **shell),
+            query,
+            header + i18n.get(lang, "inline_shell", **shell),
+        ))
+    return tuple(results)
+
+
+@router.inline_query()
+async def inline_odds(inline_query: InlineQuery):
+    # No FSM record is read or written: the answer is a pure function of the query text and the
+    # user's language. Telegram's cache knows nothing of the language, so it must not share answers.
+    user_lang_code = inline_query.from_user.language_code
+    lang = "ru" if user_lang_code and user_lang_code.startswith("ru") else "eng"
+    query = normalize_round(inline_query.query)
+    results = inline_results(query, lang)
+    await inline_query.answer(list(results), cache_time=INLINE_CACHE_TIME, is_personal=True)
+    logger.debug("Answered inline query %r with %s results", query, len(results))
+
+
+i18n.on_reload.append(inline_results.cache_clear)
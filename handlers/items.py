@@ -0,0 +1,101 @@
+import logging
+from aiogram.types import CallbackQuery
+
+from callbacks import Action, CallbackPayload, callback_routes
+from keyboards import item_result_keyboard
+from states import GameStates
+from session import StateSession
+from round_state import RoundState, BLANK
+from round_log import EJECT, INVERT, MAGNIFIER, record_event
+from render import edit_message, render_tracking
+from games import show_game_over
+from config import i18n
+
+logger = logging.getLogger("bot_logger")
+
+@callback_routes.route(Action.USE_MAGNIFIER, GameStates.GameTracking)
+@callback_routes.route(Action.USE_BEER, GameStates.GameTracking)
+async def use_item(callback: CallbackQuery, session: StateSession, payload: CallbackPayload):
+    logger.debug("Handler 'use_item' triggered")
+    item = "beer" if payload.action is Action.USE_BEER else "magnifier"
+    lang = session.lang
+    round_state = RoundState.from_data(session.data['round'])
+    shot_number = round_state.current_shot
+
+    known = round_state.status(shot_number)
+    if known and item == "beer":
+        # The ejected shell is already known, nothing to ask.
+        await apply_item(callback, session, round_state, item, known)
+        return
+    if known:
+        await callback.answer(i18n.get(lang, "shell_already_known", shot_number=shot_number), show_alert=True)
+        logger.warning("Tried to use the magnifier on known shell %s.", shot_number)
+        return
+
+    await edit_message(
+        callback.message,
+        i18n.get(lang, f"use_{item}", shot_number=shot_number),
+        reply_markup=item_result_keyboard(item, lang=lang)
+    )
+    session.set_state(GameStates.UsingItem)
+    logger.info("Using %s on shell %s.", item, shot_number)
+    await callback.answer()
+
+@callback_routes.route(Action.USE_INVERTER, GameStates.GameTracking)
+async def use_inverter(callback: CallbackQuery, session: StateSession):
+    logger.debug("Handler 'use_inverter' triggered")
+    lang = session.lang
+    round_state = RoundState.from_data(session.data['round'])
+    session.update(**record_event(session.data, round_state, INVERT))
+    logger.info("Inverted shell %s.", round_state.current_shot)
+
+    game_tracking_text, game_tracking_markup = render_tracking(round_state, lang)
+    await edit_message(callback.message, game_tracking_text, reply_markup=game_tracking_markup)
+    await callback.answer(i18n.get(lang, "shell_inverted", shot_number=round_state.current_shot))
+
+@callback_routes.route(Action.MAGNIFIER_BLANK, GameStates.UsingItem)
+@callback_routes.route(Action.MAGNIFIER_NOT_BLANK, GameStates.UsingItem)
+@callback_routes.route(Action.BEER_BLANK, GameStates.UsingItem)
+@callback_routes.route(Action.BEER_NOT_BLANK, GameStates.UsingItem)
+async def set_item_result(callback: CallbackQuery, session: StateSession, payload: CallbackPayload):
+    logger.debug("Handler 'set_item_result' triggered")
+    item, _, shot_type = payload.action.name.lower().partition("_")
+    lang = session.lang
+    round_state = RoundState.from_data(session.data['round'])
+
+    if not round_state.can_reveal(round_state.current_shot, shot_type):
+        await callback.answer(i18n.get(lang, "no_remaining_blanks" if shot_type == BLANK else "no_remaining_not_blanks"), show_alert=True)
+        logger.warning("Tried to reveal shell %s as %s with none of that type left.", round_state.current_shot, shot_type)
+        return
+    await apply_item(callback, session, round_state, item, shot_type)
+
+async def apply_item(callback: CallbackQuery, session: StateSession, round_state: RoundState, item: str, shot_type: str):
+    lang = session.lang
+    shot_number = round_state.current_shot
+    if item == "beer":
+        session.update(**record_event(session.data, round_state, EJECT[shot_type]))
+        logger.info("Ejected shell %s: %s", shot_number, shot_type)
+    else:
+        session.update(**record_event(session.data, round_state, MAGNIFIER[shot_type]))
+        logger.info("Magnifier revealed shell %s: %s", shot_number, shot_type)
+
+    if round_state.is_over:
+        await show_game_over(callback, session, round_state)
+        logger.info("Игра завершена.")
+        await callback.answer()
+        return
+
+    game_tracking_text, game_tracking_markup = render_tracking(round_state, lang)
+    await edit_message(callback.message, game_tracking_text, reply_markup=game_tracking_markup)
+    session.set_state(GameStates.GameTracking)
+    await callback.answer()
+
+@callback_routes.route(Action.CANCEL_ITEM, GameStates.UsingItem)
+async def cancel_item(callback: CallbackQuery, session: StateSession):
+    logger.debug("Handler 'cancel_item' triggered")
+    lang = session.lang
+    round_state = RoundState.from_data(session.data['round'])
+    game_tracking_text, game_tracking_markup = render_tracking(round_state, lang)
+    await edit_message(callback.message, game_tracking_text, reply_markup=game_tracking_markup)
+    session.set_state(GameStates.GameTracking)
+    await callback.answer()
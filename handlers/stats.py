@@ -0,0 +1,43 @@
+import asyncio
+import logging
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from archive import archive_reader, round_archive, user_stats
+from session import StateSession
+from config import i18n
+
+router = Router()
+logger = logging.getLogger("bot_logger")
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, session: StateSession):
+    logger.debug("Handler 'cmd_stats' triggered")
+    lang = session.lang
+    # Rounds finished a moment ago may still sit in the write buffer.
+    await round_archive.flush()
+    stats = await asyncio.to_thread(user_stats, archive_reader, message.from_user.id)
+    if not stats.rounds:
+        await message.answer(i18n.get(lang, "stats_empty"))
+        return
+
+    positions = " | ".join(
+        f"№{shot}: {live / total * 100:.0f}%"
+        for shot, (live, total) in enumerate(zip(stats.position_live, stats.position_total), 1)
+        if total
+    )
+    await message.answer(i18n.get(
+        lang,
+        "stats",
+        rounds=stats.rounds,
+        live=stats.live,
+        blank=stats.blank,
+        live_streak=stats.live_streak,
+        blank_streak=stats.blank_streak,
+        positions=positions,
+        phone_rounds=stats.phone_rounds,
+        phone_predictions=stats.phone_predictions,
+        phone_hits=stats.phone_hits,
+    ))
+    logger.info("Sent stats for %s rounds", stats.rounds)
@@ -1,17 +1,58 @@
+import asyncio
 import json
 import os
-from typing import Dict
+from string import Formatter
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
 
-from logger import logger 
+from logger import logger
+
+class Template:
+    __slots__ = ('text', 'placeholders')
+
+    def __init__(self, text: str):
+        self.placeholders: FrozenSet[str] = frozenset(
+            field.split('.')[0].split('[')[0]
+            for _, field, _, _ in Formatter().parse(text)
+            if field is not None
+        )
+        # Static strings are unescaped once here and returned as-is afterwards.
+        self.text = text if self.placeholders else text.format()
+
+    def render(self, kwargs: dict) -> str:
+        return self.text.format(**kwargs)
 
 class I18n:
     def __init__(self, locale_path: str, default_lang: str = "eng"):
-        self.translations = self.load_translations(locale_path)
+        self.locale_path = locale_path
         self.default_lang = default_lang
+        self.on_reload: List[Callable[[], None]] = []
+        self.translations: Dict[str, Dict[str, str]] = {}
+        self.catalog: Dict[Tuple[str, str], Template] = {}
+        self.problems: List[str] = []
+        self._mtime: Optional[float] = None
+        self._swap(*self._load())
+
+    def _load(self):
+        mtime = os.path.getmtime(self.locale_path) if os.path.exists(self.locale_path) else None
+        translations = self.load_translations(self.locale_path)
+        catalog = self.compile(translations)
+        problems = self.validate(translations, catalog)
+        return mtime, translations, catalog, problems
+
+    def _swap(self, mtime, translations, catalog, problems):
+        # Readers only ever see a fully built catalog: each attribute is replaced by a single assignment.
+        self._mtime = mtime
+        self.catalog = catalog
+        self.translations = translations
+        self.problems = problems
+        for problem in problems:
+            logger.warning("Translations: %s", problem)
+        for callback in self.on_reload:
+            callback()
 
     def load_translations(self, locale_path: str) -> Dict[str, Dict[str, str]]:
         if not os.path.exists(locale_path):
-            logger.error(f"Translation file not found at {locale_path}")
+            logger.error("Translation file not found at %s", locale_path)
             return {}
         with open(locale_path, "r", encoding="utf-8") as f:
             try:
@@ -19,14 +60,62 @@ class I18n:
                 logger.info("Translations loaded successfully.")
                 return translations
             except json.JSONDecodeError as e:
-                logger.error(f"Error loading translations: {e}")
+                logger.error("Error loading translations: %s", e)
                 return {}
 
+    def compile(self, translations: Dict[str, Dict[str, str]]) -> Dict[Tuple[str, str], Template]:
+        catalog = {}
+        for lang, messages in translations.items():
+            for key, text in messages.items():
+                try:
+                    catalog[(lang, key)] = Template(text)
+                except (ValueError, IndexError, KeyError) as e:
+                    logger.error("Invalid template in key '%s' for language '%s': %s", key, lang, e)
+        return catalog
+
+    def validate(self, translations: Dict[str, Dict[str, str]], catalog: Dict[Tuple[str, str], Template]) -> List[str]:
+        problems = []
+        keys = set()
+        for messages in translations.values():
+            keys.update(messages)
+        for key in sorted(keys):
+            reference = catalog.get((self.default_lang, key))
+            for lang in translations:
+                template = catalog.get((lang, key))
+                if template is None:
+                    problems.append(f"key '{key}' is missing for language '{lang}'")
+                elif reference is not None and template.placeholders != reference.placeholders:
+                    problems.append(
+                        f"key '{key}' for language '{lang}' has placeholders {sorted(template.placeholders)}, "
+                        f"expected {sorted(reference.placeholders)}"
+                    )
+        return problems
+
+    async def watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                mtime = await asyncio.to_thread(os.path.getmtime, self.locale_path)
+            except OSError:
+                continue
+            if mtime == self._mtime:
+                continue
+            logger.info("Translation file %s changed, reloading.", self.locale_path)
+            loaded = await asyncio.to_thread(self._load)
+            if not loaded[1]:
+                logger.error("Keeping the previous translations because the new file could not be loaded.")
+                self._mtime = mtime
+                continue
+            self._swap(*loaded)
+
     def get(self, lang: str, key: str, **kwargs) -> str:
-        lang_translations = self.translations.get(lang, {})
-        message = lang_translations.get(key, self.translations[self.default_lang].get(key, f"[[{key}]]"))
+        template = self.catalog.get((lang, key)) or self.catalog.get((self.default_lang, key))
+        if template is None:
+            return f"[[{key}]]"
+        if not template.placeholders:
+            return template.text
         try:
-            return message.format(**kwargs)
+            return template.render(kwargs)
         except KeyError as e:
-            logger.error(f"Missing placeholder {e} in key '{key}' for language '{lang}'")
-            return message
+            logger.error("Missing placeholder %s in key '%s' for language '%s'", e, key, lang)
+            return template.text
@@ -1,24 +1,37 @@
-from aiogram.types import InlineKeyboardButton
+from functools import lru_cache
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from callbacks import Action, encode
 from config import i18n
 
+# Markups depend only on their arguments, so each one is built once and shared between taps.
+# Callers must treat returned markups as read-only.
+KEYBOARD_CACHE_SIZE = 1024
+MAX_SHOTS = 12
+
 def setup_game_keyboard(selected=None, lang="eng"):
+    selected = selected or {}
+    return _setup_game_keyboard(lang, selected.get('not_blank'), selected.get('blank'))
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _setup_game_keyboard(lang, selected_not_blank, selected_blank):
     builder = InlineKeyboardBuilder()
 
     not_blank_buttons = [
         InlineKeyboardButton(
-            text=i18n.get(lang, "combat_shot", i=i) + (" ✅" if selected and 'not_blank' in selected and selected['not_blank'] == i else ""),
-            callback_data=f"set_not_blank_{i}" if not (selected and 'not_blank' in selected and selected['not_blank'] == i) else "disabled",
-            disabled=(selected and 'not_blank' in selected and selected['not_blank'] == i)
+            text=i18n.get(lang, "combat_shot", i=i) + (" ✅" if selected_not_blank == i else ""),
+            callback_data=encode(Action.SET_NOT_BLANK, i) if selected_not_blank != i else encode(Action.DISABLED),
+            disabled=selected_not_blank == i
         ) for i in range(1, 7)
     ]
 
     blank_buttons = [
         InlineKeyboardButton(
-            text=i18n.get(lang, "blank_shot", i=i) + (" ✅" if selected and 'blank' in selected and selected['blank'] == i else ""),
-            callback_data=f"set_blank_{i}" if not (selected and 'blank' in selected and selected['blank'] == i) else "disabled",
-            disabled=(selected and 'blank' in selected and selected['blank'] == i)
+            text=i18n.get(lang, "blank_shot", i=i) + (" ✅" if selected_blank == i else ""),
+            callback_data=encode(Action.SET_BLANK, i) if selected_blank != i else encode(Action.DISABLED),
+            disabled=selected_blank == i
         ) for i in range(1, 7)
     ]
 
@@ -26,43 +39,62 @@ def setup_game_keyboard(selected=None, lang="eng"):
     builder.row(*blank_buttons, width=3)
     cancel_text = i18n.get(lang, "cancel_button")
     builder.row(
-        InlineKeyboardButton(text=cancel_text, callback_data="cancel")
+        InlineKeyboardButton(text=cancel_text, callback_data=encode(Action.CANCEL))
     )
     return builder.as_markup()
 
-def game_tracking_keyboard(lang="eng"):
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def game_tracking_keyboard(lang="eng", revision=0):
     builder = InlineKeyboardBuilder()
     record_shot_blank_text = i18n.get(lang, "record_shot_blank")
     record_shot_not_blank_text = i18n.get(lang, "record_shot_not_blank")
     use_phone_text = i18n.get(lang, "use_phone_button")
     reset_game_text = i18n.get(lang, "reset_game_button")
+    magnifier_text = i18n.get(lang, "magnifier_button")
+    beer_text = i18n.get(lang, "beer_button")
+    inverter_text = i18n.get(lang, "inverter_button")
+    undo_text = i18n.get(lang, "undo_button")
+    redo_text = i18n.get(lang, "redo_button")
 
     builder.row(
-        InlineKeyboardButton(text=record_shot_blank_text, callback_data="record_shot_blank"),
-        InlineKeyboardButton(text=record_shot_not_blank_text, callback_data="record_shot_not_blank"),
+        InlineKeyboardButton(text=record_shot_blank_text, callback_data=encode(Action.RECORD_SHOT_BLANK, version=revision)),
+        InlineKeyboardButton(text=record_shot_not_blank_text, callback_data=encode(Action.RECORD_SHOT_NOT_BLANK, version=revision)),
+        width=2
+    )
+    builder.row(
+        InlineKeyboardButton(text=magnifier_text, callback_data=encode(Action.USE_MAGNIFIER, version=revision)),
+        InlineKeyboardButton(text=beer_text, callback_data=encode(Action.USE_BEER, version=revision)),
+        InlineKeyboardButton(text=inverter_text, callback_data=encode(Action.USE_INVERTER, version=revision)),
+        width=3
+    )
+    builder.row(
+        InlineKeyboardButton(text=use_phone_text, callback_data=encode(Action.USE_PHONE, version=revision)),
+        InlineKeyboardButton(text=reset_game_text, callback_data=encode(Action.RESET_GAME, version=revision)),
         width=2
     )
     builder.row(
-        InlineKeyboardButton(text=use_phone_text, callback_data="use_phone"),
-        InlineKeyboardButton(text=reset_game_text, callback_data="reset_game"),
+        InlineKeyboardButton(text=undo_text, callback_data=encode(Action.UNDO, version=revision)),
+        InlineKeyboardButton(text=redo_text, callback_data=encode(Action.REDO, version=revision)),
         width=2
     )
     return builder.as_markup()
 
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def create_predict_shot_keyboard(total_shots, current_shot, lang="eng"):
     builder = InlineKeyboardBuilder()
     buttons = [
-        InlineKeyboardButton(text=str(i), callback_data=f"predict_shot_{i}") for i in range(current_shot, total_shots + 1)
+        InlineKeyboardButton(text=str(i), callback_data=encode(Action.PREDICT_SHOT, i)) for i in range(current_shot, total_shots + 1)
     ]
     for i in range(0, len(buttons), 5):
         builder.row(*buttons[i:i+5], width=5)
     cancel_text = i18n.get(lang, "cancel_predict_button")
     builder.row(
-        InlineKeyboardButton(text=cancel_text, callback_data="cancel_predict"),
+        InlineKeyboardButton(text=cancel_text, callback_data=encode(Action.CANCEL_PREDICT)),
         width=1
     )
     return builder.as_markup()
 
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def select_shot_type_keyboard(lang="eng"):
     builder = InlineKeyboardBuilder()
     set_shot_type_blank_text = i18n.get(lang, "set_shot_type_blank")
@@ -70,18 +102,80 @@ def select_shot_type_keyboard(lang="eng"):
     cancel_text = i18n.get(lang, "cancel_predict_button")
 
     builder.row(
-        InlineKeyboardButton(text=set_shot_type_blank_text, callback_data="set_shot_type_blank"),
-        InlineKeyboardButton(text=set_shot_type_not_blank_text, callback_data="set_shot_type_not_blank"),
+        InlineKeyboardButton(text=set_shot_type_blank_text, callback_data=encode(Action.SET_SHOT_TYPE_BLANK)),
+        InlineKeyboardButton(text=set_shot_type_not_blank_text, callback_data=encode(Action.SET_SHOT_TYPE_NOT_BLANK)),
         width=2
     )
     builder.row(
-        InlineKeyboardButton(text=cancel_text, callback_data="cancel_predict"),
+        InlineKeyboardButton(text=cancel_text, callback_data=encode(Action.CANCEL_PREDICT)),
         width=1
     )
     return builder.as_markup()
 
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def item_result_keyboard(item, lang="eng"):
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text=i18n.get(lang, "set_shot_type_blank"), callback_data=encode(Action[f"{item.upper()}_BLANK"])),
+        InlineKeyboardButton(text=i18n.get(lang, "set_shot_type_not_blank"), callback_data=encode(Action[f"{item.upper()}_NOT_BLANK"])),
+        width=2
+    )
+    builder.row(
+        InlineKeyboardButton(text=i18n.get(lang, "cancel_predict_button"), callback_data=encode(Action.CANCEL_ITEM)),
+        width=1
+    )
+    return builder.as_markup()
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def game_over_keyboard(lang="eng", revision=0):
+    # Undo stays available, so a mis-tap on the last shell can be taken back.
+    undo_text = i18n.get(lang, "undo_button")
+    new_game_text = i18n.get(lang, "start_new_game_button")
+    undo_button = InlineKeyboardButton(text=undo_text, callback_data=encode(Action.UNDO, version=revision))
+    new_game_button = InlineKeyboardButton(text=new_game_text, callback_data=encode(Action.START_NEW_GAME))
+    return InlineKeyboardMarkup(inline_keyboard=[[undo_button], [new_game_button]])
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def get_cancel_keyboard(lang="eng"):
     builder = InlineKeyboardBuilder()
     cancel_text = i18n.get(lang, "cancel_button")
-    builder.button(text=cancel_text, callback_data="cancel")
+    builder.button(text=cancel_text, callback_data=encode(Action.CANCEL))
     return builder.as_markup()
+
+CACHED_KEYBOARDS = (
+    _setup_game_keyboard,
+    game_tracking_keyboard,
+    create_predict_shot_keyboard,
+    select_shot_type_keyboard,
+    item_result_keyboard,
+    game_over_keyboard,
+    get_cancel_keyboard,
+)
+
+def clear_keyboard_cache():
+    for keyboard in CACHED_KEYBOARDS:
+        keyboard.cache_clear()
+
+def warm_keyboard_cache():
+    for lang in i18n.translations:
+        setup_game_keyboard(lang=lang)
+        for i in range(1, 7):
+            setup_game_keyboard(selected={'not_blank': i}, lang=lang)
+            setup_game_keyboard(selected={'blank': i}, lang=lang)
+        # A round takes a revision per shot and per shell revealed early, inverter taps and undos aside.
+        for revision in range(2 * MAX_SHOTS + 1):
+            game_tracking_keyboard(lang=lang, revision=revision)
+            game_over_keyboard(lang=lang, revision=revision)
+        for total_shots in range(2, MAX_SHOTS + 1):
+            for current_shot in range(1, total_shots + 1):
+                create_predict_shot_keyboard(total_shots, current_shot, lang=lang)
+        select_shot_type_keyboard(lang=lang)
+        for item in ("magnifier", "beer"):
+            item_result_keyboard(item, lang=lang)
+        get_cancel_keyboard(lang=lang)
+
+def reset_keyboard_cache():
+    clear_keyboard_cache()
+    warm_keyboard_cache()
+
+i18n.on_reload.append(reset_keyboard_cache)
@@ -1,7 +1,125 @@
+import atexit
+import contextvars
 import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
 
-logging.basicConfig(
-    level=logging.INFO,  
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s%(context)s'
+CONTEXT_FIELDS = ('user_id', 'handler', 'state', 'latency')
+
+log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+
+class ContextFilter(logging.Filter):
+    # Runs on the calling thread, so the per-update context is captured before the record leaves the loop.
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field) and field in context:
+                setattr(record, field, context[field])
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps one in `rate` DEBUG/INFO records per logger; warnings and errors always pass.
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self.counters: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rates.get(record.name)
+        if not rate or rate <= 1:
+            return True
+        count = self.counters.get(record.name, 0)
+        self.counters[record.name] = count + 1
+        return count % rate == 0
+
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = []
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                fields.append(f"{field}={value:.2f}ms" if field == 'latency' else f"{field}={value}")
+        record.context = f" | {' '.join(fields)}" if fields else ""
+        return super().format(record)
+
+
+class LoopQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler formats the message before enqueueing it; records are handed over as-is
+    # so %-formatting happens on the listener thread. Log arguments must therefore not be mutated afterwards.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_sampling(value: str) -> Dict[str, int]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, rate = item.partition('=')
+        rates[name.strip()] = int(rate)
+    return rates
+
+
+def setup_logging(level: int = logging.INFO, sampling: Optional[SamplingFilter] = None, stream=None):
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(StructuredFormatter(LOG_FORMAT))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = LoopQueueHandler(log_queue)
+    queue_handler.addFilter(sampling or SamplingFilter({}))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def configure_logging(level: str, sampling: str):
+    # Called from config once .env is loaded; the listener is already running with the defaults.
+    logging.getLogger().setLevel(level)
+    sampling_filter.rates = parse_sampling(sampling)
+    sampling_filter.counters.clear()
+
+
+sampling_filter = SamplingFilter({})
+listener = setup_logging(sampling=sampling_filter)
+atexit.register(listener.stop)
 logger = logging.getLogger("bot_logger")
+
+
+class LoggingContextMiddleware:
+    def __init__(self):
+        self.logger = logging.getLogger("bot_logger.updates")
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        handler_object = data.get("handler")
+        context = {
+            "user_id": user.id if user else None,
+            "handler": handler_object.callback.__name__ if handler_object else None,
+            "state": data.get("raw_state"),
+        }
+        token = log_context.set(context)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.logger.debug("Update handled", extra={"latency": (time.perf_counter() - start) * 1000})
+            log_context.reset(token)
@@ -1,14 +1,75 @@
 import asyncio
-from bot import dp, bot
+from bot import dp, bot, metrics
 from handlers import register_handlers
-from config import logger  
+from keyboards import warm_keyboard_cache
+from render import drain_edits
+from archive import round_archive
+from solver import solver_table
+from webhook import run_webhook
+from metrics import serve_metrics
+from sharding import run_sharded
+from config import (
+    i18n,
+    logger,
+    I18N_RELOAD_INTERVAL,
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_WORKERS,
+    METRICS_HOST,
+    METRICS_PORT,
+    SHARD_WORKERS,
+    SHARD_QUEUE_SIZE,
+)
 
 async def main():
     register_handlers(dp)
-    logger.info("Bot started and is polling...")
+    warm_keyboard_cache()
+    solver_table.load()
+    dp.shutdown.register(drain_edits)
+    dp.shutdown.register(round_archive.close)
+    metrics_runner = await serve_metrics(metrics, METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    watcher = asyncio.create_task(i18n.watch(I18N_RELOAD_INTERVAL)) if I18N_RELOAD_INTERVAL > 0 else None
     try:
-        await dp.start_polling(bot)
+        if SHARD_WORKERS > 1:
+            logger.info("Bot started in sharded %s mode...", BOT_MODE)
+            await run_sharded(
+                dp,
+                bot,
+                workers=SHARD_WORKERS,
+                queue_size=SHARD_QUEUE_SIZE,
+                mode=BOT_MODE,
+                url=WEBHOOK_URL,
+                path=WEBHOOK_PATH,
+                host=WEBHOOK_HOST,
+                port=WEBHOOK_PORT,
+                secret=WEBHOOK_SECRET,
+            )
+        elif BOT_MODE == 'webhook':
+            logger.info("Bot started in webhook mode...")
+            await run_webhook(
+                dp,
+                bot,
+                url=WEBHOOK_URL,
+                path=WEBHOOK_PATH,
+                host=WEBHOOK_HOST,
+                port=WEBHOOK_PORT,
+                secret=WEBHOOK_SECRET,
+                queue_size=WEBHOOK_QUEUE_SIZE,
+                workers=WEBHOOK_WORKERS,
+            )
+        else:
+            logger.info("Bot started and is polling...")
+            await dp.start_polling(bot)
     finally:
+        if watcher is not None:
+            watcher.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         await bot.close()
 
 if __name__ == "__main__":
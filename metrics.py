@@ -0,0 +1,232 @@
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from logger import logger
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Metrics:
+    def __init__(self):
+        self.handler_latency: Dict[str, Histogram] = {}
+        self.handler_errors: Dict[str, int] = {}
+        self.storage_latency: Dict[str, Histogram] = {}
+        self.api_latency: Dict[str, Histogram] = {}
+        self.api_errors: Dict[Tuple[str, str], int] = {}
+        self.updates = 0
+        # Extra exporters (e.g. outbound and edit stats) append callables that yield ready metric lines.
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+        self._rate_mark = (time.monotonic(), 0)
+
+    @staticmethod
+    def _observe(histograms: Dict[str, Histogram], label: str, value: float):
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = Histogram()
+        histogram.observe(value)
+
+    def observe_handler(self, handler: str, seconds: float, failed: bool = False):
+        self._observe(self.handler_latency, handler, seconds)
+        if failed:
+            self.handler_errors[handler] = self.handler_errors.get(handler, 0) + 1
+
+    def observe_storage(self, operation: str, seconds: float):
+        self._observe(self.storage_latency, operation, seconds)
+
+    def observe_api(self, method: str, seconds: float, error: Optional[str] = None):
+        self._observe(self.api_latency, method, seconds)
+        if error is not None:
+            self.api_errors[(method, error)] = self.api_errors.get((method, error), 0) + 1
+
+    def updates_per_second(self) -> float:
+        # Rate since the previous scrape.
+        now = time.monotonic()
+        since, updates = self._rate_mark
+        self._rate_mark = (now, self.updates)
+        return (self.updates - updates) / (now - since) if now > since else 0.0
+
+    def render(self) -> str:
+        lines = [
+            '# TYPE bot_updates_total counter',
+            f'bot_updates_total {self.updates}',
+            '# TYPE bot_updates_per_second gauge',
+            f'bot_updates_per_second {self.updates_per_second():.3f}',
+            '# TYPE bot_handler_latency_seconds histogram',
+        ]
+        for handler, histogram in self.handler_latency.items():
+            lines.extend(histogram.render('bot_handler_latency_seconds', f'handler="{handler}"'))
+        lines.append('# TYPE bot_handler_errors_total counter')
+        for handler, count in self.handler_errors.items():
+            lines.append(f'bot_handler_errors_total{{handler="{handler}"}} {count}')
+        lines.append('# TYPE bot_storage_latency_seconds histogram')
+        for operation, histogram in self.storage_latency.items():
+            lines.extend(histogram.render('bot_storage_latency_seconds', f'operation="{operation}"'))
+        lines.append('# TYPE bot_api_latency_seconds histogram')
+        for method, histogram in self.api_latency.items():
+            lines.extend(histogram.render('bot_api_latency_seconds', f'method="{method}"'))
+        lines.append('# TYPE bot_api_errors_total counter')
+        for (method, error), count in self.api_errors.items():
+            lines.append(f'bot_api_errors_total{{method="{method}",error="{error}"}} {count}')
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.metrics.updates += 1
+        return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        start = time.perf_counter()
+        try:
+            result = await handler(event, data)
+        except Exception:
+            self.metrics.observe_handler(name, time.perf_counter() - start, failed=True)
+            raise
+        self.metrics.observe_handler(name, time.perf_counter() - start)
+        return result
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    # Registered after the outbound scheduler, so rate-limit waits are not counted as API latency.
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            result = await make_request(bot, method)
+        except Exception as e:
+            self.metrics.observe_api(name, time.perf_counter() - start, error=type(e).__name__)
+            raise
+        self.metrics.observe_api(name, time.perf_counter() - start)
+        return result
+
+
+class InstrumentedStorage(BaseStorage):
+    def __init__(self, storage: BaseStorage, metrics: Metrics):
+        self.storage = storage
+        self.metrics = metrics
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        start = time.perf_counter()
+        await self.storage.set_state(key, state)
+        self.metrics.observe_storage("set_state", time.perf_counter() - start)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        start = time.perf_counter()
+        state = await self.storage.get_state(key)
+        self.metrics.observe_storage("get_state", time.perf_counter() - start)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        await self.storage.set_data(key, data)
+        self.metrics.observe_storage("set_data", time.perf_counter() - start)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        start = time.perf_counter()
+        data = await self.storage.get_data(key)
+        self.metrics.observe_storage("get_data", time.perf_counter() - start)
+        return data
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+
+def stats_collector(name: str, stats) -> Callable[[], Iterable[str]]:
+    # Exposes every slot of a plain stats object (OutboundStats, EditStats) as a counter.
+    def collect():
+        yield f'# TYPE {name}_total counter'
+        for field in stats.__slots__:
+            yield f'{name}_total{{kind="{field}"}} {getattr(stats, field)}'
+    return collect
+
+
+def gauge_collector(name: str, gauges: Callable[[], Dict[str, int]]) -> Callable[[], Iterable[str]]:
+    # Exposes a callable returning current values (e.g. BoundedStorage.gauges) as gauges.
+    def collect():
+        yield f'# TYPE {name} gauge'
+        for kind, value in gauges().items():
+            yield f'{name}{{kind="{kind}"}} {value}'
+    return collect
+
+
+def rounds_collector(states: Dict[str, int], finished: Iterable[str]) -> Callable[[], Iterable[str]]:
+    # Sessions in memory per state (e.g. BoundedStorage.states), leaving out finished rounds: idle
+    # sessions leave the count when they are evicted.
+    finished = frozenset(finished)
+
+    def collect():
+        yield '# TYPE bot_active_rounds gauge'
+        for state, count in states.items():
+            if state not in finished:
+                yield f'bot_active_rounds{{state="{state}"}} {count}'
+    return collect
+
+
+async def serve_metrics(metrics: Metrics, host: str, port: int) -> web.AppRunner:
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info("Metrics are served on http://%s:%s/metrics", host, port)
+    return runner
@@ -0,0 +1,133 @@
+import re
+from typing import Dict, Optional, Tuple
+
+from probability import MAX_SHELLS
+from round_log import SHOT, RoundLog, apply_event, phone_event
+from round_state import RoundState, BLANK, NOT_BLANK
+
+# "x/y" is x combat and y blank shells. A round can follow it as one character per shell in chamber
+# order: L for combat, B for blank, ? for unknown. Known shells before the first ? have been fired,
+# the first ? is the current shell and known shells after it were revealed by the phone.
+COUNTS_PATTERN = r'^\d+/\d+$'
+# A round entered in one message: "x/y" followed by the fired shells and phone reveals, e.g.
+# "4/3 fired:LBB phone:6=L,7=B".
+ENTRY_PATTERN = r'^\s*\d+/\d+(?:\s+\S+)*\s*$'
+ROUND_RE = re.compile(r'^(\d+)/(\d+)(?:\s+([LB?]+))?$', re.IGNORECASE)
+SHELL_TYPES = {'L': NOT_BLANK, 'B': BLANK}
+
+
+class NotationError(ValueError):
+    # Carries the translation key and its arguments for the message shown to the player.
+    def __init__(self, key: str, **kwargs):
+        super().__init__(key)
+        self.key = key
+        self.kwargs = kwargs
+
+
+def parse_counts(text: str) -> Optional[Tuple[int, int]]:
+    not_blank, _, blank = text.strip().partition('/')
+    try:
+        not_blank, blank = int(not_blank), int(blank)
+    except ValueError:
+        return None
+    if not_blank < 1 or blank < 1:
+        return None
+    return not_blank, blank
+
+
+def normalize_round(text: str) -> str:
+    return " ".join(text.split()).upper()
+
+
+def parse_round(text: str) -> Optional[RoundState]:
+    # Expects normalize_round() output. Returns None for anything that is not a playable round.
+    match = ROUND_RE.match(text)
+    if match is None:
+        return None
+    counts = parse_counts(f"{match.group(1)}/{match.group(2)}")
+    if counts is None or sum(counts) > MAX_SHELLS:
+        return None
+    round_state = RoundState(*counts)
+    shells = match.group(3) or ""
+    if len(shells) > round_state.total_shots:
+        return None
+    fired = len(shells) - len(shells.lstrip('LB'))
+    for shell in shells[:fired]:
+        if not round_state.can_record(SHELL_TYPES[shell]):
+            return None
+        round_state.record_shot(SHELL_TYPES[shell])
+    for shot_number, shell in enumerate(shells[fired:], fired + 1):
+        if shell == '?':
+            continue
+        round_state.add_prediction(shot_number)
+        if not round_state.can_predict(SHELL_TYPES[shell]):
+            return None
+        round_state.set_prediction(SHELL_TYPES[shell])
+    if round_state.is_over:
+        return None
+    return round_state
+
+
+def _parse_parts(tokens) -> Tuple[str, Dict[int, str]]:
+    fired = ""
+    phone: Dict[int, str] = {}
+    for token in tokens:
+        # Echoed back inside a Markdown code span.
+        part = token.replace('`', '')
+        name, separator, value = token.partition(':')
+        name, value = name.lower(), value.upper()
+        if name == 'fired' and separator:
+            if fired or not value or not set(value) <= {'L', 'B'}:
+                raise NotationError("bulk_bad_fired", part=part)
+            fired = value
+        elif name == 'phone' and separator:
+            for reveal in value.split(','):
+                shot, equals, shell = reveal.partition('=')
+                if not shot.isdigit() or not equals or shell not in SHELL_TYPES:
+                    raise NotationError("bulk_bad_phone", part=part)
+                if int(shot) in phone:
+                    raise NotationError("bulk_phone_twice", shot=int(shot))
+                phone[int(shot)] = SHELL_TYPES[shell]
+        else:
+            raise NotationError("bulk_unknown_part", part=part)
+    return fired, phone
+
+
+def parse_entry(text: str) -> Tuple[Tuple[int, int], RoundState, Optional[RoundLog]]:
+    # One pass over the message, then every shell goes through the same RoundState checks and
+    # log events as the buttons would. Raises NotationError for anything inconsistent.
+    counts_token, *tokens = text.split()
+    counts = parse_counts(counts_token)
+    if counts is None:
+        raise NotationError("invalid_format")
+    fired, phone = _parse_parts(tokens)
+    not_blank, blank = counts
+    total_shots = not_blank + blank
+    if total_shots > MAX_SHELLS:
+        raise NotationError("bulk_too_many_shells", max_shells=MAX_SHELLS)
+    if len(fired) >= total_shots:
+        raise NotationError("bulk_all_fired", fired=len(fired), total=total_shots)
+
+    round_state = RoundState(not_blank, blank)
+    log = RoundLog.start(not_blank, blank)
+
+    def apply(event: str):
+        if log is not None:
+            log.append(round_state, event)
+        else:
+            apply_event(round_state, event)
+
+    def check(shot: int, shot_type: str):
+        if not round_state.can_reveal(shot, shot_type):
+            key = "bulk_no_blank_left" if shot_type == BLANK else "bulk_no_combat_left"
+            raise NotationError(key, shot=shot, count=blank if shot_type == BLANK else not_blank)
+
+    for shot, shell in enumerate(fired, 1):
+        check(shot, SHELL_TYPES[shell])
+        apply(SHOT[SHELL_TYPES[shell]])
+    for shot, shot_type in phone.items():
+        if not len(fired) < shot <= total_shots:
+            raise NotationError("bulk_phone_range", shot=shot, first=len(fired) + 1, total=total_shots)
+        check(shot, shot_type)
+        apply(phone_event(shot, shot_type))
+    return counts, round_state, log
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from typing import Any, Dict, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, TelegramMethod
+
+from logger import logger
+
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        # Tokens may go negative: each caller books the next free slot and sleeps until it comes,
+        # which keeps waiting requests in FIFO order without a lock.
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def defer(self, seconds: float):
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    @property
+    def idle(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+
+class PendingEdit:
+    __slots__ = ('method', 'future')
+
+    def __init__(self, method: EditMessageText):
+        self.method = method
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class OutboundStats:
+    __slots__ = ('sent', 'coalesced', 'retried', 'delayed')
+
+    def __init__(self):
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.delayed = 0
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        max_retries: int = 3,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.stats = OutboundStats()
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._pending_edits: Dict[Tuple[Any, int], PendingEdit] = {}
+        self._sending_edits: Dict[Tuple[Any, int], asyncio.Future] = {}
+
+    def set_global_rate(self, rate: float):
+        self.global_bucket = TokenBucket(rate, rate)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                self._chat_buckets = {key: value for key, value in self._chat_buckets.items() if not value.idle}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _wait_for_slot(self, chat_id):
+        delay = self.global_bucket.reserve()
+        if chat_id is not None:
+            delay = max(delay, self._chat_bucket(chat_id).reserve())
+        if delay > 0:
+            self.stats.delayed += 1
+            await asyncio.sleep(delay)
+
+    async def _send(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod, chat_id):
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await make_request(bot, method)
+                self.stats.sent += 1
+                return result
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.stats.retried += 1
+                logger.warning("Flood limit hit on %s in chat %s, retrying in %ss", type(method).__name__, chat_id, e.retry_after)
+                if chat_id is not None:
+                    # Pushing the chat bucket into debt also holds back other requests queued for this chat.
+                    self._chat_bucket(chat_id).defer(e.retry_after)
+                else:
+                    await asyncio.sleep(e.retry_after)
+                await self._wait_for_slot(chat_id)
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        # Callback answers do not count towards chat limits and must arrive quickly, so they bypass the buckets.
+        if isinstance(method, AnswerCallbackQuery):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        if not isinstance(method, EditMessageText) or chat_id is None or method.message_id is None:
+            await self._wait_for_slot(chat_id)
+            return await self._send(make_request, bot, method, chat_id)
+
+        # Edits of the same message coalesce: while one is waiting for a slot, newer renders replace
+        # its payload and share its result, so only the latest text is sent.
+        key = (chat_id, method.message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            pending.method = method
+            self.stats.coalesced += 1
+            return await asyncio.shield(pending.future)
+
+        pending = self._pending_edits[key] = PendingEdit(method)
+        try:
+            await self._wait_for_slot(chat_id)
+            # Never overtake an older edit of the same message that is still on the wire.
+            previous = self._sending_edits.get(key)
+            if previous is not None:
+                await asyncio.wait([previous])
+        except BaseException:
+            pending.future.cancel()
+            raise
+        finally:
+            del self._pending_edits[key]
+        self._sending_edits[key] = pending.future
+        try:
+            result = await self._send(make_request, bot, pending.method, chat_id)
+        except Exception as e:
+            pending.future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it.
+            pending.future.exception()
+            raise
+        except BaseException:
+            pending.future.cancel()
+            raise
+        else:
+            pending.future.set_result(result)
+        finally:
+            if self._sending_edits.get(key) is pending.future:
+                del self._sending_edits[key]
+        return result
@@ -0,0 +1,67 @@
+from functools import lru_cache
+
+from round_state import RoundState
+
+MAX_SHELLS = 64
+
+BINOMIAL = [[1]]
+for n in range(1, MAX_SHELLS + 1):
+    previous = BINOMIAL[-1]
+    BINOMIAL.append([1] + [previous[k - 1] + previous[k] for k in range(1, n)] + [1])
+
+
+def binomial(n: int, k: int) -> int:
+    if k < 0 or k > n:
+        return 0
+    return BINOMIAL[n][k]
+
+
+@lru_cache(maxsize=4096)
+def _live_probabilities(
+    remaining_blank: int,
+    remaining_not_blank: int,
+    live_mask: int,
+    blank_mask: int,
+    inverted_mask: int,
+    total_shots: int,
+) -> tuple:
+    # Every arrangement of the unknown shells is equally likely, so an unknown position is live in
+    # C(u-1, l-1) of the C(u, l) arrangements that agree with the known shells. The inverter flips one
+    # position of such an arrangement, so an inverted unknown shell is live exactly when it was loaded blank.
+    unknown = remaining_blank + remaining_not_blank
+    if unknown:
+        p_unknown = binomial(unknown - 1, remaining_not_blank - 1) / binomial(unknown, remaining_not_blank)
+    else:
+        p_unknown = 0.0
+    probabilities = []
+    for i in range(total_shots):
+        bit = 1 << i
+        if live_mask & bit:
+            probabilities.append(1.0)
+        elif blank_mask & bit:
+            probabilities.append(0.0)
+        elif inverted_mask & bit:
+            probabilities.append(1.0 - p_unknown)
+        else:
+            probabilities.append(p_unknown)
+    return tuple(probabilities)
+
+
+def live_probabilities(round_state: RoundState) -> tuple:
+    return _live_probabilities(
+        round_state.remaining_blank,
+        round_state.remaining_not_blank,
+        round_state.live_mask,
+        round_state.blank_mask,
+        round_state.inverted_mask,
+        round_state.total_shots,
+    )
+
+
+def shot_probability(round_state: RoundState, shot_number: int):
+    p_live = live_probabilities(round_state)[shot_number - 1]
+    return (1 - p_live) * 100, p_live * 100
+
+
+def next_shot_probability(round_state: RoundState):
+    return shot_probability(round_state, round_state.current_shot)
@@ -0,0 +1,162 @@
+import asyncio
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from keyboards import game_tracking_keyboard, game_over_keyboard
+from probability import live_probabilities, next_shot_probability
+from round_state import RoundState, BLANK
+from solver import solver_table
+from config import i18n, logger, SOLVER_PLAYER_HP, SOLVER_DEALER_HP
+
+EDIT_CACHE_SIZE = 10000
+
+
+class EditStats:
+    __slots__ = ('sent', 'skipped', 'not_modified')
+
+    def __init__(self):
+        self.sent = 0
+        self.skipped = 0
+        self.not_modified = 0
+
+
+edit_stats = EditStats()
+_last_rendered: "OrderedDict[tuple, int]" = OrderedDict()
+_edit_tasks: set = set()
+
+
+def render_shots_selector(round_state: RoundState, highlight_current: bool = True) -> str:
+    probabilities = live_probabilities(round_state)
+    shots_selector = []
+    for i in range(1, round_state.total_shots + 1):
+        result = round_state.status(i)
+        if result:
+            emoji = '✅' if result == BLANK else '💥'
+        elif round_state.is_inverted(i):
+            emoji = f"❓🔄 💥{probabilities[i - 1] * 100:.0f}%"
+        else:
+            emoji = f"❓ 💥{probabilities[i - 1] * 100:.0f}%"
+        if highlight_current and i == round_state.current_shot:
+            shots_selector.append(f"**№{i}: {emoji}**")
+        else:
+            shots_selector.append(f"№{i}: {emoji}")
+    return " | ".join(shots_selector)
+
+
+def render_predictions_info(round_state: RoundState) -> str:
+    predictions_info = ""
+    predicted_shots = round_state.predicted_shots()
+    if predicted_shots:
+        predictions_info += "\n📱 **Phone Predictions:**\n"
+        for i in predicted_shots:
+            pred_result = '✅ Blank' if round_state.status(i) == BLANK else '💥 Combat'
+            predictions_info += f"• Shot №{i}: {pred_result}\n"
+    return predictions_info
+
+
+def render_recommendation(round_state: RoundState, lang: str) -> str:
+    recommendation = solver_table.recommend(round_state, SOLVER_PLAYER_HP, SOLVER_DEALER_HP)
+    if recommendation is None:
+        return ""
+    action, win = recommendation
+    return i18n.get(lang, f"solver_{action}", win=win * 100, player_hp=SOLVER_PLAYER_HP, dealer_hp=SOLVER_DEALER_HP)
+
+
+def render_setup_success(round_state: RoundState, lang: str):
+    prob_blank, prob_not_blank = next_shot_probability(round_state)
+    text = i18n.get(
+        lang,
+        "game_setup_success",
+        not_blank=round_state.remaining_not_blank,
+        blank=round_state.remaining_blank,
+        shots_selector=render_shots_selector(round_state, highlight_current=False),
+        prob_blank=prob_blank,
+        prob_not_blank=prob_not_blank,
+        recommendation=render_recommendation(round_state, lang)
+    )
+    return text, game_tracking_keyboard(lang=lang, revision=round_state.revision)
+
+
+def render_tracking(round_state: RoundState, lang: str):
+    prob_blank, prob_not_blank = next_shot_probability(round_state)
+    text = i18n.get(
+        lang,
+        "game_tracking_current_shot",
+        current_shot=round_state.current_shot,
+        shots_selector=render_shots_selector(round_state),
+        prob_blank=prob_blank,
+        prob_not_blank=prob_not_blank,
+        recommendation=render_recommendation(round_state, lang),
+        predictions_info=render_predictions_info(round_state)
+    )
+    return text, game_tracking_keyboard(lang=lang, revision=round_state.revision)
+
+
+def render_game_over(round_state: RoundState, lang: str):
+    history_text = ' | '.join([
+        (f"№{i}: ✅ Blank" if round_state.status(i) == BLANK else f"№{i}: 💥 Combat")
+        + (" 🍺" if round_state.is_ejected(i) else "")
+        for i in round_state.fired_shots()
+    ])
+    text = i18n.get(
+        lang,
+        "game_over",
+        history=history_text,
+        predictions_info=render_predictions_info(round_state)
+    )
+    return text, game_over_keyboard(lang=lang, revision=round_state.revision)
+
+
+def _markup_key(reply_markup):
+    if isinstance(reply_markup, InlineKeyboardMarkup):
+        return tuple(
+            (button.text, button.callback_data)
+            for row in reply_markup.inline_keyboard
+            for button in row
+        )
+    return reply_markup
+
+
+def forget_message(message: Message):
+    _last_rendered.pop((message.chat.id, message.message_id), None)
+
+
+async def _send_edit(message: Message, key: tuple, text: str, reply_markup):
+    try:
+        await message.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            _last_rendered.pop(key, None)
+            logger.error("Failed to edit message %s: %s", key, e)
+            return
+        edit_stats.not_modified += 1
+    except Exception as e:
+        _last_rendered.pop(key, None)
+        logger.error("Failed to edit message %s: %s", key, e)
+    else:
+        edit_stats.sent += 1
+
+
+async def edit_message(message: Message, text: str, reply_markup=None):
+    key = (message.chat.id, message.message_id)
+    rendered = hash((text, _markup_key(reply_markup)))
+    if _last_rendered.get(key) == rendered:
+        edit_stats.skipped += 1
+        logger.debug("Skipped no-op edit of message %s", key)
+        return
+    _last_rendered[key] = rendered
+    _last_rendered.move_to_end(key)
+    if len(_last_rendered) > EDIT_CACHE_SIZE:
+        _last_rendered.popitem(last=False)
+    # The edit is sent in the background so the handler (and the user's event lock) is released
+    # right away; the outbound scheduler coalesces it with any newer render of the same message.
+    task = asyncio.create_task(_send_edit(message, key, text, reply_markup))
+    _edit_tasks.add(task)
+    task.add_done_callback(_edit_tasks.discard)
+
+
+async def drain_edits():
+    while _edit_tasks:
+        await asyncio.gather(*list(_edit_tasks))
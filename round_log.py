@@ -0,0 +1,119 @@
+from typing import Dict, List, Optional
+
+from round_state import RoundState, BLANK, NOT_BLANK
+
+# A round is stored as its setup and an append-only string of one-character events, so the whole
+# log of a round is a few dozen bytes. Every event bumps the round version exactly once, which makes
+# the version the number of events applied and the position of the undo/redo cursor.
+SNAPSHOT_INTERVAL = 8
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+# A phone reveal carries its shell in the character: 'A' and 'B' are shell 1 blank and live, 'C' and
+# 'D' shell 2 and so on up to '~'. Longer rounds (only possible through text setup) are played without a log.
+PHONE_START = ord('A')
+MAX_LOGGED_SHELLS = (ord('~') - PHONE_START + 1) // 2
+
+SHOT = {BLANK: '0', NOT_BLANK: '1'}
+EJECT = {BLANK: '2', NOT_BLANK: '3'}
+MAGNIFIER = {BLANK: '4', NOT_BLANK: '5'}
+INVERT = '6'
+
+
+def phone_event(shot_number: int, shot_type: str) -> str:
+    return chr(PHONE_START + 2 * (shot_number - 1) + (shot_type == NOT_BLANK))
+
+
+def apply_event(round_state: RoundState, event: str):
+    if event in '01':
+        round_state.record_shot(NOT_BLANK if event == '1' else BLANK)
+    elif event in '23':
+        round_state.eject(NOT_BLANK if event == '3' else BLANK)
+    elif event in '45':
+        round_state.reveal_current(NOT_BLANK if event == '5' else BLANK)
+    elif event == INVERT:
+        round_state.invert_current()
+    elif ord(event) >= PHONE_START:
+        shell, live = divmod(ord(event) - PHONE_START, 2)
+        round_state.add_prediction(shell + 1)
+        round_state.set_prediction(NOT_BLANK if live else BLANK)
+    else:
+        raise ValueError(f"Unknown round event {event!r}")
+
+
+class RoundLog:
+    # `snapshots[k]` is the round after (k + 1) * SNAPSHOT_INTERVAL events, so rebuilding any point of
+    # the round replays fewer than SNAPSHOT_INTERVAL events on top of the nearest one.
+    __slots__ = ('setup', 'events', 'snapshots')
+
+    def __init__(self, setup: str, events: str = "", snapshots: Optional[List[list]] = None):
+        self.setup = setup
+        self.events = events
+        self.snapshots = snapshots if snapshots is not None else []
+
+    @classmethod
+    def start(cls, not_blank: int, blank: int) -> Optional["RoundLog"]:
+        if not_blank + blank > MAX_LOGGED_SHELLS:
+            return None
+        return cls(DIGITS[not_blank] + DIGITS[blank])
+
+    @classmethod
+    def from_data(cls, data: Optional[list]) -> Optional["RoundLog"]:
+        # Rounds started before the log existed have none and cannot be undone.
+        if not data:
+            return None
+        log, snapshots = data
+        return cls(log[:2], log[2:], list(snapshots))
+
+    def to_data(self) -> list:
+        return [self.setup + self.events, self.snapshots]
+
+    def initial_state(self) -> RoundState:
+        return RoundState(int(self.setup[0], 36), int(self.setup[1], 36))
+
+    def state_at(self, cursor: int) -> RoundState:
+        snapshot = cursor // SNAPSHOT_INTERVAL
+        if snapshot:
+            round_state = RoundState.from_data(self.snapshots[snapshot - 1])
+        else:
+            round_state = self.initial_state()
+        for event in self.events[snapshot * SNAPSHOT_INTERVAL:cursor]:
+            apply_event(round_state, event)
+        return round_state
+
+    def append(self, round_state: RoundState, event: str):
+        # A new event after an undo drops the undone tail, like any editor's history.
+        cursor = round_state.version
+        apply_event(round_state, event)
+        self.events = self.events[:cursor] + event
+        del self.snapshots[cursor // SNAPSHOT_INTERVAL:]
+        if round_state.version % SNAPSHOT_INTERVAL == 0:
+            self.snapshots.append(round_state.to_data())
+
+    def can_undo(self, round_state: RoundState) -> bool:
+        return round_state.version > 0
+
+    def can_redo(self, round_state: RoundState) -> bool:
+        return round_state.version < len(self.events)
+
+    def undo(self, round_state: RoundState) -> RoundState:
+        # The rebuilt round would carry the revision it had back then, which keyboards already used.
+        undone = self.state_at(round_state.version - 1)
+        undone.revision = round_state.revision + 1
+        return undone
+
+    def redo(self, round_state: RoundState):
+        apply_event(round_state, self.events[round_state.version])
+
+
+def start_log(not_blank: int, blank: int) -> Optional[list]:
+    log = RoundLog.start(not_blank, blank)
+    return log.to_data() if log is not None else None
+
+
+def record_event(data: Dict, round_state: RoundState, event: str) -> Dict:
+    # Applies the event to the round and returns the new session values for it and its log.
+    log = RoundLog.from_data(data.get('log'))
+    if log is None:
+        apply_event(round_state, event)
+        return {'round': round_state.to_data()}
+    log.append(round_state, event)
+    return {'round': round_state.to_data(), 'log': log.to_data()}
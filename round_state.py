@@ -0,0 +1,207 @@
+BLANK = 'blank'
+NOT_BLANK = 'not_blank'
+
+
+class RoundState:
+    # Shell N lives in bit N-1 of every mask, so all per-shell reads and writes are O(1).
+    __slots__ = (
+        'total_shots',
+        'current_shot',
+        'remaining_blank',
+        'remaining_not_blank',
+        'fired_mask',
+        'live_mask',
+        'blank_mask',
+        'phone_mask',
+        'pending_phone',
+        'inverted_mask',
+        'ejected_mask',
+        'version',
+        'revision',
+    )
+
+    def __init__(self, not_blank: int, blank: int):
+        self.total_shots = not_blank + blank
+        self.current_shot = 1
+        self.remaining_blank = blank
+        self.remaining_not_blank = not_blank
+        self.fired_mask = 0
+        self.live_mask = 0
+        self.blank_mask = 0
+        self.phone_mask = 0
+        self.pending_phone = 0
+        # Unknown shells flipped by the inverter: the remaining counts keep the type they were loaded as.
+        self.inverted_mask = 0
+        self.ejected_mask = 0
+        # Number of changes applied; an undo takes it back, so it is also the undo cursor.
+        self.version = 0
+        # Bumped by every change, undo included, and never reused; keyboards carry it so taps on
+        # outdated ones can be dropped.
+        self.revision = 0
+
+    @classmethod
+    def from_data(cls, data: list) -> "RoundState":
+        if len(data) < FIELDS:
+            # Rounds stored before items were tracked.
+            data = list(data) + [0] * (FIELDS - len(data))
+        round_state = cls.__new__(cls)
+        (
+            round_state.total_shots,
+            round_state.current_shot,
+            round_state.remaining_blank,
+            round_state.remaining_not_blank,
+            round_state.fired_mask,
+            round_state.live_mask,
+            round_state.blank_mask,
+            round_state.phone_mask,
+            round_state.pending_phone,
+            round_state.inverted_mask,
+            round_state.ejected_mask,
+            round_state.version,
+            round_state.revision,
+        ) = data
+        return round_state
+
+    def to_data(self) -> list:
+        return [
+            self.total_shots,
+            self.current_shot,
+            self.remaining_blank,
+            self.remaining_not_blank,
+            self.fired_mask,
+            self.live_mask,
+            self.blank_mask,
+            self.phone_mask,
+            self.pending_phone,
+            self.inverted_mask,
+            self.ejected_mask,
+            self.version,
+            self.revision,
+        ]
+
+    @property
+    def remaining_shots(self) -> int:
+        return self.remaining_blank + self.remaining_not_blank
+
+    @property
+    def is_over(self) -> bool:
+        return self.remaining_shots == 0
+
+    def status(self, shot_number: int):
+        bit = 1 << (shot_number - 1)
+        if self.live_mask & bit:
+            return NOT_BLANK
+        if self.blank_mask & bit:
+            return BLANK
+        return None
+
+    def is_fired(self, shot_number: int) -> bool:
+        return bool(self.fired_mask & (1 << (shot_number - 1)))
+
+    def is_inverted(self, shot_number: int) -> bool:
+        return bool(self.inverted_mask & (1 << (shot_number - 1)))
+
+    def is_ejected(self, shot_number: int) -> bool:
+        return bool(self.ejected_mask & (1 << (shot_number - 1)))
+
+    def has_prediction(self, shot_number: int) -> bool:
+        return bool(self.phone_mask & (1 << (shot_number - 1)))
+
+    def prediction(self, shot_number: int):
+        if not self.has_prediction(shot_number):
+            return None
+        return self.status(shot_number)
+
+    def _loaded_as(self, bit: int, shot_type: str) -> str:
+        if self.inverted_mask & bit:
+            return NOT_BLANK if shot_type == BLANK else BLANK
+        return shot_type
+
+    def can_reveal(self, shot_number: int, shot_type: str) -> bool:
+        loaded_as = self._loaded_as(1 << (shot_number - 1), shot_type)
+        if loaded_as == BLANK:
+            return self.remaining_blank > 0
+        if loaded_as == NOT_BLANK:
+            return self.remaining_not_blank > 0
+        return False
+
+    def can_record(self, shot_type: str) -> bool:
+        if self.status(self.current_shot):
+            return True
+        return self.can_reveal(self.current_shot, shot_type)
+
+    def record_shot(self, shot_type: str) -> str:
+        bit = 1 << (self.current_shot - 1)
+        known = self.status(self.current_shot)
+        if known:
+            shot_type = known
+        else:
+            self._reveal(bit, shot_type)
+        self.fired_mask |= bit
+        self.current_shot += 1
+        self.version += 1
+        self.revision += 1
+        return shot_type
+
+    def eject(self, shot_type: str) -> str:
+        # Beer racks the current shell out unfired; it is shown, so it counts like a shot.
+        self.ejected_mask |= 1 << (self.current_shot - 1)
+        return self.record_shot(shot_type)
+
+    def reveal_current(self, shot_type: str):
+        self._reveal(1 << (self.current_shot - 1), shot_type)
+        self.version += 1
+        self.revision += 1
+
+    def invert_current(self):
+        bit = 1 << (self.current_shot - 1)
+        if (self.live_mask | self.blank_mask) & bit:
+            self.live_mask ^= bit
+            self.blank_mask ^= bit
+        else:
+            self.inverted_mask ^= bit
+        self.version += 1
+        self.revision += 1
+
+    def can_predict(self, shot_type: str) -> bool:
+        if not self.pending_phone:
+            return False
+        return self.can_reveal(self.pending_phone, shot_type)
+
+    def add_prediction(self, shot_number: int):
+        self.pending_phone = shot_number
+
+    def set_prediction(self, shot_type: str) -> int:
+        shot_number = self.pending_phone
+        bit = 1 << (shot_number - 1)
+        self.phone_mask |= bit
+        self._reveal(bit, shot_type)
+        self.pending_phone = 0
+        self.version += 1
+        self.revision += 1
+        return shot_number
+
+    def fired_shots(self):
+        return [i for i in range(1, self.total_shots + 1) if self.fired_mask & (1 << (i - 1))]
+
+    def predicted_shots(self):
+        return [i for i in range(1, self.total_shots + 1) if self.phone_mask & (1 << (i - 1))]
+
+    def _reveal(self, bit: int, shot_type: str):
+        # The masks hold what the shell is now, the counts what it was loaded as.
+        if shot_type == BLANK:
+            self.blank_mask |= bit
+        else:
+            self.live_mask |= bit
+        if self._loaded_as(bit, shot_type) == BLANK:
+            self.remaining_blank -= 1
+        else:
+            self.remaining_not_blank -= 1
+
+
+FIELDS = len(RoundState.__slots__)
+REVISION_FIELD = RoundState.__slots__.index('revision')
+
+
+def round_revision(data: list) -> int:
+    return data[REVISION_FIELD] if len(data) > REVISION_FIELD else 0
@@ -0,0 +1,84 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType
+from aiogram.types import TelegramObject
+
+from logger import logger
+from taps import TapGuard
+
+
+class StateSession:
+    # Handlers should assign new values to `data` keys instead of mutating nested values in place,
+    # otherwise commit() cannot tell that something changed.
+    def __init__(self, context: FSMContext, raw_state: Optional[str], data: Dict[str, Any]):
+        self.context = context
+        self.state = raw_state
+        self.data = data
+        self.storage_calls = 0
+        self._loaded_state = raw_state
+        self._loaded_data = dict(data)
+
+    @classmethod
+    async def load(cls, context: FSMContext, raw_state: Optional[str]) -> "StateSession":
+        session = cls(context, raw_state, await context.get_data())
+        session.storage_calls += 1
+        return session
+
+    @property
+    def lang(self) -> str:
+        return self.data.get("language", "eng")
+
+    def set_state(self, state: StateType = None):
+        self.state = state.state if isinstance(state, State) else state
+
+    def update(self, **kwargs):
+        self.data.update(kwargs)
+
+    def reset(self, lang: Optional[str] = None):
+        self.data = {"language": lang or self.lang}
+        self.state = None
+
+    async def commit(self):
+        if self.data != self._loaded_data:
+            await self.context.set_data(self.data)
+            self.storage_calls += 1
+            self._loaded_data = dict(self.data)
+        if self.state != self._loaded_state:
+            await self.context.set_state(self.state)
+            self.storage_calls += 1
+            self._loaded_state = self.state
+
+
+class StateSessionMiddleware(BaseMiddleware):
+    def __init__(self, tap_guard: Optional[TapGuard] = None):
+        self.tap_guard = tap_guard
+        self.updates = 0
+        self.storage_calls = 0
+        self.last_storage_calls = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        context: Optional[FSMContext] = data.get("state")
+        if context is None:
+            return await handler(event, data)
+
+        session = await StateSession.load(context, data.get("raw_state"))
+        data["session"] = session
+        result = await handler(event, data)
+        await session.commit()
+        if self.tap_guard is not None:
+            self.tap_guard.observe(context.key, session.data.get("round"))
+
+        # One extra call for the state read done by FSMContextMiddleware before this middleware runs.
+        self.last_storage_calls = session.storage_calls + 1
+        self.storage_calls += self.last_storage_calls
+        self.updates += 1
+        logger.debug("Update committed with %s storage calls", self.last_storage_calls)
+        return result
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import multiprocessing
+import queue
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import GetUpdates
+from aiogram.types import Update
+from aiohttp import web
+
+from logger import logger
+from webhook import check_secret
+
+SUPERVISE_INTERVAL = 1.0
+STOP_TIMEOUT = 10.0
+
+
+def shard_key(update: dict) -> int:
+    # Chat id first, so a chat's FSM records and its outbound rate limit live in one worker;
+    # updates without a chat (inline queries, inline-message callbacks) fall back to the user id.
+    for field, event in update.items():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+    return 0
+
+
+STOP = b""
+
+
+class ShardChannel:
+    # A bounded local queue drained into a one-way pipe by a sender thread. Unlike multiprocessing.Queue
+    # the pipe has no reader lock, so a worker killed mid-read does not wedge its replacement, and
+    # updates still buffered in the pipe are picked up by the restarted worker.
+    def __init__(self, context, maxsize: int):
+        self.reader, self.writer = context.Pipe(duplex=False)
+        self.pending: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._send, daemon=True)
+        self.thread.start()
+
+    def _send(self):
+        while True:
+            payload = self.pending.get()
+            try:
+                self.writer.send_bytes(payload)
+            except OSError:
+                return
+            if payload == STOP:
+                return
+
+    def put_nowait(self, payload: bytes):
+        self.pending.put_nowait(payload)
+
+    def stop(self):
+        self.pending.put(STOP)
+
+
+class WorkerPool:
+    def __init__(self, workers: int, queue_size: int, setup: Optional[Callable] = None):
+        # Workers are spawned rather than forked: the parent already runs the logging thread and an event loop.
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.setup = setup
+        self.channels = [ShardChannel(self.context, queue_size) for _ in range(workers)]
+        self.processed = [self.context.Value('Q', 0, lock=False) for _ in range(workers)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.routed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        process = self.context.Process(
+            target=worker_main,
+            args=(index, self.workers, self.channels[index].reader, self.processed[index], self.setup),
+            name=f"shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info("Started %s shard workers", self.workers)
+
+    def _channel_for(self, update: dict) -> ShardChannel:
+        return self.channels[shard_key(update) % self.workers]
+
+    def put(self, update: dict, payload: bytes) -> bool:
+        try:
+            self._channel_for(update).put_nowait(payload)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.routed += 1
+        return True
+
+    async def put_wait(self, update: dict, payload: bytes):
+        # Backpressure for the poller: wait for the worker instead of dropping the update.
+        channel = self._channel_for(update)
+        while True:
+            try:
+                channel.put_nowait(payload)
+                break
+            except queue.Full:
+                await asyncio.sleep(0.05)
+        self.routed += 1
+
+    def total_processed(self) -> int:
+        return sum(value.value for value in self.processed)
+
+    async def supervise(self):
+        while not self._stopping:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive() and not self._stopping:
+                    self.restarts += 1
+                    logger.warning("Shard worker %s exited with code %s, restarting", index, process.exitcode)
+                    self._spawn(index)
+
+    async def stop(self):
+        self._stopping = True
+        for channel in self.channels:
+            await asyncio.to_thread(channel.stop)
+        for process in self.processes:
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning("Shard worker %s did not stop in time, terminating", process.name)
+                process.terminate()
+
+
+def worker_main(index: int, workers: int, reader, processed, setup: Optional[Callable] = None):
+    # Ctrl+C reaches the whole process group; the parent stops workers through their pipes instead.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_run_worker(index, workers, reader, processed, setup))
+
+
+async def _run_worker(index: int, workers: int, reader, processed, setup: Optional[Callable]):
+    from archive import round_archive
+    from bot import bot, configure_shard, dp, metrics
+    from config import METRICS_HOST, WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS
+    from handlers import register_handlers
+    from keyboards import warm_keyboard_cache
+    from metrics import serve_metrics
+    from render import drain_edits
+    from solver import solver_table
+    from webhook import UpdateQueue
+
+    metrics_port = configure_shard(index, workers)
+    register_handlers(dp)
+    warm_keyboard_cache()
+    solver_table.load()
+    dp.shutdown.register(drain_edits)
+    dp.shutdown.register(round_archive.close)
+    if setup is not None:
+        setup(bot, dp)
+    metrics_runner = await serve_metrics(metrics, METRICS_HOST, metrics_port) if metrics_port else None
+    updates = UpdateQueue(dp, bot, maxsize=WEBHOOK_QUEUE_SIZE, workers=WEBHOOK_WORKERS)
+    await updates.start()
+    await dp.emit_startup(bot=bot)
+
+    async def report():
+        while True:
+            processed.value = updates.processed
+            await asyncio.sleep(0.05)
+
+    reporter = asyncio.create_task(report())
+    loop = asyncio.get_running_loop()
+    # A dedicated thread blocks on the pipe, so the default executor stays free for aiogram.
+    receiver = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard-{index}-reader")
+    try:
+        while True:
+            payload = await loop.run_in_executor(receiver, reader.recv_bytes)
+            if payload == STOP:
+                break
+            try:
+                update = Update.model_validate_json(payload, context={"bot": bot})
+            except ValueError as e:
+                logger.warning("Shard %s dropped a malformed update: %s", index, e)
+                continue
+            # A full local queue stops this loop from taking more work, so the ingress sees the backlog.
+            await updates.queue.put(update)
+    finally:
+        receiver.shutdown(wait=False)
+        await updates.stop()
+        reporter.cancel()
+        processed.value = updates.processed
+        await dp.emit_shutdown(bot=bot)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await bot.session.close()
+
+
+async def poll_to_pool(dp: Dispatcher, bot: Bot, pool: WorkerPool, timeout: int = 30):
+    allowed_updates = dp.resolve_used_update_types()
+    offset = None
+    while True:
+        try:
+            updates = await bot(GetUpdates(offset=offset, timeout=timeout, allowed_updates=allowed_updates),
+                                request_timeout=timeout + 10)
+        except Exception as e:
+            logger.error("Failed to fetch updates: %s", e)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            payload = update.model_dump_json(exclude_unset=True).encode()
+            await pool.put_wait(json.loads(payload), payload)
+
+
+def create_ingress_app(pool: WorkerPool, path: str, secret: Optional[str]) -> web.Application:
+    async def handle_update(request: web.Request) -> web.Response:
+        if not check_secret(request, secret):
+            return web.Response(status=401)
+        payload = await request.read()
+        try:
+            update = json.loads(payload)
+        except ValueError as e:
+            logger.warning("Rejected malformed webhook update: %s", e)
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            logger.warning("Rejected malformed webhook update: %s", payload[:100])
+            return web.Response(status=400)
+        if not pool.put(update, payload):
+            # Telegram redelivers updates that were not acknowledged, so shedding load here is safe.
+            logger.warning("Shard queue is full, rejecting update %s", update.get("update_id"))
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app["pool"] = pool
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def run_sharded(
+    dp: Dispatcher,
+    bot: Bot,
+    workers: int,
+    queue_size: int,
+    mode: str,
+    url: Optional[str] = None,
+    path: str = "/webhook",
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    secret: Optional[str] = None,
+):
+    pool = WorkerPool(workers, queue_size)
+    pool.start()
+    supervisor = asyncio.create_task(pool.supervise())
+    runner = None
+    try:
+        if mode == 'webhook':
+            runner = web.AppRunner(create_ingress_app(pool, path, secret))
+            await runner.setup()
+            await web.TCPSite(runner, host=host, port=port).start()
+            await bot.set_webhook(url.rstrip("/") + path, secret_token=secret)
+            logger.info("Webhook set to %s, fanning out to %s workers", url.rstrip('/') + path, workers)
+            await asyncio.Event().wait()
+        else:
+            logger.info("Polling and fanning out to %s workers", workers)
+            await poll_to_pool(dp, bot, pool)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        supervisor.cancel()
+        await pool.stop()
+        logger.info("Shard workers stopped after %s routed updates, %s restarts", pool.routed, pool.restarts)
@@ -0,0 +1,161 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from probability import live_probabilities
+from round_state import RoundState, BLANK, NOT_BLANK
+
+# Monte Carlo check of the tracker. Every simulated round is a random order of the loaded shells, fired
+# one by one, with the burner phone used at a random moment on a random later shell. Each point of every
+# round is a situation the tracker could be in; rounds are grouped by what the tracker knows there (the
+# fired shells and the phone reveal) and the live frequency of every unfired shell in the group is
+# compared with what RoundState reports after the same record_shot and set_prediction calls.
+BATCH_ROUNDS = 100_000
+PHONE_RATE = 0.5
+# Deviations beyond this many standard errors are reported as failures. Many situations are checked
+# at once, so this is well above the usual 2-3.
+MAX_Z = 5.0
+MIN_OBSERVATIONS = 100
+
+
+def simulate(not_blank: int, blank: int, rounds: int, seed, phone_rate: float = PHONE_RATE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Returns the situation keys, how often each was seen and how many of those times each shell was live.
+    rng = np.random.default_rng(seed)
+    shells = not_blank + blank
+    live = rng.random((rounds, shells)).argsort(axis=1) < not_blank
+
+    # The phone is used while shell `used_at` is current and reveals a later shell `revealed`.
+    used = rng.random(rounds) < phone_rate
+    used_at = rng.integers(0, shells - 1, rounds)
+    revealed = used_at + 1 + (rng.random(rounds) * (shells - 1 - used_at)).astype(np.int64)
+    revealed_live = live[np.arange(rounds), revealed]
+
+    fired = np.arange(shells)
+    prefix = np.zeros((rounds, shells), dtype=np.int64)
+    prefix[:, 1:] = np.cumsum(live[:, :-1].astype(np.int64) << fired[:-1], axis=1)
+    known = used[:, None] & (used_at[:, None] <= fired) & (revealed[:, None] >= fired)
+    phone = np.where(known, (1 + 2 * revealed + revealed_live)[:, None], 0)
+    keys = ((prefix * (shells + 1) + fired) * (2 * shells + 1) + phone).ravel()
+
+    situations, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    live_counts = np.stack([
+        np.bincount(inverse, weights=np.repeat(live[:, shell], shells), minlength=len(situations))
+        for shell in range(shells)
+    ], axis=1)
+    return situations, counts, live_counts
+
+
+def merge(parts: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    keys = np.concatenate([part[0] for part in parts])
+    situations, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([part[1] for part in parts]), minlength=len(situations))
+    live_counts = np.zeros((len(situations), parts[0][2].shape[1]))
+    np.add.at(live_counts, inverse, np.concatenate([part[2] for part in parts]))
+    return situations, counts, live_counts
+
+
+def tracker_state(not_blank: int, blank: int, key: int) -> Tuple[RoundState, int]:
+    # Replays a situation through the tracker; returns it with the number of fired shells.
+    shells = not_blank + blank
+    rest, phone = divmod(key, 2 * shells + 1)
+    prefix, fired = divmod(rest, shells + 1)
+    round_state = RoundState(not_blank, blank)
+    for shell in range(fired):
+        round_state.record_shot(NOT_BLANK if prefix >> shell & 1 else BLANK)
+    if phone:
+        revealed, revealed_live = divmod(phone - 1, 2)
+        round_state.add_prediction(revealed + 1)
+        round_state.set_prediction(NOT_BLANK if revealed_live else BLANK)
+    return round_state, fired
+
+
+class Check:
+    __slots__ = ('situations', 'compared', 'max_error', 'max_z', 'failures')
+
+    def __init__(self):
+        self.situations = 0
+        self.compared = 0
+        self.max_error = 0.0
+        self.max_z = 0.0
+        self.failures: List[str] = []
+
+
+def check(not_blank: int, blank: int, situations: np.ndarray, counts: np.ndarray, live_counts: np.ndarray) -> Check:
+    result = Check()
+    result.situations = len(situations)
+    for key, count, live in zip(situations.tolist(), counts, live_counts):
+        if count < MIN_OBSERVATIONS:
+            continue
+        round_state, fired = tracker_state(not_blank, blank, key)
+        predicted = live_probabilities(round_state)
+        for shell in range(fired, round_state.total_shots):
+            expected, observed = predicted[shell], live[shell] / count
+            error = abs(observed - expected)
+            if 0 < expected < 1:
+                z = error / (expected * (1 - expected) / count) ** 0.5
+            else:
+                z = 0.0 if error == 0 else float("inf")
+            result.compared += 1
+            result.max_error = max(result.max_error, error)
+            result.max_z = max(result.max_z, z)
+            if z > MAX_Z:
+                result.failures.append(
+                    f"{not_blank}/{blank} after {fired} shots, shell {shell + 1}: tracker {expected:.4f}, "
+                    f"observed {observed:.4f} over {count:.0f} rounds"
+                )
+    return result
+
+
+def run(not_blank: int, blank: int, rounds: int, seed: int, pool=None) -> Tuple[Check, float]:
+    batches = [BATCH_ROUNDS] * (rounds // BATCH_ROUNDS) + ([rounds % BATCH_ROUNDS] if rounds % BATCH_ROUNDS else [])
+    seeds = np.random.SeedSequence([seed, not_blank, blank]).spawn(len(batches))
+    start = time.perf_counter()
+    if pool is None:
+        parts = [simulate(not_blank, blank, batch, batch_seed) for batch, batch_seed in zip(batches, seeds)]
+    else:
+        parts = list(pool.map(simulate, [not_blank] * len(batches), [blank] * len(batches), batches, seeds))
+    situations, counts, live_counts = merge(parts)
+    elapsed = time.perf_counter() - start
+    return check(not_blank, blank, situations, counts, live_counts), rounds / elapsed
+
+
+def parse_loads(values: List[str]) -> List[Tuple[int, int]]:
+    loads = []
+    for value in values:
+        not_blank, _, blank = value.partition('/')
+        loads.append((int(not_blank), int(blank)))
+    return loads
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the tracker's probabilities against simulated rounds.")
+    parser.add_argument("loads", nargs="*", default=[f"{live}/{blank}" for live in range(1, 5) for blank in range(1, 5)],
+                        help="combat/blank loads to simulate, every load of the game by default")
+    parser.add_argument("--rounds", type=int, default=1_000_000, help="rounds per load")
+    parser.add_argument("--workers", type=int, default=None, help="processes, one per core by default; 1 runs inline")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    failures: List[str] = []
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers != 1 else None
+    print(f"{'load':>6} {'rounds':>10} {'situations':>11} {'checks':>7} {'max err':>8} {'max z':>6} {'rounds/s':>11}")
+    try:
+        for not_blank, blank in parse_loads(args.loads):
+            result, rate = run(not_blank, blank, args.rounds, args.seed, pool)
+            failures += result.failures
+            print(f"{f'{not_blank}/{blank}':>6} {args.rounds:>10} {result.situations:>11} {result.compared:>7} "
+                  f"{result.max_error:>8.4f} {result.max_z:>6.2f} {rate:>11.0f}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    for failure in failures:
+        print(f"MISMATCH {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from round_state import RoundState, BLANK, NOT_BLANK
+from probability import live_probabilities
+from config import logger, SOLVER_TABLE_PATH
+
+# Win probability of the player over (live, blank, current shell, player HP, dealer HP, turn), where
+# live and blank count every shell left in the chamber, the current shell is unknown, live or blank,
+# and the turn is the player's or the dealer's. The dealer is assumed to play optimally against the
+# player. When the chamber runs dry a new load of 1..MAX_LOAD live and 1..MAX_LOAD blank shells is
+# drawn uniformly at random and the player shoots first, so the value covers the whole duel, not
+# just the current load. Items are not modelled.
+MAX_SHELLS = 8
+MAX_HP = 6
+MAX_LOAD = 4
+
+UNKNOWN, LIVE, EMPTY = 0, 1, 2
+PLAYER, DEALER = 0, 1
+SHOOT_SELF, SHOOT_DEALER = 'shoot_self', 'shoot_dealer'
+
+HEADER = struct.Struct('<4sHHHH')
+MAGIC = b'BRS1'
+TABLE_SIZE = (MAX_SHELLS + 1) ** 2 * 3 * (MAX_HP + 1) ** 2 * 2
+
+
+def table_index(live: int, blank: int, current: int, player_hp: int, dealer_hp: int, turn: int) -> int:
+    return ((((live * (MAX_SHELLS + 1) + blank) * 3 + current) * (MAX_HP + 1) + player_hp) * (MAX_HP + 1) + dealer_hp) * 2 + turn
+
+
+@lru_cache(maxsize=None)
+def _reload_value(player_hp: int, dealer_hp: int) -> float:
+    loads = [(live, blank) for live in range(1, MAX_LOAD + 1) for blank in range(1, MAX_LOAD + 1)]
+    return sum(_value(live, blank, UNKNOWN, player_hp, dealer_hp, PLAYER) for live, blank in loads) / len(loads)
+
+
+def _live_chance(live: int, blank: int, current: int) -> float:
+    if current == LIVE:
+        return 1.0
+    if current == EMPTY:
+        return 0.0
+    return live / (live + blank)
+
+
+def _action_values(live: int, blank: int, current: int, player_hp: int, dealer_hp: int, turn: int) -> Tuple[float, float]:
+    # Values of the shooter aiming at themselves and at the opponent. A blank at yourself keeps the turn.
+    p_live = _live_chance(live, blank, current)
+    opponent = DEALER if turn == PLAYER else PLAYER
+    at_self = at_other = 0.0
+    if p_live:
+        if turn == PLAYER:
+            at_self += p_live * _value(live - 1, blank, UNKNOWN, player_hp - 1, dealer_hp, opponent)
+            at_other += p_live * _value(live - 1, blank, UNKNOWN, player_hp, dealer_hp - 1, opponent)
+        else:
+            at_self += p_live * _value(live - 1, blank, UNKNOWN, player_hp, dealer_hp - 1, opponent)
+            at_other += p_live * _value(live - 1, blank, UNKNOWN, player_hp - 1, dealer_hp, opponent)
+    if p_live < 1:
+        at_self += (1 - p_live) * _value(live, blank - 1, UNKNOWN, player_hp, dealer_hp, turn)
+        at_other += (1 - p_live) * _value(live, blank - 1, UNKNOWN, player_hp, dealer_hp, opponent)
+    return at_self, at_other
+
+
+@lru_cache(maxsize=None)
+def _value(live: int, blank: int, current: int, player_hp: int, dealer_hp: int, turn: int) -> float:
+    if player_hp <= 0:
+        return 0.0
+    if dealer_hp <= 0:
+        return 1.0
+    if live + blank == 0:
+        return _reload_value(player_hp, dealer_hp)
+    if (current == LIVE and not live) or (current == EMPTY and not blank):
+        return 0.0
+    at_self, at_other = _action_values(live, blank, current, player_hp, dealer_hp, turn)
+    return max(at_self, at_other) if turn == PLAYER else min(at_self, at_other)
+
+
+def build_table() -> array:
+    # Small HP totals first keeps the recursion shallow: every load ends with someone losing HP.
+    table = array('f', bytes(4 * TABLE_SIZE))
+    for hp_total in range(0, 2 * MAX_HP + 1):
+        for player_hp in range(max(0, hp_total - MAX_HP), min(MAX_HP, hp_total) + 1):
+            dealer_hp = hp_total - player_hp
+            for live in range(MAX_SHELLS + 1):
+                for blank in range(MAX_SHELLS + 1):
+                    for current in (UNKNOWN, LIVE, EMPTY):
+                        for turn in (PLAYER, DEALER):
+                            table[table_index(live, blank, current, player_hp, dealer_hp, turn)] = \
+                                _value(live, blank, current, player_hp, dealer_hp, turn)
+    return table
+
+
+def write_table(path: str, table: array):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, MAX_SHELLS, MAX_HP, MAX_LOAD, 0))
+        table.tofile(f)
+    # Several shard workers may build the table at once; each one replaces the file atomically.
+    os.replace(tmp_path, path)
+
+
+class SolverTable:
+    def __init__(self, path: str):
+        self.path = path
+        self._mmap: Optional[mmap.mmap] = None
+        self._values: Optional[memoryview] = None
+
+    def _open(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        if len(mapped) != HEADER.size + 4 * TABLE_SIZE \
+                or HEADER.unpack_from(mapped) != (MAGIC, MAX_SHELLS, MAX_HP, MAX_LOAD, 0):
+            mapped.close()
+            return False
+        self._mmap = mapped
+        self._values = memoryview(mapped)[HEADER.size:].cast('f')
+        return True
+
+    def load(self):
+        if self._values is not None or self._open():
+            return
+        start = time.perf_counter()
+        write_table(self.path, build_table())
+        logger.info("Built the solver table at %s in %.1fs", self.path, time.perf_counter() - start)
+        if not self._open():
+            raise RuntimeError(f"Solver table at {self.path} could not be read back")
+
+    def value(self, live: int, blank: int, current: int, player_hp: int, dealer_hp: int, turn: int = PLAYER) -> float:
+        if player_hp <= 0:
+            return 0.0
+        if dealer_hp <= 0:
+            return 1.0
+        if self._values is None:
+            self.load()
+        return self._values[table_index(live, blank, current, player_hp, dealer_hp, turn)]
+
+    def recommend(self, round_state: RoundState, player_hp: int, dealer_hp: int) -> Optional[Tuple[str, float]]:
+        # One step of lookahead over the table: the current shell's odds come from the tracker, which
+        # also knows about phone reveals further down the chamber, and the shell after it keeps its
+        # revealed state. Returns the better action and the player's win probability with it.
+        shot = round_state.current_shot
+        if shot > round_state.total_shots or not 0 < player_hp <= MAX_HP or not 0 < dealer_hp <= MAX_HP:
+            return None
+        rest = round_state.total_shots - shot
+        later = ~round_state.fired_mask & ~(1 << (shot - 1))
+        known_live = bin(round_state.live_mask & later).count("1")
+        # Live shells left after this one, depending on what it turns out to be. An unknown current shell
+        # is one of the counted ones; an inverted one was loaded as the opposite of what it fires as.
+        unknown_live = round_state.remaining_not_blank
+        if round_state.status(shot) is not None:
+            live_after_live = live_after_blank = unknown_live
+        elif round_state.is_inverted(shot):
+            live_after_live, live_after_blank = unknown_live, unknown_live - 1
+        else:
+            live_after_live, live_after_blank = unknown_live - 1, unknown_live
+        live_after_live += known_live
+        live_after_blank += known_live
+        if max(live_after_live, live_after_blank, rest - live_after_live, rest - live_after_blank) > MAX_SHELLS:
+            return None
+        p_live = live_probabilities(round_state)[shot - 1]
+        following = round_state.status(shot + 1) if shot < round_state.total_shots else None
+        after = {NOT_BLANK: LIVE, BLANK: EMPTY}.get(following, UNKNOWN)
+        at_self = at_dealer = 0.0
+        if p_live:
+            blank = rest - live_after_live
+            at_self += p_live * self.value(live_after_live, blank, after, player_hp - 1, dealer_hp, DEALER)
+            at_dealer += p_live * self.value(live_after_live, blank, after, player_hp, dealer_hp - 1, DEALER)
+        if p_live < 1:
+            blank = rest - live_after_blank
+            at_self += (1 - p_live) * self.value(live_after_blank, blank, after, player_hp, dealer_hp, PLAYER)
+            at_dealer += (1 - p_live) * self.value(live_after_blank, blank, after, player_hp, dealer_hp, DEALER)
+        if at_self > at_dealer:
+            return SHOOT_SELF, at_self
+        return SHOOT_DEALER, at_dealer
+
+    def close(self):
+        if self._values is not None:
+            self._values.release()
+            self._values = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+solver_table = SolverTable(SOLVER_TABLE_PATH)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else SOLVER_TABLE_PATH
+    start = time.perf_counter()
+    write_table(path, build_table())
+    print(f"wrote {TABLE_SIZE} values to {path} in {time.perf_counter() - start:.2f}s")
@@ -4,3 +4,5 @@ class GameStates(StatesGroup):
     GameSetup = State()
     GameTracking = State()
     PredictingShot = State()
+    UsingItem = State()
+    GameOver = State()
@@ -0,0 +1,332 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from logger import logger
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 0.5,
+        batch_size: int = 256,
+        key_builder: Optional[KeyBuilder] = None,
+        keep_cache: bool = True,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # Without the cache only records waiting to be flushed stay in memory; BoundedStorage keeps the hot ones.
+        self.keep_cache = keep_cache
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        # A single worker thread owns the connection, so every query is serialized off the event loop.
+        # It is opened on first use, so processes that never touch FSM data (the sharding ingress) leave the file alone.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-sqlite")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._cache: Dict[str, list] = {}
+        self._dirty: set = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        # A batch is being written; the flush task must not be cancelled then, only asked to go again.
+        self._flushing = False
+        self._flush_again = False
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS fsm (key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL)"
+        )
+        connection.commit()
+        return connection
+
+    def _call(self, func, *args):
+        if self._connection is None:
+            self._connection = self._connect()
+        return func(*args)
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, func, *args)
+
+    def _select(self, key: str):
+        return self._connection.execute("SELECT state, data FROM fsm WHERE key = ?", (key,)).fetchone()
+
+    def _write_batch(self, rows):
+        upserts = [(key, state, data) for key, state, data in rows if data is not None]
+        deletes = [(key,) for key, state, data in rows if data is None]
+        with self._connection:
+            if upserts:
+                self._connection.executemany(
+                    "INSERT INTO fsm (key, state, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data",
+                    upserts,
+                )
+            if deletes:
+                self._connection.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+
+    async def _record(self, key: StorageKey) -> list:
+        db_key = self.key_builder.build(key)
+        record = self._cache.get(db_key)
+        if record is None:
+            row = await self._run(self._select, db_key)
+            # Another coroutine may have filled the slot while the row was loading.
+            record = self._cache.get(db_key)
+            if record is None:
+                record = [row[0], json.loads(row[1])] if row else [None, {}]
+                self._cache[db_key] = record
+        return record
+
+    def _mark_dirty(self, key: StorageKey):
+        self._dirty.add(self.key_builder.build(key))
+        if len(self._dirty) >= self.batch_size:
+            self._schedule_flush(0)
+        else:
+            self._schedule_flush(self.flush_interval)
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_task is not None and not self._flush_task.done():
+            if delay:
+                return
+            if self._flushing:
+                self._flush_again = True
+                return
+            self._flush_task.cancel()
+        self._flush_task = asyncio.create_task(self._flush_loop(delay))
+
+    async def _flush_loop(self, delay: float):
+        # Keys dirtied while a batch is being written are picked up by the next pass.
+        while self._dirty:
+            if delay and not self._flush_again:
+                await asyncio.sleep(delay)
+            self._flush_again = False
+            await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = []
+        for key in dirty:
+            state, data = self._cache[key]
+            # Empty records are deleted rather than stored; data is serialized here so later
+            # in-place mutations on the loop cannot race with the writer thread.
+            rows.append((key, state, json.dumps(data) if state is not None or data else None))
+        self._flushing = True
+        try:
+            await self._run(self._write_batch, rows)
+        except sqlite3.Error as e:
+            logger.error("Failed to flush %s FSM records to %s: %s", len(rows), self.path, e)
+            self._dirty |= dirty
+            raise
+        except BaseException:
+            # Cancelled mid-write: the batch may not have reached the file, so it is written again.
+            self._dirty |= dirty
+            raise
+        finally:
+            self._flushing = False
+        if not self.keep_cache:
+            for key in dirty - self._dirty:
+                self._cache.pop(key, None)
+        logger.debug("Flushed %s FSM records to %s", len(rows), self.path)
+
+    async def load(self, key: StorageKey) -> Optional[Tuple[Optional[str], Dict[str, Any]]]:
+        # One read of a whole record that leaves nothing cached; records still waiting for the
+        # flush are served from memory.
+        db_key = self.key_builder.build(key)
+        record = self._cache.get(db_key)
+        if record is None:
+            row = await self._run(self._select, db_key)
+            record = self._cache.get(db_key)
+            if record is None:
+                return (row[0], json.loads(row[1])) if row else None
+        return record[0], record[1].copy()
+
+    def store(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        self._cache[self.key_builder.build(key)] = [state, data.copy()]
+        self._mark_dirty(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record[0] = state.state if isinstance(state, State) else state
+        self._mark_dirty(key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record[1] = data.copy()
+        self._mark_dirty(key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key))[1].copy()
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except (asyncio.CancelledError, sqlite3.Error):
+                pass
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+        self._executor.shutdown(wait=True)
+
+
+class SessionCacheStats:
+    __slots__ = ('evicted_idle', 'evicted_lru', 'spilled', 'reloaded')
+
+    def __init__(self):
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.spilled = 0
+        self.reloaded = 0
+
+
+# Rough per-record cost of the key, the record list and the dict on top of the serialized data.
+RECORD_OVERHEAD = 800
+
+
+def record_size(state: Optional[str], data: Dict[str, Any]) -> int:
+    return RECORD_OVERHEAD + len(state or "") + len(json.dumps(data, separators=(",", ":")))
+
+
+class BoundedStorage(BaseStorage):
+    # Keeps FSM records in memory in least-recently-used order. Records idle for longer than
+    # `idle_ttl` seconds, and the least recently used ones once the estimated size passes
+    # `max_bytes`, are evicted on the next write. Evicted records go to the `spill` store, if any,
+    # and are read back from it on the next update for that key. With `write_through` every write
+    # also goes to the spill store, which then is the durable copy and eviction only drops memory.
+    def __init__(
+        self,
+        idle_ttl: float = 0,
+        max_bytes: int = 0,
+        spill: Optional[SQLiteStorage] = None,
+        write_through: bool = False,
+    ):
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.write_through = write_through and spill is not None
+        # key -> [state, data, estimated size, last used (monotonic)]
+        self._records: "OrderedDict[StorageKey, list]" = OrderedDict()
+        self.bytes = 0
+        # Number of records in memory per FSM state.
+        self.states: Dict[str, int] = {}
+        self.stats = SessionCacheStats()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def gauges(self) -> Dict[str, int]:
+        return {"sessions": len(self._records), "bytes": self.bytes}
+
+    def _count(self, state: Optional[str], delta: int):
+        if state is None:
+            return
+        count = self.states.get(state, 0) + delta
+        if count:
+            self.states[state] = count
+        else:
+            del self.states[state]
+
+    async def _record(self, key: StorageKey) -> list:
+        records = self._records
+        record = records.get(key)
+        if record is None:
+            loaded = await self.spill.load(key) if self.spill is not None else None
+            # Another coroutine may have filled the slot while the record was loading.
+            record = records.get(key)
+            if record is None:
+                state, data = loaded or (None, {})
+                if loaded is not None:
+                    self.stats.reloaded += 1
+                record = [state, data, record_size(state, data), 0.0]
+                records[key] = record
+                self.bytes += record[2]
+                self._count(state, 1)
+        return self._touch(key, record)
+
+    def _touch(self, key: StorageKey, record: list) -> list:
+        self._records.move_to_end(key)
+        record[3] = time.monotonic()
+        return record
+
+    def _written(self, key: StorageKey, record: list):
+        if self.write_through:
+            self.spill.store(key, record[0], record[1])
+        self._evict(record[3])
+
+    def _evict(self, now: float):
+        records = self._records
+        deadline = now - self.idle_ttl if self.idle_ttl else None
+        while records:
+            key, record = next(iter(records.items()))
+            if self.max_bytes and self.bytes > self.max_bytes:
+                self.stats.evicted_lru += 1
+            elif deadline is not None and record[3] < deadline:
+                self.stats.evicted_idle += 1
+            else:
+                return
+            del records[key]
+            self.bytes -= record[2]
+            self._count(record[0], -1)
+            self._spill(key, record)
+
+    def _spill(self, key: StorageKey, record: list):
+        # Empty records (users who never got past /start, finished group games) are simply dropped.
+        if self.spill is None or self.write_through or (record[0] is None and not record[1]):
+            return
+        self.spill.store(key, record[0], record[1])
+        self.stats.spilled += 1
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        state = state.state if isinstance(state, State) else state
+        size = record_size(state, record[1])
+        self.bytes += size - record[2]
+        self._count(record[0], -1)
+        self._count(state, 1)
+        record[0], record[2] = state, size
+        self._written(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        data = data.copy()
+        size = record_size(record[0], data)
+        self.bytes += size - record[2]
+        record[1], record[2] = data, size
+        self._written(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key))[1].copy()
+
+    async def close(self) -> None:
+        if self.spill is None:
+            return
+        for key, record in self._records.items():
+            self._spill(key, record)
+        self._records.clear()
+        self.bytes = 0
+        self.states.clear()
+        await self.spill.close()
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from callbacks import CallbackPayload
+from round_state import round_revision
+
+
+class TapStats:
+    __slots__ = ('duplicate', 'stale')
+
+    def __init__(self):
+        self.duplicate = 0
+        self.stale = 0
+
+
+class TapGuard:
+    # Remembers recent callback query ids and the current round revision of every game, so a
+    # redelivered update or a second tap on a keyboard the first tap already changed is dropped
+    # with a dictionary lookup, before the FSM record is read or the Bot API is called.
+    # Games it does not know (after a restart or eviction) are let through to the state filters.
+    def __init__(self, size: int):
+        self.size = size
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._versions: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.stats = TapStats()
+
+    def is_duplicate(self, callback_id: str) -> bool:
+        seen = self._seen
+        if callback_id in seen:
+            self.stats.duplicate += 1
+            return True
+        seen[callback_id] = None
+        if len(seen) > self.size:
+            seen.popitem(last=False)
+        return False
+
+    def is_stale(self, key: Hashable, payload: Optional[CallbackPayload]) -> bool:
+        if payload is None or payload.version is None:
+            return False
+        current = self._versions.get(key)
+        if current is None or current == payload.version:
+            return False
+        self.stats.stale += 1
+        return True
+
+    def observe(self, key: Hashable, round_data: Optional[list]):
+        versions = self._versions
+        if round_data is None:
+            versions.pop(key, None)
+            return
+        versions[key] = round_revision(round_data)
+        versions.move_to_end(key)
+        if len(versions) > self.size:
+            versions.popitem(last=False)
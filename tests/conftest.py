@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+os.environ.setdefault('TOKEN', '42:BENCHMARK')
+# Test rounds stay out of the finished-round archive.
+os.environ.setdefault('ARCHIVE_PATH', os.devnull)
+# Translations are loaded from a path relative to the repository root.
+os.chdir(ROOT)
+
+
+@pytest.fixture(scope="session")
+def feed():
+    # The real dispatcher with every handler, answering Bot API calls locally.
+    from aiogram.types import Update
+
+    from bot import bot, dp
+    from handlers import register_handlers
+    from mock_session import RecordingSession
+    from render import drain_edits
+
+    register_handlers(dp)
+    bot.session = RecordingSession()
+
+    async def feed_updates(*raws: dict):
+        for raw in raws:
+            await dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot}))
+        await drain_edits()
+
+    return feed_updates
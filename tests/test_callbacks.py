@@ -0,0 +1,60 @@
+import pytest
+
+from callbacks import MAX_CALLBACK_DATA, Action, CallbackPayload, decode, encode
+
+
+def test_round_trip():
+    assert encode(Action.PREDICT_SHOT, 5) == "1P5"
+    assert decode("1P5") == CallbackPayload(Action.PREDICT_SHOT, (5,))
+    assert decode(encode(Action.SET_BLANK, 40)) == CallbackPayload(Action.SET_BLANK, (40,))
+    assert decode(encode(Action.CANCEL)) == CallbackPayload(Action.CANCEL)
+
+
+def test_round_revision():
+    data = encode(Action.RECORD_SHOT_BLANK, version=37)
+    assert data == "1r11"
+    assert decode(data) == CallbackPayload(Action.RECORD_SHOT_BLANK, (), 37)
+    # Tracking buttons from before revisions were added still decode, without one.
+    assert decode("1r") == CallbackPayload(Action.RECORD_SHOT_BLANK)
+    with pytest.raises(ValueError):
+        encode(Action.PREDICT_SHOT, 1, version=2)
+
+
+def test_legacy_strings():
+    assert decode("predict_shot_5") == CallbackPayload(Action.PREDICT_SHOT, (5,))
+    assert decode("set_not_blank_3") == CallbackPayload(Action.SET_NOT_BLANK, (3,))
+    assert decode("record_shot_not_blank") == CallbackPayload(Action.RECORD_SHOT_NOT_BLANK)
+    assert decode("start_new_game") == CallbackPayload(Action.START_NEW_GAME)
+    assert decode("predict_shot") is None
+    assert decode("predict_shot_x") is None
+    assert decode("use_phone_1") is None
+    assert decode("no_such_action") is None
+
+
+def test_arity():
+    with pytest.raises(ValueError):
+        encode(Action.PREDICT_SHOT)
+    with pytest.raises(ValueError):
+        encode(Action.CANCEL, 1)
+    with pytest.raises(ValueError):
+        encode(Action.SET_BLANK, -1)
+    assert decode("1P") is None
+    assert decode("1P1.2") is None
+    assert decode("1c1") is None
+    # One extra argument is a revision only on versioned actions.
+    assert decode("1P1.2.3") is None
+
+
+def test_malformed():
+    assert decode(None) is None
+    assert decode("") is None
+    assert decode("1") is None
+    assert decode("1#") is None
+    assert decode("1P!") is None
+    assert decode("1P1..2") is None
+
+
+def test_size_limit():
+    assert len(encode(Action.PREDICT_SHOT, 36 ** 62 - 1)) == MAX_CALLBACK_DATA
+    with pytest.raises(ValueError):
+        encode(Action.PREDICT_SHOT, 36 ** 62)
@@ -0,0 +1,91 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from callbacks import Action, encode
+from round_state import RoundState
+from states import GameStates
+from updates import callback_update, message_update
+
+
+def test_last_shot_can_be_undone(feed, monkeypatch):
+    from archive import round_archive
+    from bot import dp, tap_guard
+
+    user_id = 2001
+    key = StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+    archived = []
+    monkeypatch.setattr(round_archive, "append", lambda user_id, round_state: archived.append(round_state))
+
+    async def scenario():
+        await feed(
+            message_update(user_id, "/start"),
+            message_update(user_id, "1/2"),
+            callback_update(user_id, encode(Action.RECORD_SHOT_BLANK, version=0)),
+            # Shell 2 was a blank, tapped as live by mistake; that leaves only a blank for shell 3.
+            callback_update(user_id, encode(Action.RECORD_SHOT_NOT_BLANK, version=1)),
+            callback_update(user_id, encode(Action.RECORD_SHOT_BLANK, version=2)),
+        )
+        over = await dp.storage.get_state(key), await dp.storage.get_data(key)
+
+        await feed(callback_update(user_id, encode(Action.UNDO, version=3)))
+        undone = await dp.storage.get_state(key), RoundState.from_data((await dp.storage.get_data(key))['round'])
+
+        # A delayed second tap from the keyboard shown before the last shot.
+        stale = tap_guard.stats.stale
+        await feed(callback_update(user_id, encode(Action.RECORD_SHOT_BLANK, version=2)))
+        stale = tap_guard.stats.stale - stale
+
+        await feed(
+            callback_update(user_id, encode(Action.UNDO, version=4)),
+            callback_update(user_id, encode(Action.RECORD_SHOT_BLANK, version=5)),
+            callback_update(user_id, encode(Action.RECORD_SHOT_NOT_BLANK, version=6)),
+        )
+        final = await dp.storage.get_state(key), RoundState.from_data((await dp.storage.get_data(key))['round'])
+        archived_before_leaving = len(archived)
+        await feed(callback_update(user_id, encode(Action.START_NEW_GAME)))
+        return over, undone, stale, final, archived_before_leaving
+
+    (over_state, over_data), (undone_state, undone), stale, (final_state, final), archived_before_leaving = asyncio.run(scenario())
+
+    assert over_state == GameStates.GameOver.state
+    assert over_data['log'] is not None
+
+    assert undone_state == GameStates.GameTracking.state
+    assert undone.version == 2
+    assert undone.revision == 4
+    assert undone.current_shot == 3
+
+    assert stale == 1
+
+    assert final_state == GameStates.GameOver.state
+    assert final.is_over
+    assert final.revision == 7
+
+    # Only the corrected round is archived, once the player leaves it.
+    assert archived_before_leaving == 0
+    assert len(archived) == 1
+    assert archived[0].live_mask == 0b100
+
+
+def test_start_after_game_over(feed):
+    from bot import dp
+
+    user_id = 2003
+    key = StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+    async def scenario():
+        await feed(
+            message_update(user_id, "/start"),
+            message_update(user_id, "1/1"),
+            callback_update(user_id, encode(Action.RECORD_SHOT_BLANK, version=0)),
+            callback_update(user_id, encode(Action.RECORD_SHOT_NOT_BLANK, version=1)),
+            message_update(user_id, "/start"),
+            callback_update(user_id, encode(Action.SET_NOT_BLANK, 3)),
+        )
+        return await dp.storage.get_state(key), await dp.storage.get_data(key)
+
+    state, data = asyncio.run(scenario())
+    # The previous round's blank count must not complete the new setup.
+    assert state == GameStates.GameSetup.state
+    assert data == {"language": "eng", "not_blank": 3}
@@ -0,0 +1,25 @@
+import asyncio
+import json
+import os
+
+from i18n import I18n
+
+
+def test_watch_swaps_changed_translations(tmp_path):
+    path = tmp_path / "translations.json"
+    path.write_text(json.dumps({"eng": {"hello": "Hello"}}), encoding="utf-8")
+    i18n = I18n(str(path))
+    reloads = []
+    i18n.on_reload.append(lambda: reloads.append(i18n.get("eng", "hello")))
+
+    async def scenario():
+        watcher = asyncio.create_task(i18n.watch(0.01))
+        path.write_text(json.dumps({"eng": {"hello": "Hi"}}), encoding="utf-8")
+        # Filesystems with coarse timestamps would otherwise see no change.
+        os.utime(path, (0, 0))
+        while not reloads:
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert reloads == ["Hi"]
@@ -0,0 +1,55 @@
+import pytest
+
+from notation import NotationError, normalize_round, parse_entry, parse_round
+from round_state import BLANK, NOT_BLANK
+
+
+@pytest.mark.parametrize("text, key, kwargs", [
+    ("0/3", "invalid_format", {}),
+    ("4/x fired:L", "invalid_format", {}),
+    ("4/3 fired:LBX", "bulk_bad_fired", {"part": "fired:LBX"}),
+    ("4/3 fired:L fired:B", "bulk_bad_fired", {"part": "fired:B"}),
+    ("4/3 fired:`L`X", "bulk_bad_fired", {"part": "fired:LX"}),
+    ("4/3 phone:2L", "bulk_bad_phone", {"part": "phone:2L"}),
+    ("4/3 phone:2=L phone:2=B", "bulk_phone_twice", {"shot": 2}),
+    ("4/3 foo", "bulk_unknown_part", {"part": "foo"}),
+    ("40/30 fired:L", "bulk_too_many_shells", {"max_shells": 64}),
+    ("4/3 fired:LLLBBBB", "bulk_all_fired", {"fired": 7, "total": 7}),
+    ("4/3 fired:LLLLL", "bulk_no_combat_left", {"shot": 5, "count": 4}),
+    ("2/2 phone:1=L,2=L,3=L", "bulk_no_combat_left", {"shot": 3, "count": 2}),
+    ("4/1 fired:BB", "bulk_no_blank_left", {"shot": 2, "count": 1}),
+    ("4/3 fired:LB phone:1=L", "bulk_phone_range", {"shot": 1, "first": 3, "total": 7}),
+    ("4/3 phone:9=L", "bulk_phone_range", {"shot": 9, "first": 1, "total": 7}),
+])
+def test_entry_errors(text, key, kwargs):
+    with pytest.raises(NotationError) as error:
+        parse_entry(text)
+    assert error.value.key == key
+    assert error.value.kwargs == kwargs
+
+
+def test_entry():
+    counts, round_state, log = parse_entry("4/3 fired:lbb phone:5=b,6=l")
+    assert counts == (4, 3)
+    assert round_state.current_shot == 4
+    assert [round_state.status(shot) for shot in range(1, 8)] == [NOT_BLANK, BLANK, BLANK, None, BLANK, NOT_BLANK, None]
+    assert round_state.predicted_shots() == [5, 6]
+    assert round_state.remaining_not_blank == 2
+    assert round_state.remaining_blank == 0
+    assert log.to_data() == ['43100IL', []]
+
+
+def test_counts_only():
+    counts, round_state, log = parse_entry(" 3/2 ")
+    assert counts == (3, 2)
+    assert round_state.version == 0
+    assert log.to_data() == ['32', []]
+
+
+def test_inline_round():
+    round_state = parse_round(normalize_round(" 3/2  l?b "))
+    assert round_state.fired_shots() == [1]
+    assert round_state.predicted_shots() == [3]
+    assert parse_round("3/2 LLLL?") is None
+    assert parse_round("3/2 LLLBB") is None
+    assert parse_round("3/2 X") is None
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+
+from bench_outbound import run
+from mock_api import MockBotAPI
+from outbound import OutboundScheduler
+
+CHATS = 10
+TAPS = 10
+
+
+def test_scheduled_burst_is_not_flooded():
+    # The burst of bench_outbound.py against a mock Bot API that allows 4 messages per chat per second.
+    async def scenario():
+        api = MockBotAPI(chat_limit=4, window=1.0, retry_after=1)
+        url = await api.start(port=0)
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=1, chat_burst=3)
+        try:
+            failures, _ = await run(url, scheduler, argparse.Namespace(chats=CHATS, taps=TAPS, interval=0.05))
+        finally:
+            await api.stop()
+        return api, scheduler, failures
+
+    api, scheduler, failures = asyncio.run(scenario())
+    assert api.flood_errors == 0
+    assert failures == 0
+    # Renders queued behind the chat limit are replaced by newer ones instead of being sent one by one.
+    assert scheduler.stats.coalesced > 0
+    assert api.calls['editmessagetext'] <= CHATS * TAPS // 2
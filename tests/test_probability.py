@@ -0,0 +1,46 @@
+from pytest import approx
+
+from probability import live_probabilities, next_shot_probability, shot_probability
+from round_state import RoundState, BLANK, NOT_BLANK
+
+
+def test_fresh_round():
+    round_state = RoundState(3, 2)
+    assert live_probabilities(round_state) == approx((0.6,) * 5)
+    assert next_shot_probability(round_state) == approx((40.0, 60.0))
+
+
+def test_known_shells():
+    round_state = RoundState(3, 2)
+    round_state.record_shot(NOT_BLANK)
+    assert live_probabilities(round_state) == approx((1.0, 0.5, 0.5, 0.5, 0.5))
+    round_state.add_prediction(4)
+    round_state.set_prediction(BLANK)
+    assert live_probabilities(round_state) == approx((1.0, 2 / 3, 2 / 3, 0.0, 2 / 3))
+    assert shot_probability(round_state, 4) == approx((100.0, 0.0))
+
+
+def test_only_one_type_left():
+    round_state = RoundState(1, 2)
+    round_state.record_shot(NOT_BLANK)
+    assert live_probabilities(round_state) == approx((1.0, 0.0, 0.0))
+
+
+def test_inverted_unknown_shell():
+    round_state = RoundState(3, 2)
+    round_state.invert_current()
+    assert live_probabilities(round_state) == approx((0.4, 0.6, 0.6, 0.6, 0.6))
+    # It fires live, so it was loaded as a blank: three live shells are left among four.
+    round_state.record_shot(NOT_BLANK)
+    assert round_state.remaining_not_blank == 3
+    assert round_state.remaining_blank == 1
+    assert live_probabilities(round_state) == approx((1.0, 0.75, 0.75, 0.75, 0.75))
+
+
+def test_inverted_known_shell():
+    round_state = RoundState(3, 2)
+    round_state.reveal_current(NOT_BLANK)
+    round_state.invert_current()
+    assert live_probabilities(round_state) == approx((0.0, 0.5, 0.5, 0.5, 0.5))
+    round_state.invert_current()
+    assert live_probabilities(round_state) == approx((1.0, 0.5, 0.5, 0.5, 0.5))
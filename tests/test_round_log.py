@@ -0,0 +1,40 @@
+from round_log import SHOT, RoundLog, phone_event
+from round_state import RoundState, BLANK, NOT_BLANK
+
+
+def play(log: RoundLog, round_state: RoundState, shots: int):
+    for shot in range(shots):
+        log.append(round_state, SHOT[NOT_BLANK if shot % 2 else BLANK])
+
+
+def test_undo_rebuilds_the_previous_round():
+    log = RoundLog.start(6, 6)
+    round_state = log.initial_state()
+    play(log, round_state, 9)
+    log.append(round_state, phone_event(12, NOT_BLANK))
+
+    undone = log.undo(round_state)
+    replayed = log.state_at(9)
+    assert undone.version == replayed.version == 9
+    assert undone.predicted_shots() == []
+    assert undone.fired_mask == replayed.fired_mask
+    assert undone.live_mask == replayed.live_mask
+    assert undone.remaining_not_blank == replayed.remaining_not_blank
+
+
+def test_revision_never_repeats():
+    log = RoundLog.start(2, 2)
+    round_state = log.initial_state()
+    play(log, round_state, 2)
+    assert round_state.revision == 2
+
+    round_state = log.undo(round_state)
+    assert (round_state.version, round_state.revision) == (1, 3)
+    log.redo(round_state)
+    assert (round_state.version, round_state.revision) == (2, 4)
+
+    round_state = log.undo(round_state)
+    # A new event after the undo drops the undone one and takes the next revision, not its old one.
+    log.append(round_state, SHOT[NOT_BLANK])
+    assert (round_state.version, round_state.revision) == (2, 6)
+    assert not log.can_redo(round_state)
@@ -0,0 +1,27 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from callbacks import Action, encode
+from round_state import RoundState
+from updates import callback_update, message_update
+
+
+def test_record_shot_storage_calls(feed):
+    from bot import dp, session_middleware
+
+    user_id = 2002
+
+    async def scenario():
+        await feed(
+            message_update(user_id, "/start"),
+            message_update(user_id, "4/4"),
+            callback_update(user_id, encode(Action.RECORD_SHOT_BLANK, version=0)),
+        )
+        data = await dp.storage.get_data(StorageKey(bot_id=42, chat_id=user_id, user_id=user_id))
+        return session_middleware.last_storage_calls, RoundState.from_data(data['round'])
+
+    storage_calls, round_state = asyncio.run(scenario())
+    assert round_state.fired_shots() == [1]
+    # The state read, the data read and one write of the changed round; the state stays the same.
+    assert storage_calls <= 3
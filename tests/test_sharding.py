@@ -0,0 +1,68 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def free_port_block(size: int) -> int:
+    # The ingress takes the first port and worker N the port 1 + N after it.
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        sockets = []
+        try:
+            for offset in range(size):
+                sock = socket.socket()
+                sockets.append(sock)
+                sock.bind(("127.0.0.1", port + offset))
+            return port
+        except OSError:
+            continue
+        finally:
+            for sock in sockets:
+                sock.close()
+
+
+def serves_metrics(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def test_workers_get_their_shard_settings(tmp_path):
+    port = free_port_block(3)
+    env = dict(
+        os.environ,
+        SHARD_WORKERS="2",
+        METRICS_PORT=str(port),
+        STORAGE_BACKEND="sqlite",
+        SQLITE_PATH=str(tmp_path / "fsm.sqlite3"),
+        LOG_LEVEL="WARNING",
+    )
+    bot = subprocess.Popen(
+        [sys.executable, "main.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        ports = [port, port + 1, port + 2]
+        while not all(serves_metrics(p) for p in ports):
+            assert bot.poll() is None, "the bot exited"
+            assert time.monotonic() < deadline, "not every process serves its metrics"
+            time.sleep(0.2)
+        bot.send_signal(signal.SIGINT)
+        bot.wait(timeout=30)
+    finally:
+        try:
+            os.killpg(bot.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
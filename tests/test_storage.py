@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+
+from metrics import rounds_collector
+from storage import BoundedStorage, SQLiteStorage
+
+
+def storage_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+
+def test_writes_during_flush_reach_the_file(tmp_path):
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"), flush_interval=60, batch_size=2)
+        for user_id in range(1, 5):
+            await storage.get_data(storage_key(user_id))
+
+        # The worker thread is busy, so the first batch waits in its queue.
+        busy = asyncio.ensure_future(storage._run(time.sleep, 0.05))
+        await storage.set_data(storage_key(1), {"n": 1})
+        await storage.set_data(storage_key(2), {"n": 2})
+        await asyncio.sleep(0.01)
+        # A second full batch arrives while the first one is still being flushed.
+        await storage.set_data(storage_key(3), {"n": 3})
+        await storage.set_data(storage_key(4), {"n": 4})
+        await busy
+        await asyncio.sleep(0.1)
+
+        rows = await storage._run(lambda: storage._connection.execute("SELECT key FROM fsm").fetchall())
+        await storage.close()
+        return len(rows)
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_close_writes_pending_records(tmp_path):
+    path = str(tmp_path / "fsm.sqlite3")
+
+    async def write():
+        storage = SQLiteStorage(path, flush_interval=60)
+        await storage.set_state(storage_key(1), "GameStates:GameTracking")
+        await storage.set_data(storage_key(1), {"lang": "ru"})
+        await storage.close()
+
+    async def read():
+        storage = SQLiteStorage(path)
+        record = await storage.load(storage_key(1))
+        await storage.close()
+        return record
+
+    asyncio.run(write())
+    assert asyncio.run(read()) == ("GameStates:GameTracking", {"lang": "ru"})
+
+
+def test_close_twice(tmp_path):
+    # The dispatcher closes its storage on shutdown; a second close must not reach the stopped worker thread.
+    async def scenario():
+        storage = BoundedStorage(spill=SQLiteStorage(str(tmp_path / "fsm.sqlite3")), write_through=True)
+        await storage.set_data(storage_key(1), {"lang": "ru"})
+        await storage.close()
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_state_counts_follow_evictions():
+    async def scenario():
+        storage = BoundedStorage(idle_ttl=60)
+        await storage.set_state(storage_key(1), "GameStates:GameTracking")
+        await storage.set_state(storage_key(2), "GameStates:GameTracking")
+        await storage.set_state(storage_key(2), "GameStates:GameOver")
+        tracked = dict(storage.states)
+        # Key 1 goes idle; the next write evicts it.
+        storage._records[storage_key(1)][3] -= 120
+        await storage.set_data(storage_key(2), {})
+        return tracked, dict(storage.states)
+
+    tracked, after_eviction = asyncio.run(scenario())
+    assert tracked == {"GameStates:GameTracking": 1, "GameStates:GameOver": 1}
+    assert after_eviction == {"GameStates:GameOver": 1}
+    collect = rounds_collector({"GameStates:GameTracking": 2, "GameStates:GameOver": 1}, finished=["GameStates:GameOver"])
+    assert list(collect()) == ['# TYPE bot_active_rounds gauge', 'bot_active_rounds{state="GameStates:GameTracking"} 2']
@@ -0,0 +1,46 @@
+from callbacks import Action, CallbackPayload
+from round_state import RoundState
+from taps import TapGuard
+
+
+def test_duplicate_callbacks():
+    guard = TapGuard(size=2)
+    assert not guard.is_duplicate("a")
+    assert guard.is_duplicate("a")
+    assert not guard.is_duplicate("b")
+    assert not guard.is_duplicate("c")
+    # Only the last `size` ids are remembered.
+    assert not guard.is_duplicate("a")
+    assert guard.stats.duplicate == 1
+
+
+def test_stale_taps():
+    guard = TapGuard(size=10)
+    round_state = RoundState(2, 2)
+    tap = CallbackPayload(Action.RECORD_SHOT_BLANK, (), 0)
+    # Games the guard has not seen yet are left to the state filters.
+    assert not guard.is_stale("game", tap)
+
+    guard.observe("game", round_state.to_data())
+    assert not guard.is_stale("game", tap)
+    round_state.record_shot('blank')
+    guard.observe("game", round_state.to_data())
+    assert guard.is_stale("game", tap)
+    assert not guard.is_stale("game", CallbackPayload(Action.RECORD_SHOT_BLANK, (), 1))
+    # Unversioned actions and old keyboards without a revision always pass.
+    assert not guard.is_stale("game", CallbackPayload(Action.PREDICT_SHOT, (3,)))
+    assert not guard.is_stale("game", None)
+    assert guard.stats.stale == 1
+
+    guard.observe("game", None)
+    assert not guard.is_stale("game", tap)
+
+
+def test_game_limit():
+    guard = TapGuard(size=2)
+    for game in ("a", "b", "c"):
+        guard.observe(game, RoundState(1, 1).to_data())
+    stale = CallbackPayload(Action.RECORD_SHOT_BLANK, (), 5)
+    assert not guard.is_stale("a", stale)
+    assert guard.is_stale("b", stale)
+    assert guard.is_stale("c", stale)
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+from aiohttp.test_utils import make_mocked_request
+
+from webhook import SECRET_HEADER, check_secret
+
+
+def test_webhook_mode_requires_a_secret():
+    env = dict(os.environ, BOT_MODE="webhook", WEBHOOK_URL="https://example.com", WEBHOOK_SECRET="")
+    result = subprocess.run([sys.executable, "-c", "import config"], env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "WEBHOOK_SECRET is required" in result.stderr
+
+
+def test_check_secret():
+    assert check_secret(make_mocked_request("POST", "/webhook", headers={SECRET_HEADER: "s3cret"}), "s3cret")
+    assert not check_secret(make_mocked_request("POST", "/webhook", headers={SECRET_HEADER: "guess"}), "s3cret")
+    assert not check_secret(make_mocked_request("POST", "/webhook"), "s3cret")
+    # No configured secret trusts nobody rather than everybody.
+    assert not check_secret(make_mocked_request("POST", "/webhook", headers={SECRET_HEADER: ""}), None)
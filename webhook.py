@@ -0,0 +1,118 @@
+import asyncio
+import hmac
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.webhook.aiohttp_server import setup_application
+from aiohttp import web
+from pydantic import ValidationError
+
+from logger import logger
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def check_secret(request: web.Request, secret: Optional[str]) -> bool:
+    # Fails closed: without a configured secret no request is trusted.
+    if not secret or not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+        logger.warning("Rejected webhook request with an invalid secret token from %s", request.remote)
+        return False
+    return True
+
+
+class UpdateQueue:
+    def __init__(self, dp: Dispatcher, bot: Bot, maxsize: int, workers: int):
+        self.dp = dp
+        self.bot = bot
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.workers = workers
+        self.processed = 0
+        self.rejected = 0
+        self._tasks = []
+
+    def put(self, update: Update) -> bool:
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.exception("Failed to process update %s: %s", update.update_id, e)
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    async def start(self, *_):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, *_):
+        await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def create_app(
+    dp: Dispatcher,
+    bot: Bot,
+    path: str,
+    secret: Optional[str],
+    queue_size: int,
+    workers: int,
+) -> web.Application:
+    updates = UpdateQueue(dp, bot, maxsize=queue_size, workers=workers)
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if not check_secret(request, secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except (ValueError, ValidationError) as e:
+            logger.warning("Rejected malformed webhook update: %s", e)
+            return web.Response(status=400)
+        if not updates.put(update):
+            # Telegram redelivers updates that were not acknowledged, so shedding load here is safe.
+            logger.warning("Update queue is full, rejecting update %s", update.update_id)
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app["updates"] = updates
+    app.router.add_post(path, handle_update)
+    app.on_startup.append(updates.start)
+    app.on_shutdown.append(updates.stop)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    url: str,
+    path: str,
+    host: str,
+    port: int,
+    secret: Optional[str],
+    queue_size: int,
+    workers: int,
+):
+    app = create_app(dp, bot, path=path, secret=secret, queue_size=queue_size, workers=workers)
+    await bot.set_webhook(url.rstrip("/") + path, secret_token=secret)
+    logger.info("Webhook set to %s, listening on %s:%s", url.rstrip('/') + path, host, port)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()